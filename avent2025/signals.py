@@ -1,9 +1,12 @@
 """
 Signaux pour logger les connexions et déconnexions
+et générer les déclinaisons responsives des images uploadées
 """
 from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import AuditLog
+from responsive_images.services import schedule_derivatives
+from .models import AuditLog, Enigme, Indice, Devinette, IndiceDevinette
 from .audit import log_action
 
 
@@ -18,3 +21,19 @@ def log_user_logout(sender, request, user, **kwargs):
     """Log quand un utilisateur se déconnecte"""
     if user:  # user peut être None si la session a expiré
         log_action(user, AuditLog.LOGOUT, request)
+
+
+@receiver(post_save, sender=Enigme)
+@receiver(post_save, sender=Devinette)
+def generate_image_name_derivatives(sender, instance, **kwargs):
+    """Génère les déclinaisons de l'image d'une énigme ou devinette en arrière-plan"""
+    if instance.image_name:
+        schedule_derivatives(instance.image_name.name)
+
+
+@receiver(post_save, sender=Indice)
+@receiver(post_save, sender=IndiceDevinette)
+def generate_indice_image_derivatives(sender, instance, **kwargs):
+    """Génère les déclinaisons de l'image d'un indice en arrière-plan"""
+    if instance.image:
+        schedule_derivatives(instance.image.name)
@@ -1,13 +1,13 @@
 from django.contrib import admin
-from .models import ChessGame, MoveAnalysis
+from .models import AnalysisJob, ChessGame, MoveAnalysis
 
 
 @admin.register(ChessGame)
 class ChessGameAdmin(admin.ModelAdmin):
-    list_display = ['username', 'white_player', 'black_player', 'result', 'start_time', 'analyzed']
-    list_filter = ['analyzed', 'rated', 'result', 'start_time']
+    list_display = ['username', 'white_player', 'black_player', 'result', 'time_class', 'start_time', 'analyzed', 'error_count']
+    list_filter = ['analyzed', 'rated', 'result', 'time_class', 'start_time']
     search_fields = ['username', 'white_player', 'black_player', 'game_id']
-    readonly_fields = ['game_id', 'created_at']
+    readonly_fields = ['game_id', 'created_at', 'pgn', 'moves_data'] + ChessGame.SUMMARY_FIELDS
     date_hierarchy = 'start_time'
     
     fieldsets = (
@@ -23,6 +23,10 @@ class ChessGameAdmin(admin.ModelAdmin):
         ('Données de la partie', {
             'fields': ('pgn', 'moves_data', 'analyzed')
         }),
+        ('Résumé', {
+            'fields': tuple(ChessGame.SUMMARY_FIELDS),
+            'classes': ('collapse',)
+        }),
         ('Métadonnées', {
             'fields': ('created_at',),
             'classes': ('collapse',)
@@ -48,3 +52,12 @@ class MoveAnalysisAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         })
     )
+
+
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ['game', 'username', 'state', 'priority', 'attempts', 'progress', 'worker', 'created_at', 'finished_at']
+    list_filter = ['state', 'priority']
+    search_fields = ['username', 'game__game_id', 'batch_id']
+    raw_id_fields = ['game']
+    readonly_fields = ['created_at', 'updated_at', 'finished_at']
@@ -0,0 +1,717 @@
+"""
+Parcours d'une partie avec un moteur UCI et classification des coups
+
+Deux modes d'analyse partagent la même classification :
+- 'per_ply' : chaque position est analysée indépendamment (MultiPV), le coup joué
+  est réanalysé séparément s'il ne fait pas partie des meilleurs coups, et la
+  position après une erreur est réanalysée pour trouver la punition adverse.
+- 'incremental' : la partie est parcourue avec une session moteur persistante
+  (engine.analysis, sans ucinewgame entre les coups). L'analyse de la position
+  suivante, nécessaire de toute façon pour le coup suivant, fournit l'évaluation
+  après le coup joué et la punition adverse : une seule recherche par position.
+- 'budget' : une passe rapide (une seule variante, faible profondeur) sur toute
+  la partie, puis une analyse complète comme en 'per_ply' uniquement des coups
+  dont l'évaluation chute d'au moins BUDGET_SWING_THRESHOLD, des plus fortes
+  chutes aux plus faibles, tant que le budget de temps de la partie le permet.
+  Un coup que la passe rapide n'a pas pu évaluer est toujours analysé en
+  profondeur, quel que soit le budget.
+
+Dans les trois modes, les coups du livre d'ouvertures (Polyglot) et les positions
+couvertes par les tables de finales Syzygy sont classés sans appel au moteur
+(voir AnalysisShortcuts). En mode 'budget', ils sont classés avant la passe
+rapide : ni la passe rapide ni la passe profonde ne les analysent, et une
+position n'est évaluée rapidement que si elle précède ou suit un coup restant
+à classer. Le budget de temps ne porte donc que sur les coups hors livre et
+hors tables.
+"""
+import logging
+import os
+import time
+
+logger = logging.getLogger('chessTrainer.analysis')
+
+ANALYSIS_MODES = ('per_ply', 'incremental', 'budget')
+# Nombre de variantes demandées au moteur pour chaque position
+MULTIPV = 5
+
+# Mode 'budget' : passe rapide sur toute la partie
+SHALLOW_DEPTH = 10
+SHALLOW_TIME = 0.05
+# Chute d'évaluation (centipawns) qui déclenche une analyse complète du coup,
+# en dessous du seuil d'imprécision pour que la passe profonde tranche
+BUDGET_SWING_THRESHOLD = 50
+# Budget de temps par partie (secondes) par défaut
+DEFAULT_TIME_BUDGET = 30
+
+
+def score_to_centipawns(score):
+    """Convertir un score Stockfish en centipawns du point de vue des blancs"""
+    if score.is_mate():
+        mate_value = score.white().mate()
+        if mate_value is None:
+            return 0
+        return 1000 if mate_value > 0 else -1000
+    else:
+        cp_score = score.white().score()
+        return cp_score if cp_score is not None else 0
+
+
+def game_phase(piece_count):
+    """Phase de jeu d'après le nombre de pièces sur l'échiquier"""
+    if piece_count <= 10:
+        return 'endgame'
+    elif piece_count <= 20:
+        return 'middlegame'
+    return 'opening'
+
+
+def adaptive_depth_for(board, depth):
+    """Profondeur adaptative selon la phase de jeu"""
+    phase = game_phase(len(board.piece_map()))
+    if phase == 'endgame':
+        return min(depth + 4, 22)
+    elif phase == 'middlegame':
+        return depth
+    else:
+        return max(depth - 2, 12)
+
+
+def extract_pv_line(board, pv, max_moves=6):
+    """Extraire les premiers coups d'une variante principale en notation SAN"""
+    import chess
+
+    pv_moves = []
+    temp_board = board.copy()
+    for pv_move in pv[:max_moves]:
+        try:
+            san_move = temp_board.san(pv_move)
+            pv_moves.append({
+                'uci': pv_move.uci(),
+                'san': san_move,
+                'move_number': temp_board.fullmove_number,
+                'is_white': temp_board.turn == chess.WHITE
+            })
+            temp_board.push(pv_move)
+        except Exception:
+            break  # Arrêter si coup invalide
+    return pv_moves
+
+
+def _default_score(board):
+    import chess.engine
+
+    return chess.engine.PovScore(chess.engine.Cp(0), board.turn)
+
+
+def build_top_moves(position, multi_info):
+    """Construire la liste des meilleurs coups à partir du résultat MultiPV du moteur"""
+    if not isinstance(multi_info, list):
+        multi_info = [multi_info]
+
+    top_moves = []
+    for pv_info in multi_info:
+        if not pv_info.get('pv'):
+            continue
+        move_candidate = pv_info['pv'][0]
+        score = pv_info.get('score', _default_score(position))
+        top_moves.append({
+            'move': move_candidate.uci(),
+            'move_san': position.san(move_candidate),
+            'evaluation': score_to_centipawns(score),
+            'rank': len(top_moves) + 1,
+            'is_mate': score.is_mate(),
+            'mate_in': score.relative.mate() if score.is_mate() else None,
+            'pv_line': extract_pv_line(position, pv_info['pv'])
+        })
+    return top_moves
+
+
+def find_played_move(top_moves, move):
+    """Retourner (évaluation, rang) du coup joué s'il fait partie des meilleurs coups"""
+    import chess
+
+    for i, top_move in enumerate(top_moves):
+        if chess.Move.from_uci(top_move['move']) == move:
+            return top_move['evaluation'], i + 1
+    return None, None
+
+
+def compute_centipawn_loss(turn, best_eval, played_move_eval):
+    """Perte en centipawns du point de vue du joueur au trait (évaluations côté blancs)"""
+    import chess
+
+    if turn == chess.WHITE:
+        return max(0, best_eval - played_move_eval)
+    return max(0, played_move_eval - best_eval)
+
+
+# Qualité d'un coup -> (type d'erreur, icône, libellé)
+MOVE_QUALITIES = {
+    'best': ("aucune", "⭐", "Meilleur coup"),
+    'good': ("aucune", "👍", "Bon coup"),
+    'acceptable': ("aucune", "✓", "Coup acceptable"),
+    'inaccuracy': ("inaccuracy", "?!", "Imprécision"),
+    'mistake': ("mistake", "❌", "Erreur"),
+    'blunder': ("blunder", "💥", "Gaffe"),
+    'book': ("aucune", "📖", "Coup théorique"),
+}
+
+
+def classify_move(centipawn_loss, is_best_move, is_in_top5):
+    """Classer un coup : retourne (qualité, type d'erreur, icône, libellé)"""
+    if is_best_move or centipawn_loss < 10:
+        quality = "best"
+    elif is_in_top5 and centipawn_loss < 20:
+        quality = "good"
+    elif centipawn_loss >= 200:
+        # Gaffe : perte très importante
+        quality = "blunder"
+    elif centipawn_loss >= 100:
+        # Erreur grave
+        quality = "mistake"
+    elif centipawn_loss >= 70:
+        # Imprécision : première catégorie d'erreur
+        quality = "inaccuracy"
+    else:
+        # Coup acceptable
+        quality = "acceptable"
+    return (quality,) + MOVE_QUALITIES[quality]
+
+
+def build_opponent_punishment(position_after, multi_info):
+    """Meilleure réponse de l'adversaire après une erreur (coup, évaluation, variante)"""
+    if isinstance(multi_info, list):
+        multi_info = multi_info[0] if multi_info else {}
+    if not multi_info.get('pv'):
+        return None
+    return {
+        'move_san': position_after.san(multi_info['pv'][0]),
+        'evaluation': score_to_centipawns(multi_info.get('score', _default_score(position_after))),
+        'pv_line': extract_pv_line(position_after, multi_info['pv'])
+    }
+
+
+def build_move_entry(ply_count, position_before, move, top_moves, played_move_eval, played_move_rank,
+                     opponent_punishment, depth, time_limit, source='engine'):
+    """Construire l'entrée moves_data d'un coup analysé"""
+    import chess
+
+    best_eval = top_moves[0]['evaluation']
+    centipawn_loss = compute_centipawn_loss(position_before.turn, best_eval, played_move_eval)
+    is_best_move = move == chess.Move.from_uci(top_moves[0]['move'])
+    is_in_top5 = played_move_rank <= 5 if played_move_rank else False
+    move_quality, error_type, quality_icon, quality_text = classify_move(centipawn_loss, is_best_move, is_in_top5)
+
+    # Calculer l'accuracy (pourcentage)
+    accuracy = max(0, 100 - (centipawn_loss / 2))  # Formule simplifiée
+
+    return {
+        'move_number': (ply_count + 1) // 2,
+        'is_white_move': ply_count % 2 == 1,
+        'ply_count': ply_count,
+        'move': move.uci(),
+        'move_san': position_before.san(move),
+        'best_move': top_moves[0]['move'],
+        'best_move_san': top_moves[0]['move_san'],
+        'top_moves': top_moves,
+        'opponent_punishment': opponent_punishment,
+        'evaluation_before': best_eval,
+        'evaluation_after': played_move_eval,
+        'evaluation_diff': -centipawn_loss,  # Négatif car c'est une perte
+        'centipawn_loss': centipawn_loss,
+        'accuracy': round(accuracy, 1),
+        'move_rank': played_move_rank,
+        'is_error': error_type != "aucune",
+        'error_type': error_type,
+        'move_quality': move_quality,
+        'quality_icon': quality_icon,
+        'quality_text': quality_text,
+        'is_best_move': is_best_move,
+        'is_in_top5': is_in_top5,
+        'depth': depth,
+        'time_spent': time_limit,
+        'piece_count': len(position_before.piece_map()),
+        'fen_before': position_before.fen(),
+        'source': source,  # engine, shallow, book ou tablebase
+    }
+
+
+def summarize_moves(move_analysis):
+    """Compter les erreurs par type et calculer la précision moyenne"""
+    counts = {'inaccuracy': 0, 'mistake': 0, 'blunder': 0}
+    for move in move_analysis:
+        if move['error_type'] in counts:
+            counts[move['error_type']] += 1
+    total_accuracy = sum(move['accuracy'] for move in move_analysis) / len(move_analysis) if move_analysis else 0
+    return {
+        'errors_count': sum(counts.values()),
+        'inaccuracies_count': counts['inaccuracy'],
+        'mistakes_count': counts['mistake'],
+        'blunders_count': counts['blunder'],
+        'average_accuracy': round(total_accuracy, 1),
+    }
+
+
+class AnalysisShortcuts:
+    """Livre d'ouvertures Polyglot et tables de finales Syzygy consultés avant le moteur
+
+    - Tant que la partie suit le livre (dans les book_max_ply premiers demi-coups),
+      les coups joués sont classés « théoriques » sans recherche.
+    - Une position avec au plus tablebase_max_pieces pièces (sans droit de roque)
+      reçoit un résultat exact : gain, nulle ou perte ; un coup qui dégrade ce
+      résultat est une gaffe.
+    Les deux sources sont optionnelles (chemin absent ou fichier introuvable).
+    """
+
+    def __init__(self, book=None, tablebase=None, book_max_ply=24, tablebase_max_pieces=5):
+        self.book = book
+        self.tablebase = tablebase
+        self.book_max_ply = book_max_ply
+        self.tablebase_max_pieces = tablebase_max_pieces
+        self.in_book = book is not None
+
+    @classmethod
+    def from_settings(cls):
+        import chess.polyglot
+        import chess.syzygy
+        from django.conf import settings
+
+        book = tablebase = None
+        book_path = getattr(settings, 'CHESS_OPENING_BOOK', None)
+        if book_path and os.path.exists(book_path):
+            book = chess.polyglot.open_reader(book_path)
+        syzygy_path = getattr(settings, 'CHESS_SYZYGY_PATH', None)
+        if syzygy_path and os.path.isdir(syzygy_path):
+            tablebase = chess.syzygy.open_tablebase(syzygy_path)
+        return cls(
+            book=book,
+            tablebase=tablebase,
+            book_max_ply=getattr(settings, 'CHESS_BOOK_MAX_PLY', 24),
+            tablebase_max_pieces=getattr(settings, 'CHESS_SYZYGY_MAX_PIECES', 5),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.book is not None:
+            self.book.close()
+        if self.tablebase is not None:
+            self.tablebase.close()
+
+    def entry_for(self, ply_count, position_before, move):
+        """Entrée moves_data du coup sans moteur, ou None s'il faut une recherche"""
+        if self.in_book:
+            entry = self._book_entry(ply_count, position_before, move)
+            if entry is not None:
+                return entry
+            # Sortie du livre : on n'y revient plus pour cette partie
+            self.in_book = False
+        if self.tablebase is not None and self._in_tablebase(position_before):
+            return self._tablebase_entry(ply_count, position_before, move)
+        return None
+
+    def _book_entry(self, ply_count, position_before, move):
+        if ply_count > self.book_max_ply:
+            return None
+        book_moves = sorted(self.book.find_all(position_before), key=lambda entry: entry.weight, reverse=True)
+        if move not in [entry.move for entry in book_moves]:
+            return None
+        total_weight = sum(entry.weight for entry in book_moves) or 1
+        top_moves = [{
+            'move': entry.move.uci(),
+            'move_san': position_before.san(entry.move),
+            'evaluation': None,
+            'rank': i + 1,
+            'weight': round(entry.weight * 100 / total_weight),
+            'is_mate': False,
+            'mate_in': None,
+        } for i, entry in enumerate(book_moves[:MULTIPV])]
+        return {
+            'move_number': (ply_count + 1) // 2,
+            'is_white_move': ply_count % 2 == 1,
+            'ply_count': ply_count,
+            'move': move.uci(),
+            'move_san': position_before.san(move),
+            'best_move': top_moves[0]['move'],
+            'best_move_san': top_moves[0]['move_san'],
+            'top_moves': top_moves,
+            'opponent_punishment': None,
+            'evaluation_before': None,
+            'evaluation_after': None,
+            'evaluation_diff': 0,
+            'centipawn_loss': 0,
+            'accuracy': 100,
+            'move_rank': next(i + 1 for i, entry in enumerate(book_moves) if entry.move == move),
+            'is_error': False,
+            'error_type': MOVE_QUALITIES['book'][0],
+            'move_quality': "book",
+            'quality_icon': MOVE_QUALITIES['book'][1],
+            'quality_text': MOVE_QUALITIES['book'][2],
+            'is_best_move': True,
+            'is_in_top5': True,
+            'depth': 0,
+            'time_spent': 0,
+            'piece_count': len(position_before.piece_map()),
+            'fen_before': position_before.fen(),
+            'source': 'book',
+        }
+
+    def _in_tablebase(self, board):
+        import chess
+
+        return (chess.popcount(board.occupied) <= self.tablebase_max_pieces
+                and not board.castling_rights)
+
+    def _tablebase_moves(self, board):
+        """Coups classés par résultat exact (du point de vue du joueur au trait), ou None si une table manque"""
+        import chess
+
+        ranked = []
+        for move in board.legal_moves:
+            board.push(move)
+            wdl = self.tablebase.get_wdl(board)
+            dtz = self.tablebase.get_dtz(board) if wdl is not None else None
+            board.pop()
+            if wdl is None:
+                return None
+            # Gain/perte « maudits » (règle des 50 coups) comptés comme nulles
+            outcome = 1 if -wdl == 2 else -1 if -wdl == -2 else 0
+            # À résultat égal, le gain le plus rapide / la perte la plus lente
+            ranked.append((outcome, -abs(dtz or 0) if outcome > 0 else abs(dtz or 0), move))
+        ranked.sort(key=lambda item: (item[0], item[1]), reverse=True)
+
+        moves = []
+        for outcome, _, move in ranked:
+            evaluation = 1000 * outcome if board.turn == chess.WHITE else -1000 * outcome
+            moves.append({
+                'move': move.uci(),
+                'move_san': board.san(move),
+                'evaluation': evaluation,
+                'rank': len(moves) + 1,
+                'is_mate': False,
+                'mate_in': None,
+                'pv_line': extract_pv_line(board, [move]),
+            })
+        return moves
+
+    def _tablebase_entry(self, ply_count, position_before, move):
+        ranked = self._tablebase_moves(position_before)
+        if not ranked:
+            return None
+        played = next(top_move for top_move in ranked if top_move['move'] == move.uci())
+        entry = build_move_entry(
+            ply_count, position_before, move, ranked[:MULTIPV], played['evaluation'], played['rank'],
+            None, 0, 0, source='tablebase',
+        )
+        if entry['centipawn_loss'] >= 100:
+            # Punition : meilleure réponse exacte de l'adversaire
+            position_after = position_before.copy()
+            position_after.push(move)
+            replies = self._tablebase_moves(position_after)
+            if replies:
+                entry['opponent_punishment'] = {
+                    'move_san': replies[0]['move_san'],
+                    'evaluation': replies[0]['evaluation'],
+                    'pv_line': replies[0]['pv_line'],
+                }
+        return entry
+
+
+class _ProgressReporter:
+    """Envoie la progression au callback par tranches de 10%"""
+
+    def __init__(self, progress_callback, total_moves):
+        self.progress_callback = progress_callback
+        self.total_moves = total_moves
+        self.last_sent_progress = -1
+
+    def update(self, current_move_index, move_number, is_white_move, errors_count):
+        if not self.progress_callback:
+            return
+        progress_percent = int((current_move_index / self.total_moves) * 100)
+        if (progress_percent >= self.last_sent_progress + 10 or
+                progress_percent == 100 or
+                current_move_index == 1 or
+                current_move_index % max(1, self.total_moves // 10) == 0):
+            self.progress_callback(
+                progress_percent,
+                f"Analyse en cours... {progress_percent}% (coup {move_number}{'.' if is_white_move else '...'})",
+                current_move_index,
+                self.total_moves,
+                errors_count
+            )
+            self.last_sent_progress = progress_percent
+
+
+def _log_player_error(entry, player_color):
+    """Log détaillé des erreurs du joueur analysé (notation officielle : 14. ..f5 ou 14. f5)"""
+    if not entry['is_error'] or player_color is None:
+        return
+    if entry['is_white_move'] == (player_color == 'white'):
+        logger.debug(
+            "   ➡️ Erreur détectée : %d. %s%s (%s)",
+            entry['move_number'], '' if entry['is_white_move'] else '..', entry['move_san'], entry['error_type'],
+        )
+
+
+def analyze_mainline(engine, game, depth=18, time_limit=0.5, progress_callback=None,
+                     mode='per_ply', game_key=None, player_color=None, shortcuts=None,
+                     time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Analyser la ligne principale d'une partie python-chess avec un moteur déjà ouvert
+
+    Retourne (liste des coups analysés, nombre de demi-coups). Les erreurs sur un
+    coup sont loguées et le coup est ignoré, comme dans l'analyse historique.
+    shortcuts (AnalysisShortcuts) permet de classer les coups du livre et des
+    finales couvertes par les tables sans recherche du moteur.
+    time_budget (secondes) ne sert qu'au mode 'budget'.
+    """
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Mode d'analyse inconnu: {mode}")
+
+    moves = [node.move for node in game.mainline() if node.move is not None]
+    progress = _ProgressReporter(progress_callback, len(moves))
+    if progress_callback:
+        progress_callback(0, "Début de l'analyse...", 0, len(moves), 0)
+
+    if shortcuts is None:
+        shortcuts = AnalysisShortcuts()
+    if mode == 'incremental':
+        walk = _walk_incremental(engine, game.board(), moves, depth, time_limit, game_key, shortcuts)
+    elif mode == 'budget':
+        walk = _walk_budget(engine, game.board(), moves, depth, time_limit, shortcuts, time_budget)
+    else:
+        walk = _walk_per_ply(engine, game.board(), moves, depth, time_limit, shortcuts)
+
+    move_analysis = []
+    errors_count = 0
+    for ply_count, entry in walk:
+        if entry is None:
+            continue
+        move_analysis.append(entry)
+        if entry['is_error']:
+            errors_count += 1
+            _log_player_error(entry, player_color)
+        progress.update(ply_count, entry['move_number'], entry['is_white_move'], errors_count)
+
+        if ply_count % 10 == 0:  # Afficher tous les 10 demi-coups (= 5 coups complets)
+            logger.debug("  📊 Analysé %d coups complets... (Prof: %s, Erreurs: %d)", ply_count // 2, entry['depth'], errors_count)
+
+    return move_analysis, len(moves)
+
+
+def _deep_entry(engine, ply_count, position_before, move, depth, time_limit):
+    """Analyse complète d'un coup (MultiPV, coup joué, punition adverse) sans modifier la partie"""
+    import chess.engine
+
+    adaptive_depth = adaptive_depth_for(position_before, depth)
+    limit = chess.engine.Limit(depth=adaptive_depth, time=time_limit)
+    try:
+        top_moves = build_top_moves(position_before, engine.analyse(position_before, limit, multipv=MULTIPV))
+    except Exception as multipv_error:
+        logger.warning("⚠️ MultiPV échoué, fallback: %s", multipv_error)
+        # Analyse simple
+        info = engine.analyse(position_before, limit)
+        evaluation_before = info.get("score", _default_score(position_before))
+        best_move_candidate = engine.play(position_before, limit).move
+        top_moves = [{
+            'move': best_move_candidate.uci(),
+            'move_san': position_before.san(best_move_candidate),
+            'evaluation': score_to_centipawns(evaluation_before),
+            'rank': 1,
+            'is_mate': evaluation_before.is_mate(),
+            'mate_in': evaluation_before.relative.mate() if evaluation_before.is_mate() else None
+        }]
+
+    if not top_moves:
+        raise Exception("Aucun coup trouvé par Stockfish")
+
+    played_move_eval, played_move_rank = find_played_move(top_moves, move)
+
+    position_after = position_before.copy()
+    position_after.push(move)
+
+    # Si le coup joué n'est pas dans les top moves, l'analyser séparément
+    if played_move_eval is None:
+        played_info = engine.analyse(position_after, chess.engine.Limit(depth=adaptive_depth - 2, time=time_limit * 0.5))
+        played_move_eval = score_to_centipawns(played_info.get("score", _default_score(position_after)))
+        played_move_rank = len(top_moves) + 1
+
+    centipawn_loss = compute_centipawn_loss(position_before.turn, top_moves[0]['evaluation'], played_move_eval)
+
+    # Pour les erreurs importantes, analyser aussi le meilleur coup de l'adversaire
+    opponent_punishment = None
+    if centipawn_loss >= 100:
+        try:
+            opponent_analysis = engine.analyse(position_after, chess.engine.Limit(depth=adaptive_depth, time=time_limit), multipv=3)
+            opponent_punishment = build_opponent_punishment(position_after, opponent_analysis)
+        except Exception as e:
+            logger.warning("⚠️ Erreur analyse coup adversaire: %s", e)
+
+    return build_move_entry(
+        ply_count, position_before, move, top_moves, played_move_eval, played_move_rank,
+        opponent_punishment, adaptive_depth, time_limit,
+    )
+
+
+def _walk_per_ply(engine, board, moves, depth, time_limit, shortcuts):
+    """Mode historique : une ou plusieurs recherches indépendantes par coup"""
+    for ply_count, move in enumerate(moves, start=1):
+        position_before = board.copy()
+        try:
+            entry = shortcuts.entry_for(ply_count, position_before, move)
+            if entry is None:
+                entry = _deep_entry(engine, ply_count, position_before, move, depth, time_limit)
+            board.push(move)
+            yield ply_count, entry
+        except Exception as e:
+            logger.error("❌ Erreur analyse coup %d: %s", (ply_count + 1) // 2, e)
+            # Jouer le coup même en cas d'erreur
+            if len(board.move_stack) < ply_count:
+                board.push(move)
+            yield ply_count, None
+
+
+def _walk_incremental(engine, board, moves, depth, time_limit, game_key, shortcuts):
+    """Mode incrémental : une seule recherche par position, réutilisée pour le coup précédent"""
+    import chess.engine
+
+    def search(position):
+        limit = chess.engine.Limit(depth=adaptive_depth_for(position, depth), time=time_limit)
+        # Même identifiant de partie à chaque appel : la table de hachage du moteur est conservée
+        with engine.analysis(position, limit, multipv=MULTIPV, game=game_key) as analysis:
+            analysis.wait()
+            return analysis.multipv
+
+    infos = None
+    for ply_count, move in enumerate(moves, start=1):
+        position_before = board.copy()
+        is_last_move = ply_count == len(moves)
+        try:
+            entry = shortcuts.entry_for(ply_count, position_before, move)
+            if entry is not None:
+                board.push(move)
+                infos = None
+                yield ply_count, entry
+                continue
+
+            if infos is None:
+                infos = search(position_before)
+            top_moves = build_top_moves(position_before, infos)
+            if not top_moves:
+                raise Exception("Aucun coup trouvé par Stockfish")
+
+            played_move_eval, played_move_rank = find_played_move(top_moves, move)
+
+            # Jouer le coup réel ; la position suivante sera analysée une seule fois
+            board.push(move)
+            infos = None
+            if not is_last_move or played_move_eval is None:
+                infos = search(board)
+
+            # Coup hors des meilleurs coups : l'évaluation après est celle de la position suivante
+            if played_move_eval is None:
+                played_move_eval = score_to_centipawns(infos[0].get("score", _default_score(board)) if infos else _default_score(board))
+                played_move_rank = len(top_moves) + 1
+
+            centipawn_loss = compute_centipawn_loss(position_before.turn, top_moves[0]['evaluation'], played_move_eval)
+
+            opponent_punishment = None
+            if centipawn_loss >= 100:
+                if infos is None:
+                    infos = search(board)
+                opponent_punishment = build_opponent_punishment(board, infos)
+
+            yield ply_count, build_move_entry(
+                ply_count, position_before, move, top_moves, played_move_eval, played_move_rank,
+                opponent_punishment, adaptive_depth_for(position_before, depth), time_limit,
+            )
+        except Exception as e:
+            logger.error("❌ Erreur analyse coup %d: %s", (ply_count + 1) // 2, e)
+            if len(board.move_stack) < ply_count:
+                board.push(move)
+            infos = None
+            yield ply_count, None
+
+
+def _walk_budget(engine, board, moves, depth, time_limit, shortcuts, time_budget):
+    """Mode budget : passe rapide sur toute la partie, analyse complète des seuls coups critiques"""
+    import chess.engine
+
+    started = time.monotonic()
+    shallow_limit = chess.engine.Limit(depth=min(SHALLOW_DEPTH, depth), time=min(SHALLOW_TIME, time_limit))
+
+    # Positions avant chaque coup, et coups déjà classés par le livre ou les tables
+    positions = []
+    entries = {}
+    for ply_count, move in enumerate(moves, start=1):
+        positions.append(board.copy())
+        try:
+            entry = shortcuts.entry_for(ply_count, board, move)
+        except Exception as e:
+            logger.warning("⚠️ Livre/tables indisponibles pour le coup %d: %s", (ply_count + 1) // 2, e)
+            entry = None
+        if entry is not None:
+            entries[ply_count] = entry
+        board.push(move)
+    positions.append(board.copy())
+
+    # Passe rapide : une variante par position utile (avant ou après un coup à analyser)
+    shallow = {}
+    for index, position in enumerate(positions):
+        needed_before = index < len(moves) and index + 1 not in entries
+        needed_after = index > 0 and index not in entries
+        if not (needed_before or needed_after):
+            continue
+        try:
+            shallow[index] = engine.analyse(position, shallow_limit)
+        except Exception as e:
+            logger.warning("⚠️ Passe rapide échouée sur le demi-coup %d: %s", index, e)
+
+    candidates = []
+    for ply_count, move in enumerate(moves, start=1):
+        if ply_count in entries:
+            continue
+        position_before = positions[ply_count - 1]
+        try:
+            top_moves = build_top_moves(position_before, shallow[ply_count - 1])
+            if not top_moves:
+                raise Exception("Aucun coup trouvé par Stockfish")
+            played_move_eval, played_move_rank = find_played_move(top_moves, move)
+            if played_move_eval is None:
+                after_info = shallow[ply_count]
+                played_move_eval = score_to_centipawns(after_info.get("score", _default_score(positions[ply_count])))
+            entry = build_move_entry(
+                ply_count, position_before, move, top_moves, played_move_eval, played_move_rank,
+                None, shallow_limit.depth, shallow_limit.time, source='shallow',
+            )
+        except Exception as e:
+            # Passe rapide incomplète : le coup passe directement en analyse complète
+            logger.warning("⚠️ Évaluation rapide impossible pour le coup %d: %s", (ply_count + 1) // 2, e)
+            entry = None
+        entries[ply_count] = entry
+        swing = entry['centipawn_loss'] if entry else None
+        if entry is None or (not entry['is_best_move'] and swing >= BUDGET_SWING_THRESHOLD):
+            candidates.append((swing if swing is not None else float('inf'), ply_count))
+
+    # Passe profonde : les plus fortes chutes d'évaluation d'abord. Les coups sans
+    # évaluation rapide (swing infini, en tête de liste) sont toujours analysés,
+    # même budget épuisé : sinon ils manqueraient dans moves_data
+    candidates.sort(reverse=True)
+    deep_count = 0
+    for swing, ply_count in candidates:
+        if swing != float('inf') and time.monotonic() - started >= time_budget:
+            logger.info("⏱️ Budget de %ss épuisé : %d coups critiques gardent l'évaluation rapide", time_budget, len(candidates) - deep_count)
+            break
+        try:
+            entries[ply_count] = _deep_entry(engine, ply_count, positions[ply_count - 1], moves[ply_count - 1], depth, time_limit)
+            deep_count += 1
+        except Exception as e:
+            logger.error("❌ Erreur analyse coup %d: %s", (ply_count + 1) // 2, e)
+
+    for ply_count in range(1, len(moves) + 1):
+        yield ply_count, entries.get(ply_count)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ChessTrainerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chessTrainer'
+
+    def ready(self):
+        """Importer les signaux quand l'app est prête"""
+        import chessTrainer.signals
@@ -0,0 +1,50 @@
+"""
+Pendules des parties : temps restant après chaque demi-coup, format compact
+
+Les PGN Chess.com portent le temps restant du joueur après chacun de ses coups
+({[%clk 0:09:58.5]}). Ces pendules sont lues une seule fois, à l'enregistrement
+du PGN (ChessGame.save_blobs), et stockées dans ChessGameData.clocks : un
+entier non signé 32 bits little-endian par demi-coup, en dixièmes de seconde
+(NO_CLOCK pour un coup sans pendule), sans compression. NumPy lit ce tableau
+tel quel (np.frombuffer(raw, CLOCK_DTYPE)), sans relire le PGN ni décoder
+de JSON (voir timeuse.py).
+"""
+import sys
+from array import array
+
+from .pgn import read_mainline
+
+NO_CLOCK = 0xFFFFFFFF
+# Type NumPy équivalent du format stocké
+CLOCK_DTYPE = '<u4'
+
+
+def clocks_from_pgn(pgn):
+    """Temps restant (secondes) après chaque demi-coup ; [] si le PGN n'a pas de pendule"""
+    if not pgn:
+        return []
+    clocks = read_mainline(pgn, clocks=True)['clocks']
+    return clocks if any(clock is not None for clock in clocks) else []
+
+
+def pack_clocks(clocks):
+    column = array('I', (NO_CLOCK if clock is None else round(clock * 10) for clock in clocks))
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column.tobytes()
+
+
+def unpack_clocks(raw):
+    column = array('I')
+    column.frombytes(bytes(raw))
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return [None if value == NO_CLOCK else value / 10 for value in column]
+
+
+def parse_time_control(time_control):
+    """(temps initial, incrément) en secondes d'un time_control Chess.com ('600', '180+2') ; None en correspondance"""
+    base, _, increment = (time_control or '').partition('+')
+    if not base.isdigit() or (increment and not increment.isdigit()):
+        return None
+    return int(base), int(increment or 0)
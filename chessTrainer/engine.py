@@ -0,0 +1,152 @@
+"""
+Moteur d'analyse : python-chess et Stockfish chargés au premier usage
+
+Les vues sont importées au chargement des URL, donc par chaque processus et
+chaque commande manage.py. Importer python-chess (tables de bitboards calculées
+à l'import, asyncio pour chess.engine) et chercher Stockfish sur le disque y
+coûtait une centaine de millisecondes, même sans aucune analyse. Ce module ne
+fait rien à l'import :
+- chess_available() vérifie seulement que le paquet est installé ;
+- stockfish_path() cherche l'exécutable au premier appel (settings.STOCKFISH_PATH,
+  sinon les emplacements habituels) et garde le résultat ;
+- open_engine() prête un processus Stockfish du pool, démarré et configuré
+  (STOCKFISH_HASH, STOCKFISH_THREADS) à la première demande puis réutilisé.
+
+STOCKFISH_POOL_SIZE borne le nombre de moteurs simultanés : une analyse de plus
+attend qu'un moteur se libère au lieu de lancer un processus supplémentaire.
+"""
+import importlib.util
+import logging
+import shutil
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger('chessTrainer.analysis')
+
+# Emplacements essayés si settings.STOCKFISH_PATH n'est pas défini
+STOCKFISH_CANDIDATES = (
+    "/opt/homebrew/bin/stockfish",  # Homebrew sur Apple Silicon
+    "/usr/local/bin/stockfish",     # Homebrew sur Intel
+    "stockfish",                    # Dans le PATH
+    "/usr/bin/stockfish",           # Installation système Linux
+)
+
+
+@lru_cache(maxsize=None)
+def chess_available():
+    """python-chess est-il installé (sans l'importer)"""
+    return importlib.util.find_spec('chess') is not None
+
+
+@lru_cache(maxsize=None)
+def stockfish_path():
+    """Chemin de l'exécutable Stockfish, cherché au premier appel ; None s'il est introuvable"""
+    configured = getattr(settings, 'STOCKFISH_PATH', None)
+    for candidate in (configured,) if configured else STOCKFISH_CANDIDATES:
+        path = shutil.which(candidate)
+        if path:
+            logger.info("✅ Stockfish trouvé: %s", path)
+            return path
+    logger.warning("❌ Stockfish non trouvé. Installation recommandée: brew install stockfish")
+    return None
+
+
+def stockfish_available():
+    return chess_available() and stockfish_path() is not None
+
+
+def engine_options():
+    return {
+        'Hash': getattr(settings, 'STOCKFISH_HASH', 128),
+        'Threads': getattr(settings, 'STOCKFISH_THREADS', 1),
+    }
+
+
+def start_engine(path=None):
+    """Démarrer un processus Stockfish configuré, hors pool (path : par défaut stockfish_path())"""
+    import chess.engine
+
+    engine = chess.engine.SimpleEngine.popen_uci(path or stockfish_path())
+    engine.configure(engine_options())
+    return engine
+
+
+class EnginePool:
+    """Processus Stockfish gardés ouverts entre deux analyses"""
+
+    def __init__(self, size):
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def _spawn(self):
+        engine = start_engine()
+        if self._watcher is None:
+            # Le thread d'un moteur n'est pas démon : fermer les moteurs inactifs à la
+            # fin du thread principal pour ne pas bloquer l'arrêt du processus
+            self._watcher = threading.Thread(target=self._close_at_exit, name='stockfish-pool', daemon=True)
+            self._watcher.start()
+        return engine
+
+    def _close_at_exit(self):
+        threading.main_thread().join()
+        self.close()
+
+    @contextmanager
+    def engine(self):
+        with self._slots:
+            with self._lock:
+                engine = self._idle.pop() if self._idle else None
+            if engine is None:
+                engine = self._spawn()
+            try:
+                yield engine
+            except BaseException:
+                # Moteur peut-être dans un état incohérent (recherche interrompue, processus mort)
+                _quit(engine)
+                raise
+            with self._lock:
+                self._idle.append(engine)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for engine in idle:
+            _quit(engine)
+
+
+def _quit(engine):
+    try:
+        engine.quit()
+    except Exception:
+        logger.debug("Arrêt du moteur impossible", exc_info=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def engine_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = EnginePool(getattr(settings, 'STOCKFISH_POOL_SIZE', 2))
+        return _pool
+
+
+def open_engine():
+    """Emprunter un moteur Stockfish configuré : with open_engine() as engine: ..."""
+    return engine_pool().engine()
+
+
+def close_engines():
+    """Arrêter les moteurs inactifs ; le pool suivant relira les réglages"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
@@ -0,0 +1,85 @@
+"""
+Explorateur d'ouvertures personnel : arbre des coups joués par un joueur
+
+Pour chaque joueur et chaque couleur, l'arbre associe à une position (clé
+Zobrist) les coups joués depuis cette position, avec le nombre de parties, le
+score du joueur et la perte moyenne en centipawns des parties analysées
+(OpeningNode). Les transpositions se rejoignent naturellement sur la même clé.
+
+L'arbre est matérialisé au fil de l'eau : chaque indexation d'une partie
+(synchronisation puis analyse, voir positions.index_game_positions) y reporte la
+différence entre les positions déjà indexées de la partie et les nouvelles, par
+incréments F(). Réindexer une partie ne la compte donc jamais deux fois.
+"""
+from collections import defaultdict
+
+from django.db.models import F
+
+from .models import OpeningNode
+
+# Profondeur de l'arbre (demi-coups depuis le début de la partie)
+OPENING_PLIES = 30
+
+
+def game_outcome(player_result):
+    """Compteur du résultat de la partie pour le joueur ; tout ce qui n'est ni gain ni perte compte comme nulle"""
+    if player_result == 'win':
+        return 'wins'
+    elif player_result == 'loss':
+        return 'losses'
+    return 'draws'
+
+
+def tree_contributions(rows, outcome):
+    """Compteurs ajoutés à l'arbre par les positions d'une partie : {(zobrist, coup): (san, compteurs)}
+
+    Un même coup joué deux fois depuis la même position (répétition) ne compte
+    qu'une partie.
+    """
+    contributions = {}
+    for row in rows:
+        if row.ply > OPENING_PLIES:
+            continue
+        san, counters = contributions.setdefault(
+            (row.zobrist, row.move), (row.move_san, {'games': 1, outcome: 1})
+        )
+        if row.centipawn_loss is not None:
+            counters['centipawn_loss_total'] = counters.get('centipawn_loss_total', 0) + row.centipawn_loss
+            counters['centipawn_loss_count'] = counters.get('centipawn_loss_count', 0) + 1
+    return contributions
+
+
+def update_opening_tree(chess_game, old_rows, new_rows):
+    """Reporter dans l'arbre d'un joueur le passage des anciennes aux nouvelles positions d'une partie"""
+    color = chess_game.player_color or (
+        'white' if chess_game.white_player.lower() == chess_game.username.lower() else 'black'
+    )
+    outcome = game_outcome(chess_game.player_result)
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    sans = {}
+    for rows, sign in ((old_rows, -1), (new_rows, 1)):
+        for key, (san, counters) in tree_contributions(rows, outcome).items():
+            sans[key] = san
+            for counter, value in counters.items():
+                deltas[key][counter] += sign * value
+
+    removed = False
+    for (zobrist, move), delta in deltas.items():
+        delta = {counter: value for counter, value in delta.items() if value}
+        if not delta:
+            continue
+        node = {'username': chess_game.username, 'color': color, 'zobrist': zobrist, 'move': move}
+        updates = {counter: F(counter) + value for counter, value in delta.items()}
+        if not OpeningNode.objects.filter(**node).update(**updates) and delta.get('games', 0) > 0:
+            OpeningNode.objects.get_or_create(**node, defaults={'move_san': sans[(zobrist, move)]})
+            OpeningNode.objects.filter(**node).update(**updates)
+        removed = removed or delta.get('games', 0) < 0
+
+    if removed:
+        OpeningNode.objects.filter(username=chess_game.username, color=color, games__lte=0).delete()
+
+
+def opening_children(username, color, key):
+    """Coups joués depuis une position (clé Zobrist signée), des plus fréquents aux moins fréquents"""
+    return OpeningNode.objects.filter(username=username, color=color, zobrist=key).order_by('-games', 'move')
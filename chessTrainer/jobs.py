@@ -0,0 +1,354 @@
+"""
+File d'attente durable des analyses Stockfish (table AnalysisJob)
+
+Les vues ne lancent plus de threads d'analyse : elles enregistrent une demande
+(enqueue_analysis) et la commande `manage.py analysis_worker` exécute les jobs.
+Un job est réservé par un worker pour une durée limitée (bail), prolongée à
+chaque progression de l'analyse : si le worker s'arrête (rechargement du
+serveur, crash), le job redevient disponible à l'expiration du bail et un autre
+worker le reprend. La progression est écrite dans le job, ce qui permet aux
+flux SSE de la suivre depuis n'importe quel processus.
+
+Priorités (PRIORITIES) : la partie qu'un joueur consulte passe devant les
+parties d'une synchronisation, elles-mêmes devant une analyse de masse. Un
+worker ne s'interrompt pas au milieu d'une partie mais choisit le job le plus
+prioritaire à chaque nouvelle partie.
+
+Sans worker lancé, les demandes restent en attente : au-delà de
+WORKER_STALL_SECONDS, les événements SSE et queue_status() le signalent. Pour
+un serveur de développement ou une installation à un seul processus,
+settings.CHESS_ANALYSIS_IN_PROCESS = True exécute la file dans un thread du
+serveur web, démarré après chaque nouvelle demande.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import AnalysisJob, ChessGame
+
+# Durée du bail d'un job (secondes), prolongée à chaque progression
+LEASE_SECONDS = 300
+# Au-delà, un job qui échoue (ou dont le worker meurt) est abandonné
+MAX_ATTEMPTS = 3
+
+WAITING_MESSAGE = "En attente d'un worker d'analyse..."
+# Demande en attente depuis plus longtemps (secondes), sans job en cours : aucun worker ne tourne
+WORKER_STALL_SECONDS = 60
+NO_WORKER_MESSAGE = "Aucun worker d'analyse ne répond : lancer `python manage.py analysis_worker`"
+
+logger = logging.getLogger('chessTrainer.analysis')
+
+_inline_lock = threading.Lock()
+_inline_thread = None
+
+# Classes de priorité par nom (options des commandes)
+PRIORITIES = {
+    'bulk': AnalysisJob.PRIORITY_BULK,
+    'sync': AnalysisJob.PRIORITY_SYNC,
+    'interactive': AnalysisJob.PRIORITY_INTERACTIVE,
+}
+
+
+def default_worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_analysis(game, priority=AnalysisJob.PRIORITY_BULK, force=False, batch_id=''):
+    """
+    Demander l'analyse d'une partie ; retourne (job, créé)
+
+    Si une demande est déjà active pour cette partie, y compris depuis la vue
+    d'un autre joueur suivi (même game_id, analyse partagée), elle est
+    réutilisée : sa priorité est relevée si besoin et elle rejoint le nouveau lot.
+    """
+    job = AnalysisJob.objects.filter(game__game_id=game.game_id, state__in=AnalysisJob.ACTIVE_STATES).first()
+    if job is not None:
+        updates = {}
+        if priority > job.priority:
+            updates['priority'] = priority
+        if force and not job.force and job.state == 'pending':
+            updates['force'] = True
+        if batch_id and job.batch_id != batch_id:
+            updates['batch_id'] = batch_id
+        if updates:
+            AnalysisJob.objects.filter(pk=job.pk).update(**updates)
+            for field, value in updates.items():
+                setattr(job, field, value)
+        return job, False
+
+    try:
+        with transaction.atomic():
+            job = AnalysisJob.objects.create(
+                game=game,
+                username=game.username,
+                priority=priority,
+                force=force,
+                batch_id=batch_id,
+                message=WAITING_MESSAGE,
+            )
+        transaction.on_commit(start_inline_worker)
+        return job, True
+    except IntegrityError:
+        # Demande créée au même moment par une autre requête : la réutiliser
+        return enqueue_analysis(game, priority, force, batch_id)
+
+
+def enqueue_unanalyzed_games(username, priority=AnalysisJob.PRIORITY_BULK, batch_id=''):
+    """Mettre en file toutes les parties non analysées d'un joueur ; retourne le nombre de parties concernées"""
+    games = ChessGame.objects.filter(username=username, analyzed=False, has_pgn=True).order_by('-end_time')
+    count = 0
+    for game in games.only('id', 'game_id', 'username'):
+        enqueue_analysis(game, priority=priority, batch_id=batch_id)
+        count += 1
+    return count
+
+
+def lease_job(worker, lease_seconds=LEASE_SECONDS, min_priority=None):
+    """
+    Réserver le prochain job (priorité la plus haute, puis le plus ancien)
+
+    Les jobs en cours dont le bail a expiré sont repris. min_priority permet de
+    réserver un worker aux demandes interactives. Retourne None si la file est
+    vide.
+    """
+    while True:
+        now = timezone.now()
+        available = Q(state='pending') | Q(state='running', leased_until__lt=now)
+        if min_priority is not None:
+            available &= Q(priority__gte=min_priority)
+        job = AnalysisJob.objects.filter(available).order_by('-priority', 'created_at').first()
+        if job is None:
+            return None
+
+        # Réservation atomique : sans effet si un autre worker a pris le job entre-temps
+        claimed = AnalysisJob.objects.filter(available, pk=job.pk).update(
+            state='running',
+            worker=worker,
+            leased_until=now + timedelta(seconds=lease_seconds),
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if not claimed:
+            continue
+
+        job.refresh_from_db()
+        if job.attempts > MAX_ATTEMPTS:
+            _finish(job, 'failed', error=job.error or "Nombre maximal de tentatives atteint")
+            continue
+        return job
+
+
+def start_inline_worker():
+    """Exécuter la file dans un thread du serveur web (settings.CHESS_ANALYSIS_IN_PROCESS)"""
+    global _inline_thread
+
+    if not getattr(settings, 'CHESS_ANALYSIS_IN_PROCESS', False):
+        return
+    from .engine import stockfish_available
+    if not stockfish_available():
+        return
+
+    with _inline_lock:
+        if _inline_thread is not None and _inline_thread.is_alive():
+            return
+        _inline_thread = threading.Thread(target=_inline_worker_loop, name='chess-analysis', daemon=True)
+        _inline_thread.start()
+
+
+def _inline_worker_loop():
+    """Traite les jobs jusqu'à ce que la file soit vide"""
+    global _inline_thread
+    worker = f"{default_worker_name()}:web"
+    try:
+        while True:
+            job = lease_job(worker)
+            if job is not None:
+                run_job(job)
+                continue
+            # Vérification finale sous verrou : une demande arrivée entre-temps relancerait sinon un thread
+            with _inline_lock:
+                if not AnalysisJob.objects.filter(state='pending').exists():
+                    _inline_thread = None
+                    return
+    except Exception:
+        logger.exception("❌ Worker d'analyse intégré arrêté")
+        with _inline_lock:
+            _inline_thread = None
+    finally:
+        connection.close()
+
+
+def queue_status():
+    """État de la file : demandes en attente, ancienneté de la plus ancienne, worker actif
+
+    worker_missing signale une demande en attente depuis plus de
+    WORKER_STALL_SECONDS sans aucun job en cours (worker non lancé ou arrêté).
+    """
+    now = timezone.now()
+    pending = AnalysisJob.objects.filter(state='pending')
+    oldest = pending.order_by('updated_at').values_list('updated_at', flat=True).first()
+    oldest_seconds = int((now - oldest).total_seconds()) if oldest else 0
+    running = AnalysisJob.objects.filter(state='running', leased_until__gte=now).count()
+    return {
+        'pending_jobs': pending.count(),
+        'oldest_pending_seconds': oldest_seconds,
+        'running_jobs': running,
+        'worker_missing': oldest_seconds > WORKER_STALL_SECONDS and not running,
+    }
+
+
+def _waiting_message():
+    return NO_WORKER_MESSAGE if queue_status()['worker_missing'] else WAITING_MESSAGE
+
+
+def release_job(job):
+    """Remettre un job réservé en attente sans consommer de tentative (arrêt volontaire du worker)"""
+    AnalysisJob.objects.filter(pk=job.pk, state='running', worker=job.worker).update(
+        state='pending',
+        leased_until=None,
+        attempts=F('attempts') - 1,
+        message=WAITING_MESSAGE,
+        updated_at=timezone.now(),
+    )
+
+
+def _finish(job, state, **fields):
+    AnalysisJob.objects.filter(pk=job.pk).update(
+        state=state,
+        leased_until=None,
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+        **fields,
+    )
+    job.refresh_from_db()
+
+
+def run_job(job, lease_seconds=LEASE_SECONDS):
+    """Analyser la partie d'un job réservé ; retourne True si l'analyse a réussi"""
+    from .views import analyze_game_with_stockfish
+
+    game = ChessGame.objects.get(pk=job.game_id)
+    if game.analyzed and not job.force:
+        _finish(job, 'done', progress=100, message="Partie déjà analysée")
+        return True
+
+    def progress_callback(progress, message, current, total, errors):
+        # Chaque progression prolonge le bail du job
+        now = timezone.now()
+        AnalysisJob.objects.filter(pk=job.pk, worker=job.worker).update(
+            progress=max(0, progress),
+            message=message[:255],
+            current_move=current,
+            total_moves=total,
+            errors_count=errors,
+            leased_until=now + timedelta(seconds=lease_seconds),
+            updated_at=now,
+        )
+
+    try:
+        if job.force and game.analyzed:
+            # Ré-analyse forcée : toutes les vues de la partie repassent non analysées ;
+            # l'analyse partagée (ChessGameData) n'est remplacée qu'en cas de succès
+            ChessGame.objects.filter(game_id=game.game_id).update(
+                analyzed=False, error_count=None, inaccuracy_count=None, mistake_count=None, blunder_count=None, accuracy=None,
+            )
+            game.refresh_from_db()
+
+        success = analyze_game_with_stockfish(game, progress_callback=progress_callback)
+        error = "" if success else (game.analysis_error or "L'analyse de la partie a échoué")
+    except Exception as e:
+        success, error = False, str(e)
+
+    if success:
+        moves_data = game.moves_data or {}
+        _finish(
+            job, 'done',
+            progress=100,
+            message="Analyse terminée !",
+            current_move=moves_data.get('total_moves', 0),
+            total_moves=moves_data.get('total_moves', 0),
+            errors_count=moves_data.get('errors_count', 0),
+            error='',
+        )
+    elif job.attempts < MAX_ATTEMPTS:
+        # Nouvelle tentative plus tard
+        AnalysisJob.objects.filter(pk=job.pk).update(
+            state='pending', leased_until=None, error=error, message=WAITING_MESSAGE, updated_at=timezone.now(),
+        )
+        job.refresh_from_db()
+    else:
+        _finish(job, 'failed', message=f"Erreur: {error}"[:255], error=error)
+    return success
+
+
+def game_event(game_id):
+    """État de la dernière demande d'analyse d'une partie, au format des événements SSE
+
+    L'analyse étant partagée, la demande peut venir de la vue d'un autre joueur de la partie.
+    """
+    job = AnalysisJob.objects.filter(game__game_id=game_id).order_by('-created_at').first()
+    if job is None:
+        return None
+    status = {'pending': 'running', 'running': 'running', 'done': 'completed', 'failed': 'error'}[job.state]
+    return {
+        'progress': 100 if job.state == 'done' else job.progress,
+        'message': _waiting_message() if job.state == 'pending' else job.message,
+        'current_move': job.current_move,
+        'total_moves': job.total_moves,
+        'errors_count': job.errors_count,
+        'status': status,
+    }
+
+
+def batch_event(batch_id):
+    """État d'une analyse groupée au format des événements SSE, ou None si le lot n'a aucun job"""
+    jobs = AnalysisJob.objects.filter(batch_id=batch_id)
+    counts = jobs.aggregate(
+        total=Count('id'),
+        finished=Count('id', filter=Q(state__in=['done', 'failed'])),
+        failed=Count('id', filter=Q(state='failed')),
+        errors=Sum('errors_count'),
+    )
+    total, finished = counts['total'], counts['finished']
+    if not total:
+        return None
+
+    event = {
+        'progress': int(finished / total * 100),
+        'total_games': total,
+        'errors_count': counts['errors'] or 0,
+    }
+    if finished < total:
+        running = jobs.filter(state='running').select_related('game').first()
+        event.update({
+            'type': 'analysis_progress',
+            'status': 'running',
+            'message': f"Analyse de la partie {finished + 1}/{total}",
+            'current_game': finished + 1,
+            'game_info': f"{running.game.white_player} vs {running.game.black_player}" if running else _waiting_message(),
+        })
+    else:
+        analyzed_games = total - counts['failed']
+        event.update({
+            'type': 'finished',
+            'status': 'completed',
+            'message': f"Analyse terminée ! {analyzed_games} parties analysées",
+            'current_game': total,
+            'analyzed_games': analyzed_games,
+            'games_count': analyzed_games,
+        })
+    return event
+
+
+def active_batch(username):
+    """Identifiant du lot d'analyse en cours pour un joueur, ou None"""
+    return AnalysisJob.objects.filter(
+        username=username, state__in=AnalysisJob.ACTIVE_STATES,
+    ).exclude(batch_id='').order_by('-created_at').values_list('batch_id', flat=True).first()
@@ -0,0 +1,178 @@
+"""
+Bibliothèque de parties d'un joueur : filtres et pagination par curseur (keyset)
+
+Les pages sont lues à partir des colonnes de résumé de ChessGame, sans charger
+pgn ni moves_data. Le curseur encode les valeurs de tri de la dernière partie
+renvoyée : la page suivante est un simple WHERE sur l'index (username, end_time),
+quel que soit le nombre de parties déjà parcourues.
+"""
+import base64
+import json
+import re
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import DRAW_RESULTS, deduce_player_results
+
+DEFAULT_PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+
+# Colonnes projetées pour l'affichage d'une partie
+LIBRARY_FIELDS = (
+    'id', 'game_id', 'game_url', 'white_player', 'black_player', 'result',
+    'time_control', 'time_class', 'start_time', 'end_time', 'analyzed',
+    'player_color', 'player_result', 'error_count', 'mistake_count', 'blunder_count',
+    'accuracy', 'eco', 'opening',
+)
+
+# Clés de tri (toutes décroissantes, la clé primaire départage les égalités)
+SORTS = {
+    'date': ('end_time', 'id'),
+    'errors': ('errors', 'end_time', 'id'),
+}
+
+ECO_PATTERN = re.compile(r'^[A-E]\d{0,2}$', re.IGNORECASE)
+
+
+class LibraryError(ValueError):
+    """Paramètre de filtre, de tri ou de curseur invalide"""
+
+
+def _parse_day(value, name):
+    day = parse_date(value)
+    if day is None:
+        raise LibraryError(f"Date invalide pour {name}: {value} (format attendu AAAA-MM-JJ)")
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_games(queryset, params):
+    """Appliquer les filtres de la requête (cadence, couleur, résultat, analyse, dates, ouverture)"""
+    cadence = params.get('cadence')
+    if cadence:
+        queryset = queryset.filter(time_class__in=cadence.split(','))
+
+    color = params.get('color')
+    if color:
+        if color not in ('white', 'black'):
+            raise LibraryError(f"Couleur invalide: {color}")
+        queryset = queryset.filter(player_color=color)
+
+    result = params.get('result')
+    if result:
+        if result == 'draw':
+            queryset = queryset.filter(player_result__in=DRAW_RESULTS)
+        elif result in ('win', 'loss'):
+            queryset = queryset.filter(player_result=result)
+        else:
+            raise LibraryError(f"Résultat invalide: {result}")
+
+    analyzed = params.get('analyzed')
+    if analyzed:
+        queryset = queryset.filter(analyzed=analyzed.lower() == 'true')
+
+    if params.get('date_from'):
+        queryset = queryset.filter(end_time__gte=_parse_day(params['date_from'], 'date_from'))
+    if params.get('date_to'):
+        queryset = queryset.filter(end_time__lt=_parse_day(params['date_to'], 'date_to') + timedelta(days=1))
+
+    opening = params.get('opening', '').strip()
+    if opening:
+        if ECO_PATTERN.match(opening):
+            queryset = queryset.filter(eco__istartswith=opening)
+        else:
+            queryset = queryset.filter(opening__icontains=opening)
+
+    return queryset
+
+
+def encode_cursor(values):
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if len(values) != len(keys):
+            raise ValueError
+        return [datetime.fromisoformat(value) if key == 'end_time' else int(value) for key, value in zip(keys, values)]
+    except (ValueError, TypeError):
+        raise LibraryError("Curseur invalide")
+
+
+def paginate_games(queryset, sort='date', cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """Retourner (lignes de la page, curseur suivant ou None) pour un tri donné"""
+    if sort not in SORTS:
+        raise LibraryError(f"Tri invalide: {sort}")
+    keys = SORTS[sort]
+
+    if 'errors' in keys:
+        # Parties non analysées en dernier
+        queryset = queryset.annotate(errors=Coalesce('error_count', Value(-1)))
+    queryset = queryset.order_by(*[f'-{key}' for key in keys])
+
+    if cursor:
+        values = decode_cursor(cursor, keys)
+        # (k1 < v1) OU (k1 = v1 ET k2 < v2) OU ...
+        condition = Q()
+        for i, key in enumerate(keys):
+            equal = dict(zip(keys[:i], values[:i]))
+            condition |= Q(**equal, **{f'{key}__lt': values[i]})
+        queryset = queryset.filter(condition)
+
+    fields = LIBRARY_FIELDS + (('errors',) if 'errors' in keys else ())
+    rows = list(queryset.values(*fields)[:page_size + 1])
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor([rows[-1][key] for key in keys])
+    return rows, next_cursor
+
+
+def build_game_info(row):
+    """Format d'affichage d'une partie (carte de games_list.html) depuis une ligne values()"""
+    white_result, black_result = deduce_player_results(row['result'], row['white_player'], row['black_player'])
+    return {
+        'game_data': {
+            'url': row['game_url'],
+            'game_id': row['game_id'],
+            'white': {'username': row['white_player'], 'result': white_result},
+            'black': {'username': row['black_player'], 'result': black_result},
+            'time_class': row['time_class'],
+            'time_control': row['time_control'],
+            'start_time': row['start_time'],
+            'end_time': row['end_time']
+        },
+        'error_count': row['error_count'] if row['analyzed'] else None,
+        'is_analyzed': row['analyzed'],
+        'time_class': row['time_class'],
+    }
+
+
+def serialize_game(row):
+    """Représentation JSON d'une partie de la bibliothèque"""
+    white_result, black_result = deduce_player_results(row['result'], row['white_player'], row['black_player'])
+    return {
+        'game_id': row['game_id'],
+        'url': row['game_url'],
+        'white': {'username': row['white_player'], 'result': white_result},
+        'black': {'username': row['black_player'], 'result': black_result},
+        'player_color': row['player_color'],
+        'player_result': row['player_result'],
+        'time_class': row['time_class'],
+        'time_control': row['time_control'],
+        'start_time': row['start_time'].isoformat() if row['start_time'] else None,
+        'end_time': row['end_time'].isoformat() if row['end_time'] else None,
+        'analyzed': row['analyzed'],
+        'error_count': row['error_count'],
+        'mistake_count': row['mistake_count'],
+        'blunder_count': row['blunder_count'],
+        'accuracy': row['accuracy'],
+        'eco': row['eco'],
+        'opening': row['opening'],
+    }
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from chessTrainer.engine import stockfish_available
+from chessTrainer.jobs import LEASE_SECONDS, PRIORITIES, default_worker_name, lease_job, release_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Exécute les analyses Stockfish en file d'attente (AnalysisJob) ; les jobs interrompus sont repris après redémarrage."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', help="Nom du worker (par défaut : machine:pid)")
+        parser.add_argument('--once', action='store_true', help="S'arrêter dès que la file est vide")
+        parser.add_argument('--max-jobs', type=int, default=0, help="S'arrêter après ce nombre de jobs (0 : illimité)")
+        parser.add_argument('--poll', type=float, default=2.0, help="Attente entre deux consultations de la file vide (secondes, défaut : 2)")
+        parser.add_argument('--lease', type=int, default=LEASE_SECONDS, help=f"Durée du bail d'un job (secondes, défaut : {LEASE_SECONDS})")
+        parser.add_argument('--min-priority', choices=list(PRIORITIES), help="N'exécuter que les jobs de cette classe de priorité ou plus (ex : interactive, pour garder un worker disponible pour les parties consultées)")
+
+    def handle(self, *args, **options):
+        if not stockfish_available():
+            raise CommandError("Stockfish n'est pas disponible : aucune analyse ne peut être exécutée.")
+
+        worker = options['name'] or default_worker_name()
+        min_priority = PRIORITIES[options['min_priority']] if options['min_priority'] else None
+        self.stdout.write(f"👷 Worker {worker} démarré" + (f" (priorité minimale : {options['min_priority']})" if min_priority is not None else ""))
+
+        processed = failed = 0
+        job = None
+        try:
+            while True:
+                job = lease_job(worker, options['lease'], min_priority)
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+
+                self.stdout.write(f"🎯 Job {job.pk} : partie {job.game.game_id} ({job.get_priority_display()}, tentative {job.attempts})")
+                if run_job(job, options['lease']):
+                    self.stdout.write("   ✅ Analyse terminée")
+                else:
+                    failed += 1
+                    self.stdout.write(f"   ❌ Échec ({job.get_state_display()}) : {job.error}")
+                job = None
+                processed += 1
+                if options['max_jobs'] and processed >= options['max_jobs']:
+                    break
+        except KeyboardInterrupt:
+            if job is not None:
+                # Arrêt volontaire : le job est rendu immédiatement à la file
+                release_job(job)
+            self.stdout.write("⏹️ Arrêt demandé")
+
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker} arrêté : {processed} jobs traités ({failed} échecs)."))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from chessTrainer.clocks import clocks_from_pgn
+from chessTrainer.models import ChessGameData, decode_blob, encode_blob
+
+
+class Command(BaseCommand):
+    help = "Extrait les pendules ([%clk]) des PGN déjà enregistrés, pour les parties importées avant leur lecture à l'enregistrement."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Relire aussi les parties dont les pendules sont déjà extraites")
+        parser.add_argument('--batch-size', type=int, default=200, help="Nombre de parties par lot (défaut : 200)")
+
+    def handle(self, *args, **options):
+        rows = ChessGameData.objects.exclude(pgn=b'').order_by('pk')
+        if not options['all']:
+            rows = rows.filter(clocks=b'')
+
+        batch_size = options['batch_size']
+        batch = []
+        count = with_clocks = 0
+        for data in rows.only('game_key', 'pgn', 'clocks').iterator(chunk_size=batch_size):
+            clocks = clocks_from_pgn(decode_blob('pgn', data.pgn))
+            data.clocks = encode_blob('clocks', clocks)
+            with_clocks += bool(clocks)
+            batch.append(data)
+            if len(batch) >= batch_size:
+                ChessGameData.objects.bulk_update(batch, ['clocks'])
+                count += len(batch)
+                batch = []
+                self.stdout.write(f"   {count} parties relues...")
+
+        if batch:
+            ChessGameData.objects.bulk_update(batch, ['clocks'])
+            count += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Pendules extraites : {with_clocks} parties sur {count}."))
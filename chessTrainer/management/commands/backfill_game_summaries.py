@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from chessTrainer.models import ChessGame
+
+
+class Command(BaseCommand):
+    help = "Recalcule les colonnes de résumé des parties (cadence, couleur, résultat, erreurs, précision)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="Limiter le recalcul aux parties d'un joueur")
+        parser.add_argument('--batch-size', type=int, default=200, help="Nombre de parties par lot (défaut : 200)")
+
+    def handle(self, *args, **options):
+        games = ChessGame.objects.order_by('pk')
+        if options['username']:
+            games = games.filter(username=options['username'])
+
+        batch_size = options['batch_size']
+        batch = []
+        count = 0
+        for game in games.select_related('blobs').iterator(chunk_size=batch_size):
+            # Charger le PGN et l'analyse (déjà joints) pour recalculer toutes les colonnes
+            game.pgn, game.moves_data
+            game.update_summary()
+            batch.append(game)
+            if len(batch) >= batch_size:
+                ChessGame.objects.bulk_update(batch, ChessGame.SUMMARY_FIELDS)
+                count += len(batch)
+                batch = []
+                self.stdout.write(f"   {count} parties mises à jour...")
+
+        if batch:
+            ChessGame.objects.bulk_update(batch, ChessGame.SUMMARY_FIELDS)
+            count += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Résumés recalculés : {count} parties."))
@@ -0,0 +1,216 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from chessTrainer.analysis import ANALYSIS_MODES
+from chessTrainer.engine import start_engine, stockfish_path
+from chessTrainer.models import ChessGame
+from chessTrainer.pgn import read_mainline
+from chessTrainer.views import analyze_game_with_stockfish
+
+# Parties de référence : courte (mat au 17e coup), longue (87 demi-coups tactiques),
+# finale (plus de la moitié des demi-coups à 10 pièces ou moins), pendules Chess.com
+BENCH_DIR = Path(__file__).resolve().parents[2] / 'bench'
+BENCH_GAMES = ('short', 'long', 'endgame')
+DEFAULT_BASELINE = BENCH_DIR / 'baseline.json'
+
+
+class CountingEngine:
+    """Moteur instrumenté : nœuds et durée cumulés des recherches"""
+
+    def __init__(self, engine):
+        self._engine = engine
+        self.nodes = 0
+        self.search_time = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self._engine, name)
+
+    def _record(self, infos, started):
+        self.search_time += time.perf_counter() - started
+        if not isinstance(infos, list):
+            infos = [infos]
+        # Toutes les variantes MultiPV d'une recherche rapportent le même total de nœuds
+        self.nodes += max((info.get('nodes', 0) for info in infos), default=0)
+
+    def analyse(self, board, limit, **kwargs):
+        started = time.perf_counter()
+        infos = self._engine.analyse(board, limit, **kwargs)
+        self._record(infos, started)
+        return infos
+
+    @contextmanager
+    def analysis(self, board, limit, **kwargs):
+        started = time.perf_counter()
+        with self._engine.analysis(board, limit, **kwargs) as analysis:
+            yield analysis
+        self._record(analysis.multipv, started)
+
+
+class AnalysisRecords(logging.Handler):
+    """Durées des phases (enregistrement DEBUG avec extra timings) et avertissements de l'analyse"""
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.timings = {}
+        self.warnings = []
+
+    def emit(self, record):
+        if hasattr(record, 'timings'):
+            self.timings[record.game_id] = record.timings
+        elif record.levelno >= logging.WARNING:
+            self.warnings.append(record.getMessage())
+
+
+@contextmanager
+def analysis_records():
+    """Capturer le journal chessTrainer.analysis (le détail coup par coup n'est pas affiché)"""
+    logger = logging.getLogger('chessTrainer.analysis')
+    handler = AnalysisRecords()
+    level, propagate = logger.level, logger.propagate
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        yield handler
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = propagate
+
+
+class Command(BaseCommand):
+    help = "Mesure la vitesse et la stabilité de l'analyse Stockfish sur des parties de référence (chessTrainer/bench), comparées à une référence enregistrée."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', nargs='+', choices=BENCH_GAMES, default=list(BENCH_GAMES), help="Parties à analyser (défaut : toutes)")
+        parser.add_argument('--stockfish', help="Exécutable Stockfish à mesurer (défaut : settings.STOCKFISH_PATH ou emplacements habituels)")
+        parser.add_argument('--mode', choices=ANALYSIS_MODES, help="Mode d'analyse (défaut : settings.CHESS_ANALYSIS_MODE)")
+        parser.add_argument('--depth', type=int, default=18, help="Profondeur (défaut : 18)")
+        parser.add_argument('--time', type=float, default=0.5, help="Temps par recherche en secondes (défaut : 0.5)")
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="Fichier de référence JSON (défaut : chessTrainer/bench/baseline.json)")
+        parser.add_argument('--save-baseline', action='store_true', help="Enregistrer cette mesure comme nouvelle référence")
+
+    def handle(self, *args, **options):
+        mode = options['mode'] or getattr(settings, 'CHESS_ANALYSIS_MODE', 'per_ply')
+        path = options['stockfish'] or stockfish_path()
+        if not path:
+            raise CommandError("Stockfish n'est pas disponible : indiquez un exécutable avec --stockfish.")
+        try:
+            engine = start_engine(path)
+        except Exception as e:
+            raise CommandError(f"Impossible de démarrer {path} : {e}")
+
+        baseline_path = Path(options['baseline'])
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else None
+        current = {
+            'engine': getattr(engine, 'id', {}).get('name', path),
+            'mode': mode,
+            'depth': options['depth'],
+            'time': options['time'],
+            'created': timezone.now().isoformat(timespec='seconds'),
+            'games': {},
+        }
+        self.stdout.write(f"🏁 {current['engine']} : mode {mode}, profondeur {options['depth']}, {options['time']} s par recherche")
+        if baseline:
+            differences = [key for key in ('engine', 'mode', 'depth', 'time') if baseline.get(key) != current[key]]
+            if differences:
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️ Référence mesurée avec d'autres réglages ({', '.join(f'{key}={baseline.get(key)}' for key in differences)}) : comparaison indicative"
+                ))
+
+        try:
+            # Parties créées le temps de la mesure : tout est annulé à la fin
+            with transaction.atomic(), analysis_records() as records:
+                for name in options['games']:
+                    current['games'][name] = self.bench_game(name, engine, mode, options, records)
+                transaction.set_rollback(True)
+        finally:
+            engine.quit()
+
+        for message in records.warnings:
+            self.stderr.write(f"   {message}")
+
+        results = current['games'].values()
+        total_plies = sum(result['plies'] for result in results)
+        engine_time = sum(result['timings']['engine'] for result in results) / 1000
+        self.stdout.write(
+            f"📊 Total : {total_plies} demi-coups, moteur {engine_time:.1f} s, "
+            f"{total_plies / engine_time if engine_time else 0:.2f} demi-coups/s"
+        )
+        if baseline:
+            self.report_agreement(current, baseline)
+        elif not options['save_baseline']:
+            self.stdout.write(f"ℹ️ Pas de référence ({baseline_path}) : relancer avec --save-baseline pour en créer une")
+
+        if options['save_baseline']:
+            baseline_path.write_text(json.dumps(current, indent=2, ensure_ascii=False) + '\n')
+            self.stdout.write(f"💾 Référence enregistrée : {baseline_path}")
+        self.stdout.write(self.style.SUCCESS("Mesure terminée."))
+
+    def bench_game(self, name, engine, mode, options, records):
+        pgn = (BENCH_DIR / f'{name}.pgn').read_text()
+        headers = read_mainline(pgn)['headers']
+        now = timezone.now()
+        game = ChessGame.objects.create(
+            username=headers['White'],
+            game_id=f'bench-{name}',
+            game_url=f'https://www.chess.com/game/live/bench-{name}',
+            white_player=headers['White'],
+            black_player=headers['Black'],
+            time_control=headers.get('TimeControl', ''),
+            result=headers['Result'],
+            start_time=now,
+            end_time=now,
+            pgn=pgn,
+        )
+
+        counting = CountingEngine(engine)
+        started = time.perf_counter()
+        if not analyze_game_with_stockfish(game, depth=options['depth'], time_limit=options['time'], mode=mode, engine=counting):
+            raise CommandError(f"Analyse de {name} impossible : {game.analysis_error or 'erreur inconnue'}")
+        wall = time.perf_counter() - started
+
+        plies = game.moves_data['total_moves']
+        timings = {phase: round(seconds * 1000, 1) for phase, seconds in records.timings[game.game_id].items()}
+        result = {
+            'plies': plies,
+            'wall_ms': round(wall * 1000, 1),
+            'timings': timings,
+            'plies_per_second': round(plies / (timings['engine'] / 1000), 3) if timings['engine'] else 0,
+            'nodes': counting.nodes,
+            'nodes_per_second': round(counting.nodes / counting.search_time) if counting.search_time else 0,
+            'qualities': [move['move_quality'] for move in game.moves_data['moves']],
+        }
+        self.stdout.write(
+            f"♟️ {name} : {plies} demi-coups en {wall:.1f} s, {result['plies_per_second']:.2f} demi-coups/s, "
+            f"{result['nodes_per_second'] / 1000:.0f} k nœuds/s "
+            f"(lecture {timings['parse']:.0f} ms, moteur {timings['engine']:.0f} ms, enregistrement {timings['persist']:.0f} ms)"
+        )
+        return result
+
+    def report_agreement(self, current, baseline):
+        """Classement des coups identique à la référence, et vitesse relative"""
+        for name, result in current['games'].items():
+            reference = baseline.get('games', {}).get(name)
+            if not reference:
+                self.stdout.write(f"   {name} : absente de la référence")
+                continue
+            same = sum(a == b for a, b in zip(result['qualities'], reference['qualities']))
+            total = max(len(result['qualities']), len(reference['qualities']))
+            changed = [
+                f"{ply}:{before}→{after}"
+                for ply, (before, after) in enumerate(zip(reference['qualities'], result['qualities']), start=1)
+                if before != after
+            ]
+            speed = result['plies_per_second'] / reference['plies_per_second'] if reference['plies_per_second'] else 0
+            line = f"   {name} : classement identique {same}/{total} ({same / total * 100 if total else 100:.0f}%), vitesse x{speed:.2f}"
+            self.stdout.write(line if same == total else self.style.WARNING(line))
+            if changed:
+                self.stdout.write(f"      demi-coups modifiés : {', '.join(changed[:10])}{' ...' if len(changed) > 10 else ''}")
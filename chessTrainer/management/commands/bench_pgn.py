@@ -0,0 +1,63 @@
+import time
+from io import StringIO
+
+from django.core.management.base import BaseCommand
+from chessTrainer.management.commands.bench_analysis import BENCH_DIR, BENCH_GAMES
+from chessTrainer.models import ChessGame
+from chessTrainer.pgn import read_mainline
+from chessTrainer.positions import build_position_index
+
+
+class Command(BaseCommand):
+    help = "Compare la lecture des PGN par chess.pgn.read_game et par read_mainline (parties de référence et parties Chess.com en base)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="Mesurer aussi les parties de ce joueur enregistrées en base")
+        parser.add_argument('--limit', type=int, default=200, help="Nombre maximal de parties en base (défaut : 200)")
+        parser.add_argument('--repeat', type=int, default=5, help="Nombre de lectures de chaque partie (défaut : 5)")
+
+    def timed(self, func, pgns, repeat):
+        """Durée moyenne (ms) d'une lecture, meilleure de repeat passes sur toutes les parties"""
+        durations = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for pgn in pgns:
+                func(pgn)
+            durations.append(time.perf_counter() - started)
+        return min(durations) / len(pgns) * 1000
+
+    def handle(self, *args, **options):
+        import chess.pgn
+
+        samples = {'référence': [(BENCH_DIR / f'{name}.pgn').read_text() for name in BENCH_GAMES]}
+        if options['username']:
+            games = ChessGame.objects.filter(username=options['username']).order_by('-end_time')[:options['limit']]
+            samples[options['username']] = [game.pgn for game in games if game.pgn]
+
+        for label, pgns in samples.items():
+            if not pgns:
+                self.stdout.write(f"   {label} : aucune partie")
+                continue
+
+            # Mêmes coups SAN que la partie principale de read_game
+            mismatches = 0
+            for pgn in pgns:
+                sans = [node.san() for node in chess.pgn.read_game(StringIO(pgn)).mainline()]
+                if read_mainline(pgn)['sans'] != sans:
+                    mismatches += 1
+
+            plies = sum(len(read_mainline(pgn)['sans']) for pgn in pgns) / len(pgns)
+            repeat = options['repeat']
+            read_game = self.timed(lambda pgn: chess.pgn.read_game(StringIO(pgn)), pgns, repeat)
+            mainline = self.timed(read_mainline, pgns, repeat)
+            with_clocks = self.timed(lambda pgn: read_mainline(pgn, clocks=True), pgns, repeat)
+            replayed = self.timed(build_position_index, pgns, repeat)
+
+            self.stdout.write(f"♟️ {label} : {len(pgns)} parties, {plies:.0f} demi-coups en moyenne")
+            self.stdout.write(f"   chess.pgn.read_game : {read_game:.2f} ms")
+            self.stdout.write(f"   read_mainline : {mainline:.2f} ms (x{read_game / mainline:.1f}), avec pendules {with_clocks:.2f} ms")
+            self.stdout.write(f"   index des positions (read_mainline + coups rejoués) : {replayed:.2f} ms")
+            if mismatches:
+                self.stdout.write(self.style.WARNING(f"   ⚠️ {mismatches} parties lues différemment de read_game"))
+
+        self.stdout.write(self.style.SUCCESS("Mesure terminée."))
@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from chessTrainer.library import paginate_games
+from chessTrainer.models import ChessGame, ChessGameData
+
+
+class Command(BaseCommand):
+    help = "Mesure la taille de la base et le temps des requêtes de liste des parties (avant/après une migration de stockage)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="Joueur utilisé pour les requêtes de liste (par défaut : celui qui a le plus de parties)")
+        parser.add_argument('--repeat', type=int, default=5, help="Nombre de répétitions de chaque requête (défaut : 5)")
+        parser.add_argument('--vacuum', action='store_true', help="Compacter la base (VACUUM) avant la mesure (SQLite)")
+        parser.add_argument('--purge-orphans', action='store_true', help="Supprimer les données de parties qu'aucun joueur ne suit plus")
+
+    def timed(self, label, func, repeat):
+        durations = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - started)
+        self.stdout.write(f"   {label}: {min(durations) * 1000:.1f} ms (meilleur de {repeat})")
+
+    def handle(self, *args, **options):
+        username = options['username']
+        if not username:
+            top = ChessGame.objects.values('username').order_by().annotate(n=Count('id')).order_by('-n').first()
+            username = top['username'] if top else ''
+
+        orphans = ChessGameData.objects.filter(views__isnull=True)
+        if options['purge_orphans']:
+            deleted, _ = orphans.delete()
+            self.stdout.write(f"🧹 {deleted} données de parties orphelines supprimées")
+        else:
+            self.stdout.write(f"🧹 {orphans.count()} données de parties orphelines (--purge-orphans pour les supprimer)")
+
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                if options['vacuum']:
+                    cursor.execute('VACUUM')
+                cursor.execute('PRAGMA page_count')
+                page_count = cursor.fetchone()[0]
+                cursor.execute('PRAGMA page_size')
+                page_size = cursor.fetchone()[0]
+            self.stdout.write(f"💾 Taille de la base : {page_count * page_size / 1024 / 1024:.1f} Mo")
+
+        with connection.cursor() as cursor:
+            table = connection.ops.quote_name(ChessGame._meta.db_table)
+            blob_columns = [field.column for field in ChessGame._meta.concrete_fields if field.get_internal_type() in ('TextField', 'JSONField')]
+            if blob_columns:
+                cursor.execute(f"SELECT {' + '.join(f'COALESCE(LENGTH({column}), 0)' for column in blob_columns)} FROM {table}")
+                main_bytes = sum(row[0] for row in cursor.fetchall())
+                self.stdout.write(f"📦 Données volumineuses dans {ChessGame._meta.db_table} : {main_bytes / 1024 / 1024:.1f} Mo")
+
+            blobs_field = next((field for field in ChessGame._meta.get_fields() if field.name == 'blobs'), None)
+            if blobs_field is not None:
+                data_model = blobs_field.related_model
+                data_table = connection.ops.quote_name(data_model._meta.db_table)
+                cursor.execute(f"SELECT COALESCE(SUM(LENGTH(pgn) + LENGTH(moves_data)), 0) FROM {data_table}")
+                self.stdout.write(f"📦 Données compressées dans {data_model._meta.db_table} : {cursor.fetchone()[0] / 1024 / 1024:.1f} Mo")
+
+        games = ChessGame.objects.filter(username=username)
+        self.stdout.write(f"⏱️ Requêtes pour {username} ({games.count()} parties) :")
+        repeat = options['repeat']
+        self.timed("count()", lambda: games.count(), repeat)
+        self.timed("objets complets (scan de synchronisation)", lambda: list(games.all()), repeat)
+        self.timed("première page de la liste", lambda: paginate_games(games), repeat)
+        self.timed("statistiques par cadence (GROUP BY)", lambda: list(
+            games.order_by().values('time_class').annotate(n=Count('id'))
+        ), repeat)
+
+        self.stdout.write(self.style.SUCCESS("Mesure terminée."))
+
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from chessTrainer.models import ChessGame
+from chessTrainer.positions import index_game_positions
+
+
+class Command(BaseCommand):
+    help = "Indexe par clé Zobrist les positions des parties et reconstruit l'arbre d'ouvertures des joueurs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="Limiter l'indexation aux parties d'un joueur")
+
+    def handle(self, *args, **options):
+        games = ChessGame.objects.order_by('pk')
+        if options['username']:
+            games = games.filter(username=options['username'])
+
+        count = positions = 0
+        for game in games.select_related('blobs').iterator(chunk_size=200):
+            positions += index_game_positions(game)
+            count += 1
+            if count % 200 == 0:
+                self.stdout.write(f"   {count} parties indexées...")
+
+        self.stdout.write(self.style.SUCCESS(f"Positions indexées : {positions} dans {count} parties."))
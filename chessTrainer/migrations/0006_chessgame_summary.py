@@ -0,0 +1,81 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+def fill_time_class(apps, schema_editor):
+    """Cadence et couleur des parties existantes (les compteurs d'erreurs : manage.py backfill_game_summaries)"""
+    ChessGame = apps.get_model('chessTrainer', 'ChessGame')
+    games = []
+    for game in ChessGame.objects.only('username', 'black_player', 'time_control').iterator(chunk_size=500):
+        time_control = game.time_control
+        if '+' in time_control:
+            base_time = int(time_control.split('+')[0])
+        else:
+            base_time = int(time_control) if time_control.isdigit() else 600
+        if base_time < 180:
+            game.time_class = 'bullet'
+        elif base_time < 600:
+            game.time_class = 'blitz'
+        elif base_time < 86400:
+            game.time_class = 'rapid'
+        else:
+            game.time_class = 'daily'
+        game.player_color = 'black' if game.username.lower() == game.black_player.lower() else 'white'
+        games.append(game)
+    ChessGame.objects.bulk_update(games, ['time_class', 'player_color'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chessTrainer', '0005_auto_20250820_0842'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chessgame',
+            name='accuracy',
+            field=models.FloatField(blank=True, help_text='Précision moyenne de la partie', null=True),
+        ),
+        migrations.AddField(
+            model_name='chessgame',
+            name='blunder_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chessgame',
+            name='error_count',
+            field=models.IntegerField(blank=True, help_text='Coups avec une précision < 80% (get_errors)', null=True),
+        ),
+        migrations.AddField(
+            model_name='chessgame',
+            name='inaccuracy_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chessgame',
+            name='mistake_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chessgame',
+            name='player_color',
+            field=models.CharField(blank=True, choices=[('white', 'Blanc'), ('black', 'Noir')], max_length=5),
+        ),
+        migrations.AddField(
+            model_name='chessgame',
+            name='player_result',
+            field=models.CharField(blank=True, help_text='Résultat du point de vue du joueur', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='chessgame',
+            name='time_class',
+            field=models.CharField(blank=True, help_text='Cadence : bullet, blitz, rapid ou daily', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='chessgame',
+            index=models.Index(fields=['username', 'time_class'], name='chessgame_user_timeclass_idx'),
+        ),
+        migrations.RunPython(fill_time_class, migrations.RunPython.noop),
+    ]
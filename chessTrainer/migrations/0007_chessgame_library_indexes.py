@@ -0,0 +1,31 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chessTrainer', '0006_chessgame_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chessgame',
+            name='eco',
+            field=models.CharField(blank=True, help_text="Code ECO de l'ouverture", max_length=3),
+        ),
+        migrations.AddField(
+            model_name='chessgame',
+            name='opening',
+            field=models.CharField(blank=True, help_text="Nom de l'ouverture", max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='chessgame',
+            index=models.Index(fields=['username', 'end_time'], name='chessgame_user_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chessgame',
+            index=models.Index(fields=['username', 'analyzed'], name='chessgame_user_analyzed_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:26
+
+import json
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _compress(text):
+    return zlib.compress(text.encode('utf-8'), 6) if text else b''
+
+
+def move_blobs_to_side_table(apps, schema_editor):
+    """Copier pgn et moves_data, compressés, dans ChessGameData"""
+    ChessGame = apps.get_model('chessTrainer', 'ChessGame')
+    ChessGameData = apps.get_model('chessTrainer', 'ChessGameData')
+
+    ChessGame.objects.exclude(pgn='').update(has_pgn=True)
+
+    batch = []
+    for game_id, pgn, moves_data in ChessGame.objects.values_list('id', 'pgn', 'moves_data').iterator(chunk_size=200):
+        batch.append(ChessGameData(
+            game_id=game_id,
+            pgn=_compress(pgn),
+            moves_data=_compress(json.dumps(moves_data, ensure_ascii=False, separators=(',', ':')) if moves_data else ''),
+        ))
+        if len(batch) >= 200:
+            ChessGameData.objects.bulk_create(batch)
+            batch = []
+    ChessGameData.objects.bulk_create(batch)
+
+
+def restore_blobs(apps, schema_editor):
+    ChessGame = apps.get_model('chessTrainer', 'ChessGame')
+    ChessGameData = apps.get_model('chessTrainer', 'ChessGameData')
+
+    for data in ChessGameData.objects.iterator(chunk_size=200):
+        pgn = zlib.decompress(bytes(data.pgn)).decode('utf-8') if data.pgn else ''
+        moves_data = json.loads(zlib.decompress(bytes(data.moves_data))) if data.moves_data else {}
+        ChessGame.objects.filter(pk=data.game_id).update(pgn=pgn, moves_data=moves_data)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chessTrainer', '0007_chessgame_library_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChessGameData',
+            fields=[
+                ('game', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='blobs', serialize=False, to='chessTrainer.chessgame')),
+                ('pgn', models.BinaryField(default=b'', help_text='PGN compressé')),
+                ('moves_data', models.BinaryField(default=b'', help_text='moves_data JSON compressé')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='chessgame',
+            name='has_pgn',
+            field=models.BooleanField(default=False, help_text="Un PGN est disponible pour l'analyse"),
+        ),
+        migrations.RunPython(move_blobs_to_side_table, restore_blobs),
+        migrations.RemoveField(
+            model_name='chessgame',
+            name='moves_data',
+        ),
+        migrations.RemoveField(
+            model_name='chessgame',
+            name='pgn',
+        ),
+    ]
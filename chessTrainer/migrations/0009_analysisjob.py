@@ -0,0 +1,43 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chessTrainer', '0008_chessgame_blob_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(db_index=True, max_length=100)),
+                ('state', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminé'), ('failed', 'Échec')], default='pending', max_length=10)),
+                ('priority', models.IntegerField(default=0, help_text='Les jobs de priorité la plus haute sont exécutés en premier')),
+                ('force', models.BooleanField(default=False, help_text='Ré-analyser même si la partie est déjà analysée')),
+                ('batch_id', models.CharField(blank=True, db_index=True, help_text="Session d'analyse groupée (suivi SSE)", max_length=64)),
+                ('attempts', models.IntegerField(default=0)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('leased_until', models.DateTimeField(blank=True, null=True)),
+                ('progress', models.IntegerField(default=0)),
+                ('message', models.CharField(blank=True, max_length=255)),
+                ('current_move', models.IntegerField(default=0)),
+                ('total_moves', models.IntegerField(default=0)),
+                ('errors_count', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_jobs', to='chessTrainer.chessgame')),
+            ],
+            options={
+                'ordering': ['-priority', 'created_at'],
+                'indexes': [models.Index(fields=['state', '-priority', 'created_at'], name='analysisjob_queue_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('state__in', ['pending', 'running'])), fields=('game',), name='analysisjob_one_active_per_game')],
+            },
+        ),
+    ]
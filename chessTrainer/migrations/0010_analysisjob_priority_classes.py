@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chessTrainer', '0009_analysisjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analysisjob',
+            name='priority',
+            field=models.IntegerField(choices=[(0, 'Analyse de masse'), (10, 'Synchronisation'), (20, 'Interactive')], default=0, help_text='Les jobs de priorité la plus haute sont exécutés en premier'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chessTrainer', '0010_analysisjob_priority_classes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingposition',
+            name='ease',
+            field=models.FloatField(default=2.5, help_text='Facteur de facilité (SM-2)'),
+        ),
+        migrations.AddField(
+            model_name='trainingposition',
+            name='interval',
+            field=models.FloatField(default=0, help_text='Intervalle entre deux révisions (jours)'),
+        ),
+        migrations.AddField(
+            model_name='trainingposition',
+            name='next_due',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Prochaine révision prévue'),
+        ),
+        migrations.AddField(
+            model_name='trainingposition',
+            name='streak',
+            field=models.IntegerField(default=0, help_text='Réussites consécutives'),
+        ),
+        migrations.AddIndex(
+            model_name='trainingposition',
+            index=models.Index(fields=['username', 'next_due'], name='trainingpos_user_due_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chessTrainer', '0011_training_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=100, unique=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('solved', models.IntegerField(default=0)),
+                ('total_improvement_points', models.FloatField(default=0.0)),
+                ('total_time_seconds', models.IntegerField(default=0)),
+                ('easy_attempts', models.IntegerField(default=0)),
+                ('easy_solved', models.IntegerField(default=0)),
+                ('medium_attempts', models.IntegerField(default=0)),
+                ('medium_solved', models.IntegerField(default=0)),
+                ('hard_attempts', models.IntegerField(default=0)),
+                ('hard_solved', models.IntegerField(default=0)),
+                ('opening_attempts', models.IntegerField(default=0)),
+                ('opening_solved', models.IntegerField(default=0)),
+                ('middlegame_attempts', models.IntegerField(default=0)),
+                ('middlegame_solved', models.IntegerField(default=0)),
+                ('endgame_attempts', models.IntegerField(default=0)),
+                ('endgame_solved', models.IntegerField(default=0)),
+                ('perfect_count', models.IntegerField(default=0)),
+                ('good_count', models.IntegerField(default=0)),
+                ('suboptimal_count', models.IntegerField(default=0)),
+                ('poor_count', models.IntegerField(default=0)),
+                ('blunder_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chessTrainer', '0012_training_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GamePosition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(help_text='Joueur suivi (copie de game.username)', max_length=100)),
+                ('zobrist', models.BigIntegerField(help_text='Clé Zobrist de la position avant le coup')),
+                ('ply', models.PositiveSmallIntegerField(help_text='Numéro du demi-coup joué depuis la position')),
+                ('move', models.CharField(help_text='Coup joué (UCI)', max_length=5)),
+                ('move_san', models.CharField(blank=True, max_length=10)),
+                ('evaluation', models.FloatField(blank=True, help_text='Évaluation de la position (centipawns, point de vue des blancs)', null=True)),
+                ('quality', models.CharField(blank=True, help_text='Qualité du coup joué', max_length=20)),
+                ('is_player_move', models.BooleanField(default=False, help_text='Coup joué par le joueur suivi')),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='chessTrainer.chessgame')),
+            ],
+            options={
+                'ordering': ['game', 'ply'],
+                'indexes': [models.Index(fields=['username', 'zobrist'], name='gamepos_user_key_idx')],
+                'unique_together': {('game', 'ply')},
+            },
+        ),
+    ]
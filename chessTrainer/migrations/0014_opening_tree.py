@@ -0,0 +1,48 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:59
+
+from django.db import migrations, models
+
+
+def clear_game_positions(apps, schema_editor):
+    """Positions indexées avant l'arbre d'ouvertures : à réindexer (manage.py index_positions)
+
+    L'arbre est mis à jour par différence avec les positions déjà indexées d'une
+    partie ; les lignes existantes n'y ont jamais été reportées.
+    """
+    apps.get_model('chessTrainer', 'GamePosition').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chessTrainer', '0013_game_positions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameposition',
+            name='centipawn_loss',
+            field=models.FloatField(blank=True, help_text='Perte du coup joué (centipawns)', null=True),
+        ),
+        migrations.CreateModel(
+            name='OpeningNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=100)),
+                ('color', models.CharField(choices=[('white', 'Blanc'), ('black', 'Noir')], help_text='Couleur du joueur', max_length=5)),
+                ('zobrist', models.BigIntegerField(help_text='Clé Zobrist de la position avant le coup')),
+                ('move', models.CharField(help_text='Coup joué (UCI)', max_length=5)),
+                ('move_san', models.CharField(blank=True, max_length=10)),
+                ('games', models.IntegerField(default=0)),
+                ('wins', models.IntegerField(default=0)),
+                ('draws', models.IntegerField(default=0)),
+                ('losses', models.IntegerField(default=0)),
+                ('centipawn_loss_total', models.FloatField(default=0.0)),
+                ('centipawn_loss_count', models.IntegerField(default=0, help_text='Coups analysés')),
+            ],
+            options={
+                'unique_together': {('username', 'color', 'zobrist', 'move')},
+            },
+        ),
+        migrations.RunPython(clear_game_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.2 on 2026-10-19 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def share_game_data(apps, schema_editor):
+    """Une ligne ChessGameData par partie Chess.com, clé = game_id"""
+    ChessGame = apps.get_model('chessTrainer', 'ChessGame')
+    LegacyChessGameData = apps.get_model('chessTrainer', 'LegacyChessGameData')
+    ChessGameData = apps.get_model('chessTrainer', 'ChessGameData')
+
+    game_keys = dict(ChessGame.objects.values_list('id', 'game_id'))
+    batch = []
+    for pk, pgn, moves_data in LegacyChessGameData.objects.values_list('game_id', 'pgn', 'moves_data').iterator(chunk_size=200):
+        batch.append(ChessGameData(game_key=game_keys[pk], pgn=pgn, moves_data=moves_data))
+        if len(batch) >= 200:
+            ChessGameData.objects.bulk_create(batch)
+            batch = []
+    ChessGameData.objects.bulk_create(batch)
+
+
+def unshare_game_data(apps, schema_editor):
+    ChessGame = apps.get_model('chessTrainer', 'ChessGame')
+    LegacyChessGameData = apps.get_model('chessTrainer', 'LegacyChessGameData')
+    ChessGameData = apps.get_model('chessTrainer', 'ChessGameData')
+
+    data = {row.game_key: row for row in ChessGameData.objects.iterator(chunk_size=200)}
+    LegacyChessGameData.objects.bulk_create([
+        LegacyChessGameData(game_id=pk, pgn=data[game_key].pgn, moves_data=data[game_key].moves_data)
+        for pk, game_key in ChessGame.objects.values_list('id', 'game_id')
+        if game_key in data
+    ], batch_size=200)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chessTrainer', '0014_opening_tree'),
+    ]
+
+    operations = [
+        migrations.RenameModel('ChessGameData', 'LegacyChessGameData'),
+        migrations.AlterField(
+            model_name='legacychessgamedata',
+            name='game',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='chessTrainer.chessgame'),
+        ),
+        migrations.CreateModel(
+            name='ChessGameData',
+            fields=[
+                ('game_key', models.CharField(help_text='ID de la partie sur Chess.com (ChessGame.game_id)', max_length=50, primary_key=True, serialize=False)),
+                ('pgn', models.BinaryField(default=b'', help_text='PGN compressé')),
+                ('moves_data', models.BinaryField(default=b'', help_text='moves_data JSON compressé')),
+            ],
+        ),
+        migrations.RunPython(share_game_data, unshare_game_data),
+        migrations.DeleteModel('LegacyChessGameData'),
+        migrations.AlterField(
+            model_name='chessgame',
+            name='game_id',
+            field=models.CharField(db_index=True, help_text='ID de la partie sur Chess.com', max_length=50),
+        ),
+        migrations.AlterUniqueTogether(
+            name='chessgame',
+            unique_together={('username', 'game_id')},
+        ),
+        # Relation sans colonne (jointure sur game_id) : rien à modifier en base
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AddField(
+                model_name='chessgame',
+                name='blobs',
+                field=models.ForeignObject(from_fields=['game_id'], on_delete=django.db.models.deletion.DO_NOTHING, related_name='views', to='chessTrainer.chessgamedata', to_fields=['game_key']),
+            ),
+        ]),
+    ]
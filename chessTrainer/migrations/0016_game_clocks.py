@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chessTrainer', '0015_shared_game_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chessgamedata',
+            name='clocks',
+            field=models.BinaryField(default=b'', help_text='Temps restant après chaque demi-coup (dixièmes de seconde, voir clocks.py)'),
+        ),
+    ]
@@ -1,6 +1,13 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 import json
+import re
+import zlib
+
+from .clocks import clocks_from_pgn, pack_clocks, unpack_clocks
+from .movedata import decode_moves_data, encode_moves_data, is_packed, plain
+
+PGN_HEADER_PATTERN = re.compile(r'^\[(\w+) "(.*)"\]\s*$', re.MULTILINE)
 
 
 class PlayerSyncStatus(models.Model):
@@ -19,11 +26,119 @@ class PlayerSyncStatus(models.Model):
         return f"Sync {self.username} - {self.total_games_count} parties"
 
 
+# Résultats Chess.com correspondant à une partie nulle
+DRAW_RESULTS = ['agreed', 'stalemate', 'repetition', 'insufficient']
+
+
+def deduce_player_results(game_result, white_player, black_player):
+    """Déduire le résultat de chaque joueur à partir du résultat global de la partie"""
+    if game_result == 'white_win':
+        return 'win', 'loss'
+    elif game_result == 'black_win':
+        return 'loss', 'win'
+    elif game_result in DRAW_RESULTS:
+        return game_result, game_result  # Les deux joueurs ont le même résultat pour les nulles
+    else:
+        # Si on ne peut pas déterminer, retourner unknown
+        return 'unknown', 'unknown'
+
+
+def time_class_from_control(time_control):
+    """Déterminer la cadence (bullet, blitz, rapid, daily) depuis le time_control Chess.com"""
+    if '+' in time_control:
+        base_time = int(time_control.split('+')[0])
+    else:
+        base_time = int(time_control) if time_control.isdigit() else 600
+    
+    if base_time < 180:
+        return 'bullet'
+    elif base_time < 600:
+        return 'blitz'
+    elif base_time < 86400:  # Moins d'un jour
+        return 'rapid'
+    return 'daily'
+
+
+def opening_from_pgn(pgn):
+    """Extraire (code ECO, nom de l'ouverture) des en-têtes PGN (ECO, Opening ou ECOUrl de Chess.com)"""
+    headers = dict(PGN_HEADER_PATTERN.findall(pgn.split('\n\n', 1)[0])) if pgn else {}
+    opening = headers.get('Opening', '')
+    if not opening and headers.get('ECOUrl'):
+        opening = headers['ECOUrl'].rstrip('/').rsplit('/', 1)[-1].replace('-', ' ')
+    return headers.get('ECO', '')[:3], opening[:200]
+
+
+# Données volumineuses stockées compressées dans ChessGameData : nom -> valeur par défaut
+# (clocks : tableau binaire non compressé, dérivé du PGN, voir clocks.py)
+BLOB_FIELDS = {'pgn': str, 'moves_data': dict, 'clocks': list}
+
+
+def encode_blob(name, value):
+    """Compresser le PGN (texte) ou moves_data (format colonnaire, sinon JSON compact) avec zlib"""
+    if not value:
+        return b''
+    if name == 'clocks':
+        return pack_clocks(value)
+    if name == 'moves_data':
+        packed = encode_moves_data(value)
+        if packed is not None:
+            return packed
+        value = plain(value)
+    raw = value if name == 'pgn' else json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    return zlib.compress(raw.encode('utf-8'), 6)
+
+
+def decode_blob(name, raw):
+    if not raw:
+        return BLOB_FIELDS[name]()
+    if name == 'clocks':
+        return unpack_clocks(raw)
+    if name == 'moves_data' and is_packed(raw):
+        return decode_moves_data(raw)
+    text = zlib.decompress(bytes(raw)).decode('utf-8')
+    return text if name == 'pgn' else json.loads(text)
+
+
+def _blob_property(name, doc):
+    """Propriété chargée à la demande depuis ChessGameData (une requête par champ, au premier accès)"""
+
+    def getter(self):
+        blobs = self.__dict__.setdefault('_blobs', {})
+        if name not in blobs:
+            raw = b''
+            if 'blobs' in self._state.fields_cache:
+                # Données déjà jointes via select_related('blobs')
+                data = self._state.fields_cache['blobs']
+                raw = getattr(data, name) if data is not None else b''
+            elif self.pk is not None:
+                raw = ChessGameData.objects.filter(game_key=self.game_id).values_list(name, flat=True).first() or b''
+            blobs[name] = (bytes(raw), decode_blob(name, raw))
+        return blobs[name][1]
+
+    def setter(self, value):
+        blobs = self.__dict__.setdefault('_blobs', {})
+        raw = blobs[name][0] if name in blobs else None
+        blobs[name] = (raw, value)
+
+    return property(getter, setter, doc=doc)
+
+
 class ChessGame(models.Model):
-    """Modèle pour stocker les informations d'une partie d'échecs"""
+    """Modèle pour stocker les informations d'une partie d'échecs
+    
+    Une ligne par joueur suivi et par partie : quand deux joueurs suivis se sont
+    affrontés, chacun a sa vue (couleur, résultat, positions d'entraînement),
+    mais PGN et analyse sont partagés dans ChessGameData.
+    """
+    
+    # Colonnes de résumé recalculées à chaque sauvegarde (voir update_summary)
+    SUMMARY_FIELDS = [
+        'time_class', 'player_color', 'player_result', 'eco', 'opening', 'has_pgn',
+        'error_count', 'inaccuracy_count', 'mistake_count', 'blunder_count', 'accuracy',
+    ]
     
     username = models.CharField(max_length=100, help_text="Nom d'utilisateur Chess.com")
-    game_id = models.CharField(max_length=50, unique=True, help_text="ID unique de la partie")
+    game_id = models.CharField(max_length=50, db_index=True, help_text="ID de la partie sur Chess.com")
     game_url = models.URLField(help_text="URL de la partie sur Chess.com")
     
     # Informations sur la partie
@@ -37,20 +152,109 @@ class ChessGame(models.Model):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     
-    # PGN et analyse
-    pgn = models.TextField(help_text="Notation PGN de la partie")
-    moves_data = models.JSONField(default=dict, help_text="Données des coups avec évaluations")
+    # PGN et analyse : stockés compressés dans ChessGameData (partagés entre joueurs), chargés au premier accès
+    blobs = models.ForeignObject(
+        'ChessGameData', on_delete=models.DO_NOTHING, from_fields=['game_id'], to_fields=['game_key'], related_name='views',
+    )
+    pgn = _blob_property('pgn', "Notation PGN de la partie")
+    moves_data = _blob_property('moves_data', "Données des coups avec évaluations")
+    clocks = _blob_property('clocks', "Temps restant (secondes) après chaque demi-coup, lu dans le PGN")
+    has_pgn = models.BooleanField(default=False, help_text="Un PGN est disponible pour l'analyse")
     
     # Métadonnées
     created_at = models.DateTimeField(default=timezone.now)
     analyzed = models.BooleanField(default=False)
     
+    # Résumé dénormalisé pour la liste des parties (évite de charger pgn et moves_data)
+    time_class = models.CharField(max_length=10, blank=True, help_text="Cadence : bullet, blitz, rapid ou daily")
+    player_color = models.CharField(max_length=5, blank=True, choices=[('white', 'Blanc'), ('black', 'Noir')])
+    player_result = models.CharField(max_length=20, blank=True, help_text="Résultat du point de vue du joueur")
+    eco = models.CharField(max_length=3, blank=True, help_text="Code ECO de l'ouverture")
+    opening = models.CharField(max_length=200, blank=True, help_text="Nom de l'ouverture")
+    error_count = models.IntegerField(null=True, blank=True, help_text="Coups avec une précision < 80% (get_errors)")
+    inaccuracy_count = models.IntegerField(null=True, blank=True)
+    mistake_count = models.IntegerField(null=True, blank=True)
+    blunder_count = models.IntegerField(null=True, blank=True)
+    accuracy = models.FloatField(null=True, blank=True, help_text="Précision moyenne de la partie")
+    
     class Meta:
         ordering = ['-start_time']
+        unique_together = ['username', 'game_id']
+        indexes = [
+            models.Index(fields=['username', 'time_class'], name='chessgame_user_timeclass_idx'),
+            models.Index(fields=['username', 'end_time'], name='chessgame_user_end_idx'),
+            models.Index(fields=['username', 'analyzed'], name='chessgame_user_analyzed_idx'),
+        ]
         
     def __str__(self):
         return f"{self.white_player} vs {self.black_player} ({self.start_time.date()})"
     
+    def save(self, *args, **kwargs):
+        self.update_summary()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = (set(update_fields) - set(BLOB_FIELDS)) | set(self.SUMMARY_FIELDS)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.save_blobs()
+    
+    def save_blobs(self):
+        """Écrire dans ChessGameData les données chargées ou assignées qui ont changé"""
+        changed = {}
+        blobs = self.__dict__.get('_blobs', {})
+        for name, (raw, value) in blobs.items():
+            encoded = encode_blob(name, value)
+            if encoded != raw:
+                changed[name] = encoded
+                blobs[name] = (encoded, value)
+        if 'pgn' in changed:
+            # Pendules lues une seule fois, quand le PGN est enregistré
+            clocks = clocks_from_pgn(blobs['pgn'][1])
+            changed['clocks'] = encode_blob('clocks', clocks)
+            blobs['clocks'] = (changed['clocks'], clocks)
+        if changed:
+            ChessGameData.objects.update_or_create(game_key=self.game_id, defaults=changed)
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.__dict__.pop('_blobs', None)
+    
+    def update_summary(self):
+        """Recalculer les colonnes de résumé depuis time_control, le résultat et moves_data
+        
+        Les colonnes issues du PGN et de moves_data ne sont recalculées que si ces
+        données ont été chargées ou assignées sur l'instance.
+        """
+        self.time_class = time_class_from_control(self.time_control)
+        
+        is_black = self.username.lower() == self.black_player.lower()
+        self.player_color = 'black' if is_black else 'white'
+        white_result, black_result = deduce_player_results(self.result, self.white_player, self.black_player)
+        self.player_result = black_result if is_black else white_result
+        
+        blobs = self.__dict__.get('_blobs', {})
+        if 'pgn' in blobs:
+            self.has_pgn = bool(self.pgn)
+            self.eco, self.opening = opening_from_pgn(self.pgn)
+        
+        if self.analyzed and 'moves_data' not in blobs:
+            # Analyse inchangée : les compteurs en base restent valables
+            return
+        if self.analyzed and self.moves_data and self.moves_data.get('moves'):
+            self.error_count = len(self.get_errors())
+            self.inaccuracy_count = self.moves_data.get('inaccuracies_count', 0)
+            self.mistake_count = self.moves_data.get('mistakes_count', 0)
+            self.blunder_count = self.moves_data.get('blunders_count', 0)
+            self.accuracy = self.moves_data.get('average_accuracy')
+        elif self.analyzed:
+            # Partie marquée analysée sans coups (PGN illisible)
+            self.error_count = 0
+            self.inaccuracy_count = self.mistake_count = self.blunder_count = 0
+            self.accuracy = None
+        else:
+            self.error_count = self.inaccuracy_count = self.mistake_count = self.blunder_count = None
+            self.accuracy = None
+    
     def get_errors(self):
         """Retourne les coups considérés comme des erreurs"""
         errors = []
@@ -70,6 +274,25 @@ class ChessGame(models.Model):
         return blunders
 
 
+class ChessGameData(models.Model):
+    """PGN et analyse coup par coup d'une partie, compressés (zlib) hors de la table principale
+    
+    Accessibles via les propriétés ChessGame.pgn et ChessGame.moves_data : les
+    requêtes de liste, de comptage et de synchronisation ne lisent jamais ces données.
+    Une seule ligne par partie Chess.com, quel que soit le nombre de joueurs
+    suivis qui l'ont jouée (ChessGame.blobs / ChessGameData.views), supprimée
+    avec la dernière de ces vues (signals.py).
+    """
+    
+    game_key = models.CharField(max_length=50, primary_key=True, help_text="ID de la partie sur Chess.com (ChessGame.game_id)")
+    pgn = models.BinaryField(default=b'', help_text="PGN compressé")
+    moves_data = models.BinaryField(default=b'', help_text="moves_data JSON compressé")
+    clocks = models.BinaryField(default=b'', help_text="Temps restant après chaque demi-coup (dixièmes de seconde, voir clocks.py)")
+    
+    def __str__(self):
+        return f"Données de {self.game_key}"
+
+
 class MoveAnalysis(models.Model):
     """Modèle pour l'analyse détaillée des coups"""
     
@@ -107,6 +330,80 @@ class MoveAnalysis(models.Model):
         return f"Coup {self.move_number}: {self.move_notation} ({self.quality or 'Non évalué'})"
 
 
+class GamePosition(models.Model):
+    """Position atteinte dans une partie et coup joué depuis cette position
+
+    Indexée par clé Zobrist (chess.polyglot.zobrist_hash, stockée signée sur
+    64 bits) : retrouver les parties d'un joueur passées par une position est
+    une lecture d'index, sans rejouer les PGN (voir positions.index_game_positions).
+    Les parties sont indexées dès leur synchronisation ; évaluation, perte et
+    qualité sont renseignées une fois la partie analysée.
+    """
+
+    game = models.ForeignKey(ChessGame, on_delete=models.CASCADE, related_name='positions')
+    username = models.CharField(max_length=100, help_text="Joueur suivi (copie de game.username)")
+    zobrist = models.BigIntegerField(help_text="Clé Zobrist de la position avant le coup")
+    ply = models.PositiveSmallIntegerField(help_text="Numéro du demi-coup joué depuis la position")
+    move = models.CharField(max_length=5, help_text="Coup joué (UCI)")
+    move_san = models.CharField(max_length=10, blank=True)
+    evaluation = models.FloatField(null=True, blank=True, help_text="Évaluation de la position (centipawns, point de vue des blancs)")
+    centipawn_loss = models.FloatField(null=True, blank=True, help_text="Perte du coup joué (centipawns)")
+    quality = models.CharField(max_length=20, blank=True, help_text="Qualité du coup joué")
+    is_player_move = models.BooleanField(default=False, help_text="Coup joué par le joueur suivi")
+
+    class Meta:
+        ordering = ['game', 'ply']
+        unique_together = ['game', 'ply']
+        indexes = [
+            models.Index(fields=['username', 'zobrist'], name='gamepos_user_key_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.game.game_id} - demi-coup {self.ply}: {self.move_san or self.move}"
+
+
+class OpeningNode(models.Model):
+    """Coup de l'arbre d'ouvertures d'un joueur (par couleur) : parties, score et perte moyenne
+
+    Les fils d'une position sont les lignes (username, color, zobrist) : lire un
+    nœud de l'arbre coûte une lecture d'index proportionnelle au nombre de coups
+    joués depuis la position. Les compteurs sont tenus à jour par
+    explorer.update_opening_tree à chaque indexation d'une partie.
+    """
+
+    username = models.CharField(max_length=100)
+    color = models.CharField(max_length=5, choices=[('white', 'Blanc'), ('black', 'Noir')], help_text="Couleur du joueur")
+    zobrist = models.BigIntegerField(help_text="Clé Zobrist de la position avant le coup")
+    move = models.CharField(max_length=5, help_text="Coup joué (UCI)")
+    move_san = models.CharField(max_length=10, blank=True)
+    games = models.IntegerField(default=0)
+    wins = models.IntegerField(default=0)
+    draws = models.IntegerField(default=0)
+    losses = models.IntegerField(default=0)
+    centipawn_loss_total = models.FloatField(default=0.0)
+    centipawn_loss_count = models.IntegerField(default=0, help_text="Coups analysés")
+
+    class Meta:
+        unique_together = ['username', 'color', 'zobrist', 'move']
+
+    def __str__(self):
+        return f"{self.username} ({self.color}) - {self.move_san or self.move}: {self.games} parties"
+
+    @property
+    def score(self):
+        """Score du joueur en pourcentage (nulle = un demi-point)"""
+        if self.games == 0:
+            return 0
+        return (self.wins + self.draws / 2) / self.games * 100
+
+    @property
+    def average_centipawn_loss(self):
+        """Perte moyenne du coup dans les parties analysées ; None sans analyse"""
+        if self.centipawn_loss_count == 0:
+            return None
+        return self.centipawn_loss_total / self.centipawn_loss_count
+
+
 class TrainingPosition(models.Model):
     """Modèle pour les positions d'entraînement basées sur les erreurs du joueur"""
     
@@ -141,9 +438,18 @@ class TrainingPosition(models.Model):
     times_solved = models.IntegerField(default=0)
     created_at = models.DateTimeField(default=timezone.now)
     
+    # Répétition espacée (voir training.schedule_review)
+    next_due = models.DateTimeField(default=timezone.now, help_text="Prochaine révision prévue")
+    ease = models.FloatField(default=2.5, help_text="Facteur de facilité (SM-2)")
+    interval = models.FloatField(default=0, help_text="Intervalle entre deux révisions (jours)")
+    streak = models.IntegerField(default=0, help_text="Réussites consécutives")
+    
     class Meta:
         ordering = ['-created_at']
         unique_together = ['username', 'original_game', 'move_analysis']
+        indexes = [
+            models.Index(fields=['username', 'next_due'], name='trainingpos_user_due_idx'),
+        ]
     
     def __str__(self):
         return f"Position d'entraînement pour {self.username} - Coup {self.move_analysis.move_number}"
@@ -225,3 +531,148 @@ class TrainingSession(models.Model):
         if not self.end_time:
             return 0
         return (self.end_time - self.start_time).total_seconds() / 60
+
+
+class TrainingStats(models.Model):
+    """Statistiques d'entraînement agrégées d'un joueur (une ligne par joueur)
+
+    Mises à jour par incréments F() à chaque tentative (training.record_attempt) :
+    un tableau de bord lit cette ligne au lieu de parcourir toutes les tentatives.
+    """
+
+    DIFFICULTIES = ('easy', 'medium', 'hard')
+    PHASES = ('opening', 'middlegame', 'endgame')
+    QUALITIES = ('perfect', 'good', 'suboptimal', 'poor', 'blunder')
+
+    username = models.CharField(max_length=100, unique=True)
+    attempts = models.IntegerField(default=0)
+    solved = models.IntegerField(default=0)
+    total_improvement_points = models.FloatField(default=0.0)
+    total_time_seconds = models.IntegerField(default=0)
+
+    # Par difficulté de la position
+    easy_attempts = models.IntegerField(default=0)
+    easy_solved = models.IntegerField(default=0)
+    medium_attempts = models.IntegerField(default=0)
+    medium_solved = models.IntegerField(default=0)
+    hard_attempts = models.IntegerField(default=0)
+    hard_solved = models.IntegerField(default=0)
+
+    # Par phase de jeu (nombre de pièces de la position)
+    opening_attempts = models.IntegerField(default=0)
+    opening_solved = models.IntegerField(default=0)
+    middlegame_attempts = models.IntegerField(default=0)
+    middlegame_solved = models.IntegerField(default=0)
+    endgame_attempts = models.IntegerField(default=0)
+    endgame_solved = models.IntegerField(default=0)
+
+    # Par résultat de la tentative
+    perfect_count = models.IntegerField(default=0)
+    good_count = models.IntegerField(default=0)
+    suboptimal_count = models.IntegerField(default=0)
+    poor_count = models.IntegerField(default=0)
+    blunder_count = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Statistiques d'entraînement de {self.username} ({self.solved}/{self.attempts})"
+
+    @property
+    def success_rate(self):
+        """Taux de réussite global"""
+        if self.attempts == 0:
+            return 0
+        return (self.solved / self.attempts) * 100
+
+    def rate(self, bucket):
+        """Taux de réussite d'une difficulté ou d'une phase ('easy', 'endgame'...)"""
+        attempts = getattr(self, f'{bucket}_attempts')
+        if attempts == 0:
+            return 0
+        return (getattr(self, f'{bucket}_solved') / attempts) * 100
+
+    def breakdown(self):
+        """Tentatives, réussites et taux par difficulté et par phase, répartition des résultats"""
+        def buckets(names):
+            return {
+                name: {
+                    'attempts': getattr(self, f'{name}_attempts'),
+                    'solved': getattr(self, f'{name}_solved'),
+                    'rate': self.rate(name),
+                }
+                for name in names
+            }
+        return {
+            'difficulty': buckets(self.DIFFICULTIES),
+            'phase': buckets(self.PHASES),
+            'quality': {quality: getattr(self, f'{quality}_count') for quality in self.QUALITIES},
+        }
+
+
+class AnalysisJob(models.Model):
+    """Demande d'analyse Stockfish d'une partie, exécutée par la commande analysis_worker
+
+    Une seule demande active (en attente ou en cours) par partie : une nouvelle
+    demande pour la même partie réutilise la demande existante. Un job en cours
+    dont le bail (leased_until) a expiré est repris par un autre worker.
+    Les workers prennent toujours le job de plus haute priorité : une demande
+    interactive passe devant un lot en cours dès la fin de la partie analysée.
+    """
+
+    # Classes de priorité : partie consultée > synchronisation > analyse de masse
+    PRIORITY_BULK = 0
+    PRIORITY_SYNC = 10
+    PRIORITY_INTERACTIVE = 20
+    PRIORITY_CHOICES = [
+        (PRIORITY_BULK, 'Analyse de masse'),
+        (PRIORITY_SYNC, 'Synchronisation'),
+        (PRIORITY_INTERACTIVE, 'Interactive'),
+    ]
+
+    STATE_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échec'),
+    ]
+    ACTIVE_STATES = ['pending', 'running']
+
+    game = models.ForeignKey(ChessGame, on_delete=models.CASCADE, related_name='analysis_jobs')
+    username = models.CharField(max_length=100, db_index=True)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='pending')
+    priority = models.IntegerField(default=PRIORITY_BULK, choices=PRIORITY_CHOICES, help_text="Les jobs de priorité la plus haute sont exécutés en premier")
+    force = models.BooleanField(default=False, help_text="Ré-analyser même si la partie est déjà analysée")
+    batch_id = models.CharField(max_length=64, blank=True, db_index=True, help_text="Session d'analyse groupée (suivi SSE)")
+
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    leased_until = models.DateTimeField(null=True, blank=True)
+
+    # Progression de l'analyse en cours (lue par les flux SSE)
+    progress = models.IntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True)
+    current_move = models.IntegerField(default=0)
+    total_moves = models.IntegerField(default=0)
+    errors_count = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-priority', 'created_at']
+        indexes = [
+            models.Index(fields=['state', '-priority', 'created_at'], name='analysisjob_queue_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['game'],
+                condition=models.Q(state__in=['pending', 'running']),
+                name='analysisjob_one_active_per_game',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Analyse {self.game.game_id} ({self.state}, {self.get_priority_display()})"
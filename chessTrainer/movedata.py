@@ -0,0 +1,462 @@
+"""
+Encodage compact de moves_data (format colonnaire binaire)
+
+Le JSON de moves_data répète pour chaque demi-coup les noms de clés, la FEN,
+les variantes MultiPV (coup UCI, SAN, numéro de coup, trait) et les libellés de
+qualité. Le format colonnaire ne garde que l'information non redondante, par
+colonnes de même type :
+- coups UCI sur 16 bits (case de départ, case d'arrivée, promotion) ;
+- évaluations et pertes en centipawns sur 16 bits (int16 / uint16) ;
+- précision en dixièmes, qualité, source et booléens sur un octet ;
+- meilleurs coups, punitions et coups des variantes dans des tables à plat ;
+- coups SAN dans un seul texte (les recalculer coûterait plus cher que de les lire).
+Les FEN et nombres de pièces sont recalculés en rejouant la partie, les numéros
+de coups, le trait et les libellés de qualité par simple calcul.
+
+decode_moves_data retourne un MovesData (dict) dont la clé 'moves' est une
+MoveList : les colonnes sont lues sans construire les dictionnaires des coups,
+chaque MoveRecord ne construit ses variantes et sa FEN qu'au premier accès.
+Les MoveRecord sont en lecture seule ; réassigner 'moves' avec une liste de
+dictionnaires reste possible.
+
+encode_moves_data vérifie que le décodage restitue exactement l'analyse
+d'origine ; sinon (ancien format, valeur hors bornes...), il retourne None et
+moves_data reste stocké en JSON.
+"""
+import json
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+from itertools import islice
+
+from .analysis import MOVE_QUALITIES
+from .engine import chess_available
+
+# Préfixe des données colonnaires : un flux zlib (JSON historique) commence par 0x78
+MAGIC = b'\x00MD1'
+
+QUALITIES = ('best', 'good', 'acceptable', 'inaccuracy', 'mistake', 'blunder', 'book')
+SOURCES = ('engine', 'shallow', 'book', 'tablebase')
+
+# Valeurs absentes (None) dans les colonnes signées
+EVAL_NONE = -32768
+MATE_NONE = -128
+
+# Drapeaux d'un coup
+IS_BEST = 1
+IN_TOP5 = 2
+SOURCE_SHIFT = 2  # 2 bits : index dans SOURCES
+HAS_PUNISHMENT = 16
+HAS_FEN = 32  # FEN stockée : début de partie non standard ou demi-coup manquant
+
+# Drapeaux d'un meilleur coup
+TOP_HAS_PV = 1
+TOP_HAS_WEIGHT = 2
+TOP_IS_MATE = 4
+
+# Colonnes : (nom, type array) dans l'ordre du format
+MOVE_COLUMNS = (
+    ('ply', 'H'), ('move', 'H'), ('evaluation_after', 'h'), ('centipawn_loss', 'H'),
+    ('accuracy', 'H'), ('time_ms', 'H'), ('quality', 'B'), ('flags', 'B'),
+    ('rank', 'B'), ('depth', 'B'), ('top_count', 'B'),
+)
+TOP_COLUMNS = (
+    ('move', 'H'), ('evaluation', 'h'), ('mate_in', 'b'), ('weight', 'B'), ('flags', 'B'), ('pv_count', 'B'),
+)
+PUNISHMENT_COLUMNS = (('evaluation', 'h'), ('pv_count', 'B'))
+COUNTS = struct.Struct('<IIII')  # coups, meilleurs coups, punitions, coups de variantes
+
+# Ordre des clés d'une entrée (celui de analysis.build_move_entry)
+FIELDS = (
+    'move_number', 'is_white_move', 'ply_count', 'move', 'move_san', 'best_move', 'best_move_san',
+    'top_moves', 'opponent_punishment', 'evaluation_before', 'evaluation_after', 'evaluation_diff',
+    'centipawn_loss', 'accuracy', 'move_rank', 'is_error', 'error_type', 'move_quality',
+    'quality_icon', 'quality_text', 'is_best_move', 'is_in_top5', 'depth', 'time_spent',
+    'piece_count', 'fen_before', 'source',
+)
+# Champs construits au premier accès
+LAZY_FIELDS = ('top_moves', 'opponent_punishment', 'piece_count', 'fen_before')
+
+
+def pack_move(uci):
+    import chess
+
+    move = chess.Move.from_uci(uci)
+    if not move:
+        raise ValueError("Coup nul non supporté")
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+@lru_cache(maxsize=None)
+def unpack_move(value):
+    import chess
+
+    return chess.Move(value & 63, value >> 6 & 63, value >> 12 or None).uci()
+
+
+def _pack_eval(value):
+    return EVAL_NONE if value is None else value
+
+
+def _unpack_eval(value):
+    return None if value == EVAL_NONE else value
+
+
+def _to_bytes(column):
+    if sys.byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _read_columns(spec, count, payload, offset):
+    columns = {}
+    for name, typecode in spec:
+        column = array(typecode)
+        size = column.itemsize * count
+        column.frombytes(payload[offset:offset + size])
+        if sys.byteorder == 'big':
+            column.byteswap()
+        columns[name] = column
+        offset += size
+    return columns, offset
+
+
+def _pv_line(moves, sans, move_number, is_white):
+    """Variante au format de analysis.extract_pv_line depuis ses coups UCI et SAN"""
+    pv_line = []
+    for uci, san in zip(moves, sans):
+        pv_line.append({'uci': uci, 'san': san, 'move_number': move_number, 'is_white': is_white})
+        if not is_white:
+            move_number += 1
+        is_white = not is_white
+    return pv_line
+
+
+def plain(value):
+    """Copie en dictionnaires et listes Python (JSON) d'un moves_data décodé ou non"""
+    if isinstance(value, Mapping):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, MoveList)):
+        return [plain(item) for item in value]
+    return value
+
+
+def _pack_moves(moves):
+    """Section binaire des coups (sans compression)"""
+    import chess
+
+    moves_cols = {name: array(typecode) for name, typecode in MOVE_COLUMNS}
+    top_cols = {name: array(typecode) for name, typecode in TOP_COLUMNS}
+    punishment_cols = {name: array(typecode) for name, typecode in PUNISHMENT_COLUMNS}
+    pv_moves = array('H')
+    sans, fens = [], []
+
+    board = chess.Board()
+    previous_ply = 0
+    for entry in moves:
+        flags = SOURCES.index(entry['source']) << SOURCE_SHIFT
+        if entry['ply_count'] != previous_ply + 1 or entry['fen_before'] != board.fen():
+            flags |= HAS_FEN
+            fens.append(entry['fen_before'])
+            board = chess.Board(entry['fen_before'])
+        if entry['is_best_move']:
+            flags |= IS_BEST
+        if entry['is_in_top5']:
+            flags |= IN_TOP5
+        sans.append(entry['move_san'])
+
+        for top_move in entry['top_moves']:
+            top_flags = 0
+            sans.append(top_move['move_san'])
+            if 'pv_line' in top_move:
+                top_flags |= TOP_HAS_PV
+                pv_line = top_move['pv_line']
+                if pv_line and pv_line[0]['uci'] != top_move['move']:
+                    raise ValueError("Variante ne commençant pas par le coup proposé")
+                # Le premier coup de la variante est le coup proposé : non répété
+                pv_moves.extend(pack_move(pv_move['uci']) for pv_move in pv_line[1:])
+                sans.extend(pv_move['san'] for pv_move in pv_line[1:])
+            if 'weight' in top_move:
+                top_flags |= TOP_HAS_WEIGHT
+            if top_move['is_mate']:
+                top_flags |= TOP_IS_MATE
+            top_cols['move'].append(pack_move(top_move['move']))
+            top_cols['evaluation'].append(_pack_eval(top_move['evaluation']))
+            top_cols['mate_in'].append(MATE_NONE if top_move['mate_in'] is None else top_move['mate_in'])
+            top_cols['weight'].append(top_move.get('weight', 0))
+            top_cols['flags'].append(top_flags)
+            top_cols['pv_count'].append(len(top_move.get('pv_line', ())))
+
+        punishment = entry['opponent_punishment']
+        if punishment:
+            flags |= HAS_PUNISHMENT
+            punishment_cols['evaluation'].append(_pack_eval(punishment['evaluation']))
+            punishment_cols['pv_count'].append(len(punishment['pv_line']))
+            pv_moves.extend(pack_move(pv_move['uci']) for pv_move in punishment['pv_line'])
+            sans.extend(pv_move['san'] for pv_move in punishment['pv_line'])
+
+        moves_cols['ply'].append(entry['ply_count'])
+        moves_cols['move'].append(pack_move(entry['move']))
+        moves_cols['evaluation_after'].append(_pack_eval(entry['evaluation_after']))
+        moves_cols['centipawn_loss'].append(entry['centipawn_loss'])
+        moves_cols['accuracy'].append(round(entry['accuracy'] * 10))
+        moves_cols['time_ms'].append(round(entry['time_spent'] * 1000))
+        moves_cols['quality'].append(QUALITIES.index(entry['move_quality']))
+        moves_cols['flags'].append(flags)
+        moves_cols['rank'].append(entry['move_rank'] or 0)
+        moves_cols['depth'].append(entry['depth'])
+        moves_cols['top_count'].append(len(entry['top_moves']))
+
+        board.push(chess.Move.from_uci(entry['move']))
+        previous_ply = entry['ply_count']
+
+    parts = [COUNTS.pack(len(moves), len(top_cols['move']), len(punishment_cols['evaluation']), len(pv_moves))]
+    for columns in (moves_cols, top_cols, punishment_cols):
+        parts.extend(_to_bytes(column) for column in columns.values())
+    parts.append(_to_bytes(pv_moves))
+    # Texte : coups SAN séparés par des espaces, puis les FEN stockées (une par ligne)
+    parts.append('\n'.join([' '.join(sans)] + fens).encode('ascii'))
+    return b''.join(parts)
+
+
+def encode_moves_data(value):
+    """Encoder moves_data au format colonnaire ; None si le format ne s'applique pas (stockage JSON)"""
+    if not chess_available() or not isinstance(value, Mapping):
+        return None
+    moves = value.get('moves')
+    if isinstance(moves, MoveList):
+        # Coups décodés et non réassignés : section binaire réutilisée telle quelle
+        payload = moves.payload
+    else:
+        if not moves or not isinstance(moves, list):
+            return None
+        try:
+            payload = _pack_moves(moves)
+            unchanged = [dict(record) for record in MoveList(payload)] == plain(moves)
+        except Exception:
+            return None
+        if not unchanged:
+            return None
+
+    header = json.dumps(
+        {key: item for key, item in value.items() if key != 'moves'},
+        ensure_ascii=False, separators=(',', ':'),
+    ).encode('utf-8')
+    return MAGIC + zlib.compress(struct.pack('<I', len(header)) + header + payload, 6)
+
+
+def is_packed(raw):
+    return bytes(raw[:len(MAGIC)]) == MAGIC
+
+
+def decode_moves_data(raw):
+    """Décoder des données colonnaires en MovesData"""
+    if not chess_available():
+        raise RuntimeError("python-chess est nécessaire pour lire les analyses au format colonnaire")
+    data = zlib.decompress(bytes(raw[len(MAGIC):]))
+    (header_size,) = struct.unpack_from('<I', data)
+    header = json.loads(data[4:4 + header_size].decode('utf-8'))
+    return MovesData(MoveList(data[4 + header_size:]), header)
+
+
+class MovesData(dict):
+    """moves_data décodé : en-tête (compteurs, moteur...) et 'moves' sous forme de MoveList"""
+
+    def __init__(self, moves, header):
+        super().__init__(moves=moves)
+        self.update(header)
+
+
+class MoveList(Sequence):
+    """Coups analysés d'une partie, lus dans les colonnes à la demande"""
+
+    def __init__(self, payload):
+        self.payload = payload
+        count, top_total, punishment_total, pv_total = COUNTS.unpack_from(payload)
+        offset = COUNTS.size
+        self.columns, offset = _read_columns(MOVE_COLUMNS, count, payload, offset)
+        self.top_columns, offset = _read_columns(TOP_COLUMNS, top_total, payload, offset)
+        self.punishment_columns, offset = _read_columns(PUNISHMENT_COLUMNS, punishment_total, payload, offset)
+        pv_columns, offset = _read_columns((('pv', 'H'),), pv_total, payload, offset)
+        self.pv_moves = pv_columns['pv']
+        text = payload[offset:].decode('ascii').split('\n')
+        self.sans, self.fens = text[0].split(' '), text[1:]
+
+        # Pour chaque coup : positions dans les tables à plat (meilleurs coups,
+        # variantes, punitions, FEN, SAN) et numéro de coup / trait avant le coup
+        self.offsets = []
+        top_offset = pv_offset = punishment_offset = fen_index = san_offset = 0
+        move_number, is_white = 1, True
+        top_pv_counts = self.top_columns['pv_count']
+        for top_count, flags in zip(self.columns['top_count'], self.columns['flags']):
+            if flags & HAS_FEN:
+                fen_fields = self.fens[fen_index].split(' ')
+                move_number, is_white = int(fen_fields[5]), fen_fields[1] == 'w'
+            top_pv_moves = sum(max(pv_count - 1, 0) for pv_count in islice(top_pv_counts, top_offset, top_offset + top_count))
+            self.offsets.append((
+                top_offset, pv_offset, punishment_offset, fen_index, san_offset, move_number, is_white,
+                # Variante de la punition : après celles des meilleurs coups
+                pv_offset + top_pv_moves, san_offset + 1 + top_count + top_pv_moves,
+            ))
+            top_offset += top_count
+            pv_offset += top_pv_moves
+            san_offset += 1 + top_count + top_pv_moves
+            if flags & HAS_PUNISHMENT:
+                pv_offset += self.punishment_columns['pv_count'][punishment_offset]
+                san_offset += self.punishment_columns['pv_count'][punishment_offset]
+                punishment_offset += 1
+            if flags & HAS_FEN:
+                fen_index += 1
+            if not is_white:
+                move_number += 1
+            is_white = not is_white
+        self._boards = []
+        self._records = [None] * count
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        record = self._records[index]
+        if record is None:
+            record = self._records[index] = MoveRecord(self, index)
+        return record
+
+    def __repr__(self):
+        return f"<MoveList: {len(self)} coups>"
+
+    def board(self, index):
+        """Position avant le coup index (rejoue la partie jusqu'à ce coup au premier appel)"""
+        import chess
+
+        boards = self._boards
+        while len(boards) <= index:
+            i = len(boards)
+            if self.columns['flags'][i] & HAS_FEN:
+                board = chess.Board(self.fens[self.offsets[i][3]])
+            elif i == 0:
+                board = chess.Board()
+            else:
+                board = boards[i - 1].copy(stack=False)
+                board.push(chess.Move.from_uci(unpack_move(self.columns['move'][i - 1])))
+            boards.append(board)
+        return boards[index]
+
+
+class MoveRecord(Mapping):
+    """Entrée moves_data d'un coup (lecture seule), mêmes clés que analysis.build_move_entry"""
+
+    def __init__(self, moves, index):
+        self._moves = moves
+        self._index = index
+        columns = moves.columns
+        top_offset, _, _, _, san_offset = moves.offsets[index][:5]
+        ply = columns['ply'][index]
+        flags = columns['flags'][index]
+        quality = QUALITIES[columns['quality'][index]]
+        error_type, quality_icon, quality_text = MOVE_QUALITIES[quality]
+        centipawn_loss = columns['centipawn_loss'][index]
+        time_ms = columns['time_ms'][index]
+        self._values = {
+            'move_number': (ply + 1) // 2,
+            'is_white_move': ply % 2 == 1,
+            'ply_count': ply,
+            'move': unpack_move(columns['move'][index]),
+            'move_san': moves.sans[san_offset],
+            'best_move': unpack_move(moves.top_columns['move'][top_offset]),
+            'best_move_san': moves.sans[san_offset + 1],
+            'evaluation_before': _unpack_eval(moves.top_columns['evaluation'][top_offset]),
+            'evaluation_after': _unpack_eval(columns['evaluation_after'][index]),
+            'evaluation_diff': -centipawn_loss,
+            'centipawn_loss': centipawn_loss,
+            'accuracy': 100 if quality == 'book' else columns['accuracy'][index] / 10,
+            'move_rank': columns['rank'][index] or None,
+            'is_error': error_type != "aucune",
+            'error_type': error_type,
+            'move_quality': quality,
+            'quality_icon': quality_icon,
+            'quality_text': quality_text,
+            'is_best_move': bool(flags & IS_BEST),
+            'is_in_top5': bool(flags & IN_TOP5),
+            'depth': columns['depth'][index],
+            'time_spent': time_ms / 1000 if time_ms else 0,
+            'source': SOURCES[flags >> SOURCE_SHIFT & 3],
+        }
+
+    def __getitem__(self, key):
+        values = self._values
+        if key not in values:
+            if key not in LAZY_FIELDS:
+                raise KeyError(key)
+            values[key] = getattr(self, '_' + key)()
+        return values[key]
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __repr__(self):
+        return f"<MoveRecord: {self['ply_count']}. {self['move_san']}>"
+
+    def _fen_before(self):
+        return self._moves.board(self._index).fen()
+
+    def _piece_count(self):
+        placement = self['fen_before'].split(' ', 1)[0]
+        return sum(char.isalpha() for char in placement)
+
+    def _top_moves(self):
+        moves = self._moves
+        top = moves.top_columns
+        top_offset, pv_offset, _, _, san_offset, move_number, is_white = moves.offsets[self._index][:7]
+        san_offset += 1
+        top_moves = []
+        for i in range(top_offset, top_offset + moves.columns['top_count'][self._index]):
+            flags = top['flags'][i]
+            top_move = {
+                'move': unpack_move(top['move'][i]),
+                'move_san': moves.sans[san_offset],
+                'evaluation': _unpack_eval(top['evaluation'][i]),
+                'rank': len(top_moves) + 1,
+            }
+            if flags & TOP_HAS_WEIGHT:
+                top_move['weight'] = top['weight'][i]
+            top_move['is_mate'] = bool(flags & TOP_IS_MATE)
+            top_move['mate_in'] = None if top['mate_in'][i] == MATE_NONE else top['mate_in'][i]
+            pv_moves = max(top['pv_count'][i] - 1, 0)
+            if flags & TOP_HAS_PV:
+                pv = [top_move['move']] + [unpack_move(value) for value in moves.pv_moves[pv_offset:pv_offset + pv_moves]]
+                top_move['pv_line'] = _pv_line(
+                    pv[:top['pv_count'][i]], moves.sans[san_offset:san_offset + 1 + pv_moves], move_number, is_white,
+                )
+            pv_offset += pv_moves
+            san_offset += 1 + pv_moves
+            top_moves.append(top_move)
+        return top_moves
+
+    def _opponent_punishment(self):
+        moves = self._moves
+        if not moves.columns['flags'][self._index] & HAS_PUNISHMENT:
+            return None
+        _, _, index, _, _, move_number, is_white, pv_offset, san_offset = moves.offsets[self._index]
+        pv_count = moves.punishment_columns['pv_count'][index]
+        pv = [unpack_move(value) for value in moves.pv_moves[pv_offset:pv_offset + pv_count]]
+        # Position après le coup joué : trait à l'adversaire
+        pv_line = _pv_line(pv, moves.sans[san_offset:san_offset + pv_count], move_number + (not is_white), not is_white)
+        return {
+            'move_san': pv_line[0]['san'],
+            'evaluation': _unpack_eval(moves.punishment_columns['evaluation'][index]),
+            'pv_line': pv_line,
+        }
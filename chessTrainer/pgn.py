@@ -0,0 +1,79 @@
+"""
+Lecture rapide de la partie principale d'un PGN (sans python-chess)
+
+chess.pgn.read_game construit l'arbre complet de la partie (un GameNode par
+coup, commentaires, variantes) et joue chaque coup pour le vérifier. Pour
+afficher, indexer ou rejouer une partie, seuls les en-têtes et les coups SAN
+de la partie principale servent : read_mainline les extrait en une seule passe
+d'expression régulière sur le texte, en sautant variantes, NAG et commentaires,
+et lit au passage les pendules Chess.com ({[%clk 0:09:58.5]}) si demandé.
+
+Les coups ne sont pas vérifiés : l'appelant les rejoue (board.push_san) quand il
+a besoin des positions, ce qui détecte un coup illégal.
+"""
+import re
+
+# Un seul motif pour tous les éléments du PGN ; le texte entre deux éléments (espaces) est ignoré
+TOKEN_PATTERN = re.compile(r'''
+    \[\s*(?P<tag>\w+)\s+"(?P<value>(?:[^"\\]|\\.)*)"\s*\]   # en-tête [Tag "valeur"]
+  | \{(?P<comment>[^}]*)\}                                   # commentaire { ... }
+  | ;[^\n]*                                                  # commentaire de fin de ligne
+  | (?P<open>\()                                             # début de variante
+  | (?P<close>\))                                            # fin de variante
+  | (?P<result>1-0|0-1|1/2-1/2|\*)                           # résultat
+  | (?P<san>[A-Za-z][\w+#=:-]*|0-0(?:-0)?[+#]?)              # coup SAN (roque 0-0 toléré)
+  | \$\d+ | \d+\.* | [!?]+                                   # NAG, numéro de coup, annotations
+''', re.VERBOSE)
+
+CLOCK_PATTERN = re.compile(r'\[%clk\s+(\d+):(\d+):(\d+(?:\.\d+)?)\]')
+
+
+def clock_seconds(comment):
+    """Temps restant (secondes) d'un commentaire [%clk h:mm:ss(.d)] ; None sans pendule"""
+    match = CLOCK_PATTERN.search(comment)
+    if match is None:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def read_mainline(pgn, clocks=False):
+    """En-têtes, coups SAN et résultat de la première partie d'un PGN
+
+    Retourne {'headers': {...}, 'sans': [...], 'result': '1-0'} ; avec clocks=True,
+    'clocks' donne le temps restant (secondes) après chaque coup de la partie
+    principale, None pour un coup sans pendule.
+    """
+    headers = {}
+    sans = []
+    times = []
+    result = '*'
+    depth = 0
+    for match in TOKEN_PATTERN.finditer(pgn):
+        kind = match.lastgroup
+        if kind == 'san':
+            if depth == 0:
+                san = match.group('san')
+                sans.append(san.replace('0', 'O') if san[0] == '0' else san)
+                times.append(None)
+        elif kind == 'comment':
+            if clocks and depth == 0 and sans:
+                times[-1] = clock_seconds(match.group('comment'))
+        elif kind == 'open':
+            depth += 1
+        elif kind == 'close':
+            depth = max(depth - 1, 0)
+        elif kind == 'result':
+            if depth == 0:
+                result = match.group('result')
+                break
+        elif kind == 'value':
+            if sans:
+                # En-tête de la partie suivante (PGN sans résultat final)
+                break
+            headers[match.group('tag')] = re.sub(r'\\(.)', r'\1', match.group('value'))
+
+    mainline = {'headers': headers, 'sans': sans, 'result': headers.get('Result', result) if result == '*' else result}
+    if clocks:
+        mainline['clocks'] = times
+    return mainline
@@ -0,0 +1,163 @@
+"""
+Index des positions d'une partie : FEN et clé Zobrist après chaque demi-coup
+
+Rejouer le PGN (lecture des coups puis un coup après l'autre) à chaque
+affichage d'une partie coûte plusieurs millisecondes. L'index est calculé une
+seule fois puis gardé dans le cache Django sous une clé formée de l'identifiant
+de la partie et d'une empreinte du PGN : un PGN modifié donne une nouvelle clé,
+et le cache en mémoire (LocMemCache) évince les index les moins récemment lus
+au-delà de MAX_ENTRIES.
+
+positions['fens'][n] et positions['keys'][n] décrivent la position après n
+demi-coups (0 : position initiale), positions['moves'][n] et
+positions['sans'][n] sont le coup du demi-coup n + 1 (UCI et SAN).
+
+Les positions de chaque partie sont aussi écrites dans la table GamePosition
+(index_game_positions, à la synchronisation puis après l'analyse) : les parties
+d'un joueur passées par une position se retrouvent par clé Zobrist, sans relire
+aucun PGN, et l'arbre d'ouvertures du joueur (explorer) est mis à jour.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .engine import chess_available
+from .explorer import OPENING_PLIES, update_opening_tree
+from .models import GamePosition
+from .pgn import read_mainline
+
+# Conservation d'un index dans le cache (secondes) ; un PGN ne change plus une fois la partie terminée
+CACHE_TIMEOUT = 7 * 24 * 3600
+
+
+def positions_cache_key(pgn, game_id=''):
+    return f"chess:positions:v2:{game_id}:{hashlib.sha1(pgn.encode('utf-8')).hexdigest()}"
+
+
+def build_position_index(pgn):
+    """Rejouer la partie principale du PGN ; None si le PGN est illisible
+
+    Coups lus par read_mainline (sans l'arbre de chess.pgn.read_game) ; un coup
+    illégal arrête la partie à la dernière position valide, comme read_game.
+    """
+    import chess.polyglot
+
+    mainline = read_mainline(pgn)
+    headers = mainline['headers']
+    if not headers and not mainline['sans']:
+        return None
+    try:
+        board = chess.Board(headers['FEN']) if headers.get('SetUp') == '1' and 'FEN' in headers else chess.Board()
+    except ValueError:
+        return None
+    positions = {'fens': [board.fen()], 'keys': [chess.polyglot.zobrist_hash(board)], 'moves': [], 'sans': []}
+    for san in mainline['sans']:
+        try:
+            move = board.parse_san(san)
+        except ValueError:
+            break
+        positions['moves'].append(move.uci())
+        positions['sans'].append(san)
+        board.push(move)
+        positions['fens'].append(board.fen())
+        positions['keys'].append(chess.polyglot.zobrist_hash(board))
+    return positions
+
+
+def game_positions(pgn, game_id=''):
+    """Index des positions d'une partie, calculé au premier appel puis lu dans le cache"""
+    if not chess_available() or not pgn:
+        return None
+    key = positions_cache_key(pgn, game_id)
+    positions = cache.get(key)
+    if positions is None:
+        positions = build_position_index(pgn)
+        if positions is not None:
+            cache.set(key, positions, CACHE_TIMEOUT)
+    return positions
+
+
+def signed_key(key):
+    """Clé Zobrist (entier non signé 64 bits) au format d'un BigIntegerField signé"""
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+def position_key(fen):
+    """Clé Zobrist signée d'une position FEN ; None si la FEN est invalide"""
+    import chess.polyglot
+
+    try:
+        return signed_key(chess.polyglot.zobrist_hash(chess.Board(fen)))
+    except ValueError:
+        return None
+
+
+def index_game_positions(chess_game, moves=None):
+    """(Ré)écrire les positions d'une partie dans GamePosition et mettre à jour l'arbre d'ouvertures
+
+    moves : entrées de moves_data['moves'] (lues sur la partie si elle est
+    analysée) ; sans analyse, seuls les coups sont indexés. Retourne le nombre
+    de positions indexées.
+    """
+    if not chess_available():
+        return 0
+    if moves is None:
+        moves = (chess_game.moves_data or {}).get('moves', []) if chess_game.analyzed else []
+    positions = game_positions(chess_game.pgn, chess_game.game_id)
+    if not positions:
+        return 0
+
+    player_color = chess_game.player_color or (
+        'white' if chess_game.white_player.lower() == chess_game.username.lower() else 'black'
+    )
+    analysed = {move_data['ply_count']: move_data for move_data in moves if move_data.get('ply_count')}
+    rows = []
+    for ply, move in enumerate(positions['moves'], start=1):
+        move_data = analysed.get(ply, {})
+        # Trait lu dans la FEN : juste aussi pour une partie commencée depuis une position
+        white_to_move = positions['fens'][ply - 1].split(' ')[1] == 'w'
+        rows.append(GamePosition(
+            game=chess_game,
+            username=chess_game.username,
+            zobrist=signed_key(positions['keys'][ply - 1]),
+            ply=ply,
+            move=move,
+            move_san=move_data.get('move_san') or positions['sans'][ply - 1],
+            evaluation=move_data.get('evaluation_before'),
+            centipawn_loss=move_data.get('centipawn_loss'),
+            quality=move_data.get('move_quality') or '',
+            is_player_move=white_to_move == (player_color == 'white'),
+        ))
+
+    with transaction.atomic():
+        indexed = GamePosition.objects.filter(game=chess_game)
+        old_rows = list(indexed.filter(ply__lte=OPENING_PLIES).only('ply', 'zobrist', 'move', 'move_san', 'centipawn_loss'))
+        indexed.delete()
+        GamePosition.objects.bulk_create(rows, batch_size=500)
+        update_opening_tree(chess_game, old_rows, rows)
+    return len(rows)
+
+
+def position_occurrences(username, fen):
+    """Passages d'un joueur par une position, des parties les plus récentes aux plus anciennes"""
+    key = position_key(fen)
+    if key is None:
+        return GamePosition.objects.none()
+    return (
+        GamePosition.objects.filter(username=username, zobrist=key)
+        .select_related('game')
+        .order_by('-game__start_time', 'ply')
+    )
+
+
+def repeated_mistakes(username, min_games=2):
+    """Positions où le joueur a commis une erreur ou une gaffe dans au moins min_games parties"""
+    return (
+        GamePosition.objects.filter(username=username, is_player_move=True, quality__in=['mistake', 'blunder'])
+        .values('zobrist')
+        .annotate(games=Count('game', distinct=True))
+        .filter(games__gte=min_games)
+        .order_by('-games')
+    )
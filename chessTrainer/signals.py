@@ -0,0 +1,12 @@
+"""
+Signaux pour supprimer les données partagées d'une partie quand plus aucun joueur ne la suit
+"""
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import ChessGame, ChessGameData
+
+
+@receiver(post_delete, sender=ChessGame)
+def delete_orphan_game_data(sender, instance, **kwargs):
+    """Supprime PGN et analyse (ChessGameData) avec la dernière vue de la partie"""
+    ChessGameData.objects.filter(game_key=instance.game_id, views__isnull=True).delete()
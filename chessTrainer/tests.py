@@ -1,3 +1,1116 @@
-from django.test import TestCase
+"""
+Tests de l'analyse des parties (avec un moteur factice déterministe à la place de Stockfish)
+"""
+import json
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import unittest
+import zlib
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import chess
+import chess.engine
+import chess.pgn
+import chess.polyglot
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import engine
+from .analysis import SHALLOW_TIME, AnalysisShortcuts, analyze_mainline
+from .jobs import NO_WORKER_MESSAGE, WAITING_MESSAGE, batch_event, enqueue_analysis, game_event, lease_job, queue_status
+from .models import (
+    AnalysisJob, ChessGame, ChessGameData, GamePosition, MoveAnalysis, OpeningNode, TrainingAttempt, TrainingPosition, TrainingSession, TrainingStats, decode_blob, encode_blob,
+)
+from .movedata import is_packed, plain
+from .pgn import read_mainline
+from .timeuse import numpy_available, time_usage
+from .positions import build_position_index, game_positions, index_game_positions, position_occurrences, repeated_mistakes
+from .training import RELEARN_DELAY, due_count, record_attempt, review_queue, schedule_review
+
+PIECE_VALUES = {chess.PAWN: 100, chess.KNIGHT: 300, chess.BISHOP: 320, chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 0}
+
+SAMPLE_PGN = """[Event "Live Chess"]
+[White "alice"]
+[Black "bob"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bc4 Nd4 4. Nxe5 Qg5 5. Nxf7 Qxg2 6. Rf1 Qxe4+ 7. Be2 Nf3# 1-0
+"""
+
+
+def static_eval(board):
+    """Matériel + petite perturbation stable tirée du hash Zobrist, du point de vue des blancs"""
+    if board.is_checkmate():
+        return -1000 if board.turn == chess.WHITE else 1000
+    if board.is_game_over():
+        return 0
+    material = sum(
+        PIECE_VALUES[piece.piece_type] * (1 if piece.color == chess.WHITE else -1)
+        for piece in board.piece_map().values()
+    )
+    return material + chess.polyglot.zobrist_hash(board) % 41 - 20
+
+
+class FakeEngine:
+    """Moteur à un demi-coup : le score d'un coup est l'évaluation statique de la position obtenue"""
+
+    def __init__(self):
+        self.searches = 0
+        self.time_requested = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def configure(self, options):
+        self.options = options
+
+    def quit(self):
+        self.stopped = True
+
+    def analyse(self, board, limit, multipv=None, game=None):
+        self.searches += 1
+        self.time_requested += limit.time or 0
+        infos = []
+        for move in board.legal_moves:
+            board.push(move)
+            infos.append((static_eval(board), move))
+            board.pop()
+        infos.sort(key=lambda item: item[0], reverse=board.turn == chess.WHITE)
+        if not infos:
+            infos = [{'score': chess.engine.PovScore(chess.engine.Cp(static_eval(board)), chess.WHITE)}]
+        else:
+            infos = [
+                {'score': chess.engine.PovScore(chess.engine.Cp(score), chess.WHITE), 'pv': [move]}
+                for score, move in infos[:multipv or 1]
+            ]
+        return infos if multipv else infos[0]
+
+    def analysis(self, board, limit, multipv=None, game=None):
+        result = mock.MagicMock()
+        result.__enter__.return_value = result
+        result.multipv = self.analyse(board, limit, multipv=multipv, game=game)
+        return result
+
+
+@contextmanager
+def fake_stockfish(**popen):
+    """Stockfish « installé », remplacé par le moteur factice ; pool de moteurs vidé en sortie"""
+    with mock.patch.object(engine, 'stockfish_path', return_value='stockfish'), \
+            mock.patch('chess.engine.SimpleEngine.popen_uci', **popen):
+        try:
+            yield
+        finally:
+            engine.close_engines()
+
+
+class IncrementalAnalysisTestCase(TestCase):
+    """Le mode incrémental doit classer les coups comme le mode coup par coup, avec moins de recherches"""
+
+    def setUp(self):
+        self.game = chess.pgn.read_game(StringIO(SAMPLE_PGN))
+
+    def test_incremental_matches_per_ply_classification(self):
+        per_ply_engine = FakeEngine()
+        per_ply_moves, per_ply_count = analyze_mainline(per_ply_engine, self.game, mode='per_ply')
+        incremental_engine = FakeEngine()
+        incremental_moves, incremental_count = analyze_mainline(incremental_engine, self.game, mode='incremental')
+
+        self.assertEqual(per_ply_count, incremental_count)
+        self.assertEqual(len(incremental_moves), 14)
+        for expected, actual in zip(per_ply_moves, incremental_moves):
+            self.assertEqual(expected['move_quality'], actual['move_quality'], actual['move_san'])
+            self.assertEqual(expected['centipawn_loss'], actual['centipawn_loss'], actual['move_san'])
+            self.assertEqual(expected['best_move'], actual['best_move'], actual['move_san'])
+            self.assertEqual(bool(expected['opponent_punishment']), bool(actual['opponent_punishment']))
+
+        # Une recherche par position au plus, contre plusieurs par coup en mode historique
+        self.assertLessEqual(incremental_engine.searches, incremental_count + 1)
+        self.assertLess(incremental_engine.searches, per_ply_engine.searches)
+
+    def test_analyze_game_with_stockfish_incremental(self):
+        from . import views
+
+        chess_game = ChessGame.objects.create(
+            username='bob',
+            game_id='test-1',
+            game_url='https://www.chess.com/game/live/1',
+            white_player='alice',
+            black_player='bob',
+            time_control='600',
+            result='white_win',
+            start_time=timezone.now(),
+            end_time=timezone.now(),
+            pgn=SAMPLE_PGN,
+        )
+        with fake_stockfish(return_value=FakeEngine()), self.assertLogs('chessTrainer.analysis', 'DEBUG') as logs:
+            self.assertTrue(views.analyze_game_with_stockfish(chess_game, mode='incremental'))
+
+        # Durée de chaque phase disponible en DEBUG, sous forme structurée
+        timed = [record for record in logs.records if hasattr(record, 'timings')]
+        self.assertEqual(len(timed), 1)
+        self.assertEqual(set(timed[0].timings), {'parse', 'engine', 'persist'})
+        self.assertEqual(timed[0].game_id, 'test-1')
+
+        chess_game.refresh_from_db()
+        self.assertTrue(chess_game.analyzed)
+        self.assertEqual(chess_game.moves_data['analysis_mode'], 'incremental')
+        self.assertEqual(chess_game.moves_data['total_moves'], 14)
+        black_errors = [
+            move for move in chess_game.moves_data['moves']
+            if not move['is_white_move'] and move['move_quality'] in ('mistake', 'blunder')
+        ]
+        self.assertEqual(MoveAnalysis.objects.filter(game=chess_game).count(), len(black_errors))
+
+
+class BudgetAnalysisTestCase(TestCase):
+    """Le mode budget doit détecter les mêmes erreurs en n'analysant en profondeur que les coups critiques"""
+
+    def setUp(self):
+        self.game = chess.pgn.read_game(StringIO(SAMPLE_PGN))
+
+    def test_budget_keeps_error_detection(self):
+        per_ply_engine = FakeEngine()
+        per_ply_moves, _ = analyze_mainline(per_ply_engine, self.game, mode='per_ply')
+        budget_engine = FakeEngine()
+        budget_moves, _ = analyze_mainline(budget_engine, self.game, mode='budget')
+
+        self.assertEqual(len(budget_moves), len(per_ply_moves))
+        for expected, actual in zip(per_ply_moves, budget_moves):
+            self.assertEqual(expected['error_type'], actual['error_type'], actual['move_san'])
+            if actual['is_error']:
+                # Coups critiques : analyse complète (MultiPV et punition)
+                self.assertEqual(actual['source'], 'engine')
+                self.assertEqual(len(actual['top_moves']), len(expected['top_moves']))
+        self.assertIn('shallow', {move['source'] for move in budget_moves})
+        self.assertLess(budget_engine.time_requested, per_ply_engine.time_requested)
+
+    def test_exhausted_budget_keeps_shallow_evaluations(self):
+        engine = FakeEngine()
+        moves, _ = analyze_mainline(engine, self.game, mode='budget', time_budget=0)
+
+        self.assertEqual({move['source'] for move in moves}, {'shallow'})
+        # Une recherche rapide par position, aucune analyse complète
+        self.assertEqual(engine.searches, len(moves) + 1)
+        self.assertTrue(any(move['error_type'] == 'blunder' for move in moves))
+
+    def test_failed_shallow_pass_analysed_despite_exhausted_budget(self):
+        """Un demi-coup sans évaluation rapide n'est jamais omis de moves_data"""
+        engine = FakeEngine()
+        analyse = engine.analyse
+
+        def failing_shallow_pass(board, limit, **kwargs):
+            if limit.time == SHALLOW_TIME:
+                raise chess.engine.EngineError("moteur indisponible")
+            return analyse(board, limit, **kwargs)
+
+        engine.analyse = failing_shallow_pass
+        moves, total_moves = analyze_mainline(engine, self.game, mode='budget', time_budget=0)
+
+        self.assertEqual([move['ply_count'] for move in moves], list(range(1, total_moves + 1)))
+        self.assertEqual({move['source'] for move in moves}, {'engine'})
+
+
+def write_polyglot_book(path, lines):
+    """Écrire un livre Polyglot minimal (poids 1) contenant les lignes données en SAN"""
+    entries = set()
+    for line in lines:
+        board = chess.Board()
+        for san in line.split():
+            move = board.parse_san(san)
+            raw_move = move.to_square | (move.from_square << 6)
+            entries.add((chess.polyglot.zobrist_hash(board), raw_move))
+            board.push(move)
+    with open(path, 'wb') as book_file:
+        for key, raw_move in sorted(entries):
+            book_file.write(struct.pack('>QHHI', key, raw_move, 1, 0))
+
+
+class FakeTablebase:
+    """Table de finales Roi+Dame contre Roi : gain pour le camp qui garde sa dame"""
+
+    def get_wdl(self, board):
+        queens = {color: bool(board.pieces(chess.QUEEN, color)) for color in chess.COLORS}
+        # Dame adverse en prise : elle sera capturée
+        if any(board.piece_type_at(move.to_square) == chess.QUEEN for move in board.legal_moves):
+            return 0
+        if queens[board.turn]:
+            return 2
+        return -2 if queens[not board.turn] else 0
+
+    def get_dtz(self, board):
+        return 0
+
+    def close(self):
+        pass
+
+
+class AnalysisShortcutsTestCase(TestCase):
+    """Livre d'ouvertures et tables de finales : coups classés sans recherche du moteur"""
+
+    def test_book_moves_skip_engine(self):
+        with tempfile.TemporaryDirectory() as directory:
+            book_path = os.path.join(directory, 'book.bin')
+            write_polyglot_book(book_path, ['e4 e5 Nf3 Nc6 Bc4', 'e4 e5 Nf3 Nf6'])
+            game = chess.pgn.read_game(StringIO(SAMPLE_PGN))
+            engine = FakeEngine()
+            with self.settings(CHESS_OPENING_BOOK=book_path), AnalysisShortcuts.from_settings() as shortcuts:
+                moves, _ = analyze_mainline(engine, game, mode='incremental', shortcuts=shortcuts)
+
+        self.assertEqual([move['source'] for move in moves[:6]], ['book'] * 5 + ['engine'])
+        self.assertEqual(moves[3]['top_moves'][0]['weight'], 50)
+        # Aucune recherche pour les 5 coups théoriques
+        self.assertEqual(engine.searches, len(moves) - 5)
+
+    def test_tablebase_detects_blunder_without_engine(self):
+        game = chess.pgn.read_game(StringIO(
+            '[FEN "8/8/8/4k3/8/8/3QK3/8 w - - 0 1"]\n[SetUp "1"]\n\n1. Qd3 Ke6 2. Qd5+ Kxd5 *\n'
+        ))
+        engine = FakeEngine()
+        moves, _ = analyze_mainline(engine, game, mode='per_ply', shortcuts=AnalysisShortcuts(tablebase=FakeTablebase()))
+
+        self.assertEqual(engine.searches, 0)
+        self.assertEqual([move['move_quality'] for move in moves], ['best', 'best', 'blunder', 'best'])
+        self.assertEqual(moves[2]['centipawn_loss'], 1000)
+        self.assertEqual(moves[2]['opponent_punishment']['move_san'], 'Kxd5')
+
+
+class GameSummaryTestCase(TestCase):
+    """Colonnes de résumé calculées à la sauvegarde et liste des parties groupée en SQL"""
+
+    def create_game(self, game_id, time_control, **kwargs):
+        return ChessGame.objects.create(
+            username='bob',
+            game_id=game_id,
+            game_url=f'https://www.chess.com/game/live/{game_id}',
+            white_player='alice',
+            black_player='bob',
+            time_control=time_control,
+            result='white_win',
+            start_time=timezone.now(),
+            end_time=timezone.now(),
+            pgn=SAMPLE_PGN,
+            **kwargs
+        )
+
+    def test_summary_columns(self):
+        game = self.create_game('g1', '180+2')
+        self.assertEqual(game.time_class, 'blitz')
+        self.assertEqual(game.player_color, 'black')
+        self.assertEqual(game.player_result, 'loss')
+        self.assertIsNone(game.error_count)
+
+        game.moves_data = {
+            'moves': [{'accuracy': 100}, {'accuracy': 45}, {'accuracy': 70}],
+            'blunders_count': 1,
+            'average_accuracy': 71.7,
+        }
+        game.analyzed = True
+        game.save(update_fields=['moves_data', 'analyzed'])
+        game.refresh_from_db()
+        self.assertEqual(game.error_count, 2)
+        self.assertEqual(game.blunder_count, 1)
+        self.assertEqual(game.accuracy, 71.7)
+
+    def test_list_games_groups_by_time_class(self):
+        self.create_game('g1', '60')
+        self.create_game('g2', '600', analyzed=True, moves_data={'moves': [{'accuracy': 30}]})
+        self.create_game('g3', '900+10')
+
+        response = self.client.get('/chessTrainer/games/bob/')
+        self.assertEqual(response.status_code, 200)
+        groups = dict(response.context['games_by_time_class'])
+        self.assertEqual(list(groups), ['bullet', 'rapid'])
+        self.assertEqual(groups['rapid']['count'], 2)
+        self.assertEqual(groups['rapid']['analyzed_count'], 1)
+        self.assertEqual(groups['rapid']['total_errors'], 1)
+        self.assertEqual(response.context['total_games'], 3)
+
+    def test_blobs_stored_compressed_and_loaded_lazily(self):
+        self.create_game('g1', '600', moves_data={'moves': [{'accuracy': 90}]})
+        data = ChessGameData.objects.get(game_key='g1')
+        self.assertLess(len(data.pgn), len(SAMPLE_PGN))
+
+        game = ChessGame.objects.get(game_id='g1')
+        self.assertNotIn('_blobs', game.__dict__)
+        self.assertTrue(game.has_pgn)
+        self.assertEqual(game.pgn, SAMPLE_PGN)
+
+        # Une modification en place de moves_data est détectée à la sauvegarde
+        game.moves_data['moves'].append({'accuracy': 40})
+        game.save()
+        self.assertEqual(len(ChessGame.objects.get(game_id='g1').moves_data['moves']), 2)
+
+
+class GameLibraryApiTestCase(TestCase):
+    """API paginée par curseur de la bibliothèque de parties"""
+
+    def setUp(self):
+        now = timezone.now()
+        for i in range(5):
+            ChessGame.objects.create(
+                username='bob',
+                game_id=f'g{i}',
+                game_url=f'https://www.chess.com/game/live/{i}',
+                white_player='alice' if i % 2 else 'bob',
+                black_player='bob' if i % 2 else 'alice',
+                time_control='600',
+                result='white_win',
+                # Deux parties terminées au même instant pour vérifier le départage par clé primaire
+                start_time=now,
+                end_time=now - timezone.timedelta(days=min(i, 3)),
+                analyzed=i < 3,
+                moves_data={'moves': [{'accuracy': 50}] * i},
+                pgn=SAMPLE_PGN.replace('[Result', f'[ECO "C{40 + i}"]\n[Result'),
+            )
+
+    def test_keyset_pagination_walks_every_game_once(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'page_size': 2}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get('/chessTrainer/api/games/bob/', params).json()
+            seen.extend(game['game_id'] for game in data['games'])
+            cursor = data['next_cursor']
+            if not data['has_more']:
+                break
+        self.assertEqual(seen, ['g0', 'g1', 'g2', 'g4', 'g3'])
+
+    def test_filters_and_error_sort(self):
+        url = '/chessTrainer/api/games/bob/'
+        data = self.client.get(url, {'color': 'white', 'result': 'win'}).json()
+        self.assertEqual([game['game_id'] for game in data['games']], ['g0', 'g2', 'g4'])
+
+        data = self.client.get(url, {'opening': 'C41'}).json()
+        self.assertEqual([game['game_id'] for game in data['games']], ['g1'])
+
+        data = self.client.get(url, {'sort': 'errors', 'analyzed': 'true', 'page_size': 1}).json()
+        self.assertEqual(data['games'][0]['game_id'], 'g2')
+        data = self.client.get(url, {'sort': 'errors', 'analyzed': 'true', 'cursor': data['next_cursor']}).json()
+        self.assertEqual([game['game_id'] for game in data['games']], ['g1', 'g0'])
+
+        self.assertEqual(self.client.get(url, {'cursor': 'invalide'}).status_code, 400)
+
+        data = self.client.get(url, {'cadence': 'rapid', 'page_size': 1, 'fragment': '1'}).json()
+        self.assertIn('data-game-id="g0"', data['html'])
+
+
+class AnalysisJobQueueTestCase(TestCase):
+    """File d'analyse durable : déduplication, reprise après arrêt du worker, exécution"""
+
+    def setUp(self):
+        self.game = self.create_game('job-1')
+
+    def create_game(self, game_id):
+        return ChessGame.objects.create(
+            username='bob',
+            game_id=game_id,
+            game_url=f'https://www.chess.com/game/live/{game_id}',
+            white_player='alice',
+            black_player='bob',
+            time_control='600',
+            result='white_win',
+            start_time=timezone.now(),
+            end_time=timezone.now(),
+            pgn=SAMPLE_PGN,
+        )
+
+    def test_enqueue_deduplicates_active_jobs(self):
+        job, created = enqueue_analysis(self.game, batch_id='lot-1')
+        again, created_again = enqueue_analysis(self.game, priority=AnalysisJob.PRIORITY_INTERACTIVE, batch_id='lot-2')
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(job.pk, again.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.priority, job.batch_id), (AnalysisJob.PRIORITY_INTERACTIVE, 'lot-2'))
+        self.assertEqual(AnalysisJob.objects.count(), 1)
+
+    def test_interactive_jobs_pass_bulk_backlog(self):
+        backlog = [self.game, self.create_game('bulk-1'), self.create_game('bulk-2')]
+        for game in backlog:
+            enqueue_analysis(game)
+        viewed = backlog[-1]
+        enqueue_analysis(viewed, priority=AnalysisJob.PRIORITY_INTERACTIVE)
+
+        # Worker réservé aux demandes interactives : ignore le reste de la file
+        self.assertEqual(lease_job('interactive', min_priority=AnalysisJob.PRIORITY_INTERACTIVE).game_id, viewed.pk)
+        self.assertIsNone(lease_job('interactive', min_priority=AnalysisJob.PRIORITY_INTERACTIVE))
+        # Le reste de la file dans l'ordre d'arrivée
+        self.assertEqual([lease_job('bulk').game_id for _ in backlog[:-1]], [game.pk for game in backlog[:-1]])
+
+    def test_expired_lease_is_resumed_by_another_worker(self):
+        enqueue_analysis(self.game)
+        job = lease_job('worker-a')
+        self.assertIsNone(lease_job('worker-b'))
+
+        # Worker A arrêté en pleine analyse : le bail expire
+        AnalysisJob.objects.filter(pk=job.pk).update(leased_until=timezone.now() - timedelta(seconds=1))
+        resumed = lease_job('worker-b')
+        self.assertEqual(resumed.pk, job.pk)
+        self.assertEqual((resumed.worker, resumed.attempts), ('worker-b', 2))
+
+    def test_worker_runs_queued_jobs(self):
+        enqueue_analysis(self.game, batch_id='lot-1')
+        with fake_stockfish(side_effect=lambda path: FakeEngine()):
+            call_command('analysis_worker', '--once', stdout=StringIO())
+
+        job = AnalysisJob.objects.get()
+        self.assertEqual((job.state, job.progress), ('done', 100))
+        self.assertTrue(ChessGame.objects.get(pk=self.game.pk).analyzed)
+        event = batch_event('lot-1')
+        self.assertEqual((event['type'], event['analyzed_games']), ('finished', 1))
+        self.assertEqual(game_event('job-1')['status'], 'completed')
+
+    def test_shared_game_is_analysed_once(self):
+        from . import views
+
+        engines = []
+        with fake_stockfish(side_effect=lambda path: engines.append(FakeEngine()) or engines[-1]):
+            enqueue_analysis(self.game)
+            call_command('analysis_worker', '--once', stdout=StringIO())
+
+            # L'adversaire, suivi lui aussi, est synchronisé ensuite : pas de nouvelle analyse
+            game_data = {
+                'uuid': 'job-1', 'url': self.game.game_url, 'time_control': '600', 'rated': True,
+                'start_time': 1700000000, 'end_time': 1700000600,
+                'white': {'username': 'alice', 'result': 'win'}, 'black': {'username': 'bob', 'result': 'checkmated'},
+            }
+            alice_view = views.save_or_update_game('alice', game_data, {'pgn': SAMPLE_PGN})
+            call_command('analysis_worker', '--once', stdout=StringIO())
+
+        self.assertEqual(len(engines), 1)
+        self.assertEqual(AnalysisJob.objects.count(), 1)
+        self.assertEqual(ChessGameData.objects.count(), 1)
+        self.assertEqual(self.game.blobs.views.count(), 2)
+
+        alice_view = ChessGame.objects.get(pk=alice_view.pk)
+        self.assertTrue(alice_view.analyzed)
+        self.assertEqual((alice_view.player_color, alice_view.player_result), ('white', 'win'))
+        self.assertEqual(alice_view.moves_data['moves'][0], ChessGame.objects.get(pk=self.game.pk).moves_data['moves'][0])
+        self.assertEqual(set(TrainingPosition.objects.filter(username='alice').values_list('player_color', flat=True)), {'white'})
+        self.assertEqual(set(TrainingPosition.objects.filter(username='bob').values_list('player_color', flat=True)), {'black'})
+
+        # Demande d'analyse depuis l'autre vue d'une partie en file : même job
+        bob_game = self.create_game('job-2')
+        alice_game = ChessGame.objects.create(
+            username='alice', game_id='job-2', game_url=bob_game.game_url, white_player='alice', black_player='bob',
+            time_control='600', result='white_win', start_time=bob_game.start_time, end_time=bob_game.end_time,
+        )
+        job, _ = enqueue_analysis(bob_game)
+        self.assertEqual(enqueue_analysis(alice_game, priority=AnalysisJob.PRIORITY_INTERACTIVE), (job, False))
+        self.assertEqual(alice_game.pgn, SAMPLE_PGN)
+
+    def test_failed_analysis_keeps_shared_data(self):
+        """Un échec d'analyse depuis la vue d'un joueur n'efface pas l'analyse partagée de l'autre"""
+        alice_game = ChessGame.objects.create(
+            username='alice', game_id='job-1', game_url=self.game.game_url, white_player='alice', black_player='bob',
+            time_control='600', result='white_win', start_time=self.game.start_time, end_time=self.game.end_time,
+        )
+        with fake_stockfish(side_effect=lambda path: FakeEngine()):
+            enqueue_analysis(self.game)
+            call_command('analysis_worker', '--once', stdout=StringIO())
+        ChessGame.objects.filter(pk=alice_game.pk).update(analyzed=False)
+        shared = ChessGameData.objects.get().moves_data
+
+        with fake_stockfish(side_effect=chess.engine.EngineTerminatedError("Stockfish arrêté")):
+            job, _ = enqueue_analysis(alice_game)
+            call_command('analysis_worker', '--once', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.state, 'failed')
+        self.assertIn("Stockfish arrêté", job.error)
+        self.assertEqual(ChessGameData.objects.get().moves_data, shared)
+        bob_game = ChessGame.objects.get(pk=self.game.pk)
+        self.assertTrue(bob_game.analyzed)
+        self.assertTrue(bob_game.moves_data['moves'])
+        self.assertIsNotNone(bob_game.accuracy)
+        self.assertFalse(ChessGame.objects.get(pk=alice_game.pk).analyzed)
+
+        # Ré-analyse forcée qui échoue : les deux vues repassent non analysées, l'analyse reste
+        AnalysisJob.objects.all().delete()
+        with fake_stockfish(side_effect=chess.engine.EngineTerminatedError("Stockfish arrêté")):
+            enqueue_analysis(self.game, force=True)
+            call_command('analysis_worker', '--once', stdout=StringIO())
+        self.assertEqual(ChessGameData.objects.get().moves_data, shared)
+        self.assertEqual(
+            list(ChessGame.objects.filter(game_id='job-1').values_list('analyzed', 'accuracy')),
+            [(False, None), (False, None)],
+        )
+
+    def test_shared_data_deleted_with_last_view(self):
+        alice_game = ChessGame.objects.create(
+            username='alice', game_id='job-1', game_url=self.game.game_url, white_player='alice', black_player='bob',
+            time_control='600', result='white_win', start_time=self.game.start_time, end_time=self.game.end_time,
+        )
+        self.game.delete()
+        self.assertTrue(ChessGameData.objects.filter(game_key='job-1').exists())
+        ChessGame.objects.filter(pk=alice_game.pk).delete()
+        self.assertFalse(ChessGameData.objects.exists())
+
+        # Données orphelines laissées avant le signal : supprimées à la demande
+        ChessGameData.objects.create(game_key='old-1')
+        out = StringIO()
+        call_command('game_storage_stats', '--purge-orphans', '--repeat', '1', stdout=out)
+        self.assertIn("1 données de parties orphelines supprimées", out.getvalue())
+        self.assertFalse(ChessGameData.objects.exists())
+
+    def test_analyze_all_enqueues_batch(self):
+        response = self.client.post('/chessTrainer/analyze-all-async/bob/')
+        session_id = response.json()['session_id']
+
+        job = AnalysisJob.objects.get()
+        self.assertEqual((job.game_id, job.batch_id, job.state), (self.game.pk, session_id, 'pending'))
+        self.assertEqual(batch_event(session_id)['type'], 'analysis_progress')
+
+    def test_missing_worker_is_reported(self):
+        """Demande en attente sans worker : signalée par le flux SSE et l'API d'état"""
+        enqueue_analysis(self.game, batch_id='lot-1')
+        self.assertEqual(game_event('job-1')['message'], WAITING_MESSAGE)
+        self.assertFalse(queue_status()['worker_missing'])
+
+        AnalysisJob.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(game_event('job-1')['message'], NO_WORKER_MESSAGE)
+        self.assertEqual(batch_event('lot-1')['game_info'], NO_WORKER_MESSAGE)
+        queue = self.client.get('/chessTrainer/check-analysis-status/bob/').json()['queue']
+        self.assertEqual(queue['pending_jobs'], 1)
+        self.assertGreaterEqual(queue['oldest_pending_seconds'], 300)
+        self.assertTrue(queue['worker_missing'])
+
+        # Un worker en plein travail sur un autre job : la file avance, rien à signaler
+        enqueue_analysis(self.create_game('job-2'))
+        AnalysisJob.objects.filter(game__game_id='job-2').update(state='running', leased_until=timezone.now() + timedelta(minutes=5))
+        self.assertFalse(queue_status()['worker_missing'])
+
+    def test_in_process_worker_is_opt_in(self):
+        with mock.patch('chessTrainer.jobs.threading.Thread') as thread, \
+                mock.patch.object(engine, 'stockfish_path', return_value='stockfish'):
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue_analysis(self.game)
+            thread.assert_not_called()
+
+            AnalysisJob.objects.all().delete()
+            with override_settings(CHESS_ANALYSIS_IN_PROCESS=True), self.captureOnCommitCallbacks(execute=True):
+                enqueue_analysis(self.game)
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
+
+
+class MoveAnalysisPersistenceTestCase(TestCase):
+    """Positions d'entraînement écrites en quelques requêtes groupées, sans perdre l'historique"""
+
+    def setUp(self):
+        self.chess_game = ChessGame.objects.create(
+            username='bob',
+            game_id='persist-1',
+            game_url='https://www.chess.com/game/live/persist-1',
+            white_player='alice',
+            black_player='bob',
+            time_control='600',
+            result='white_win',
+            start_time=timezone.now(),
+            end_time=timezone.now(),
+            pgn=SAMPLE_PGN,
+        )
+        game = chess.pgn.read_game(StringIO(SAMPLE_PGN))
+        self.moves, _ = analyze_mainline(FakeEngine(), game, mode='incremental')
+        self.player_errors = [
+            move for move in self.moves
+            if not move['is_white_move'] and move['move_quality'] in ('mistake', 'blunder')
+        ]
+
+    def test_bulk_upsert_keeps_training_history(self):
+        from .views import create_move_analyses_from_data
+
+        with CaptureQueriesContext(connection) as queries:
+            created = create_move_analyses_from_data(self.chess_game, self.moves)
+        self.assertEqual(created, len(self.player_errors))
+        self.assertGreater(created, 1)
+        self.assertLessEqual(len(queries), 8)
+
+        # Positions reprises de moves_data, position après = position avant du demi-coup suivant
+        first = MoveAnalysis.objects.get(game=self.chess_game, move_number=self.player_errors[0]['move_number'])
+        self.assertEqual(first.fen_before, self.player_errors[0]['fen_before'])
+        self.assertEqual(first.fen_after, self.moves[self.player_errors[0]['ply_count']]['fen_before'])
+
+        position = TrainingPosition.objects.get(move_analysis=first)
+        TrainingPosition.objects.filter(pk=position.pk).update(times_played=3)
+
+        # Ré-analyse : le premier coup n'est plus une erreur, les autres sont mis à jour
+        self.moves[self.player_errors[0]['ply_count'] - 1]['move_quality'] = 'best'
+        self.moves[self.player_errors[1]['ply_count'] - 1]['best_move'] = 'a7a6'
+        create_move_analyses_from_data(self.chess_game, self.moves)
+        self.assertFalse(TrainingPosition.objects.filter(pk=position.pk).exists())
+        second = TrainingPosition.objects.get(move_analysis__move_number=self.player_errors[1]['move_number'])
+        self.assertEqual(second.best_move, 'a7a6')
+
+        TrainingPosition.objects.filter(pk=second.pk).update(times_played=2)
+        create_move_analyses_from_data(self.chess_game, self.moves)
+        self.assertEqual(TrainingPosition.objects.get(pk=second.pk).times_played, 2)
+
+
+class MovesDataEncodingTestCase(TestCase):
+    """Format colonnaire de moves_data : restitution exacte et stockage réduit"""
+
+    def analyzed_moves(self):
+        with tempfile.TemporaryDirectory() as directory:
+            book_path = os.path.join(directory, 'book.bin')
+            write_polyglot_book(book_path, ['e4 e5 Nf3 Nc6'])
+            game = chess.pgn.read_game(StringIO(SAMPLE_PGN))
+            with self.settings(CHESS_OPENING_BOOK=book_path), AnalysisShortcuts.from_settings() as shortcuts:
+                moves, _ = analyze_mainline(FakeEngine(), game, mode='per_ply', shortcuts=shortcuts)
+        return moves
+
+    def test_round_trip_is_exact_and_smaller(self):
+        moves = self.analyzed_moves()
+        endgame = chess.pgn.read_game(StringIO(
+            '[FEN "8/8/8/4k3/8/8/3QK3/8 w - - 0 1"]\n[SetUp "1"]\n\n1. Qd3 Ke6 2. Qd5+ Kxd5 *\n'
+        ))
+        endgame_moves, _ = analyze_mainline(FakeEngine(), endgame, mode='per_ply', shortcuts=AnalysisShortcuts(tablebase=FakeTablebase()))
+        self.assertEqual({move['source'] for move in moves}, {'book', 'engine'})
+        self.assertTrue(any(move['opponent_punishment'] for move in moves))
+
+        for analysis in (moves, endgame_moves):
+            moves_data = {'moves': analysis, 'total_moves': len(analysis), 'analysis_engine': 'Stockfish'}
+            raw = encode_blob('moves_data', moves_data)
+            self.assertTrue(is_packed(raw))
+            self.assertLess(len(raw), len(zlib.compress(json.dumps(moves_data).encode('utf-8'), 6)) / 2)
+
+            decoded = decode_blob('moves_data', raw)
+            self.assertIsInstance(decoded, dict)
+            self.assertEqual(decoded['total_moves'], len(analysis))
+            self.assertEqual(plain(decoded), moves_data)
+            # Données relues et non modifiées : encodage identique (pas de réécriture)
+            self.assertEqual(encode_blob('moves_data', decoded), raw)
+
+    def test_game_reads_columnar_moves(self):
+        moves = self.analyzed_moves()
+        game = ChessGame.objects.create(
+            username='bob', game_id='codec-1', game_url='https://www.chess.com/game/live/codec-1',
+            white_player='alice', black_player='bob', time_control='600', result='white_win',
+            start_time=timezone.now(), end_time=timezone.now(), pgn=SAMPLE_PGN,
+            moves_data={'moves': moves, 'total_moves': len(moves)}, analyzed=True,
+        )
+        self.assertTrue(is_packed(ChessGameData.objects.get(game_key=game.game_id).moves_data))
+
+        from .views import get_game_errors
+        game = ChessGame.objects.get(pk=game.pk)
+        errors = get_game_errors(game)
+        self.assertEqual(
+            [move['move_san'] for move in errors],
+            [move['move_san'] for move in moves if move['move_quality'] in ('mistake', 'blunder')],
+        )
+        # Colonne de résumé calculée à la création depuis les dictionnaires d'origine
+        self.assertEqual(len(game.get_errors()), game.error_count)
+        self.assertEqual(errors[0]['fen_before'], next(move['fen_before'] for move in moves if move['move_quality'] in ('mistake', 'blunder')))
+
+    def test_other_formats_stay_json(self):
+        moves_data = {'moves': [{'accuracy': 90}]}
+        raw = encode_blob('moves_data', moves_data)
+        self.assertFalse(is_packed(raw))
+        self.assertEqual(decode_blob('moves_data', raw), moves_data)
+
+
+class PositionIndexTestCase(TestCase):
+    """Index des positions calculé une fois par PGN puis lu dans le cache"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_positions_replayed_once_per_pgn(self):
+        with mock.patch('chessTrainer.positions.read_mainline', wraps=read_mainline) as parse:
+            positions = game_positions(SAMPLE_PGN, 'g1')
+            self.assertEqual(game_positions(SAMPLE_PGN, 'g1'), positions)
+            self.assertEqual(parse.call_count, 1)
+
+            # PGN modifié : nouvelle clé, index recalculé
+            game_positions(SAMPLE_PGN.replace('Nf3# 1-0', '*'), 'g1')
+            self.assertEqual(parse.call_count, 2)
+
+        board = chess.Board()
+        self.assertEqual(positions['fens'][0], board.fen())
+        for fen, key, uci in zip(positions['fens'][1:], positions['keys'][1:], positions['moves']):
+            board.push_uci(uci)
+            self.assertEqual(fen, board.fen())
+            self.assertEqual(key, chess.polyglot.zobrist_hash(board))
+        self.assertTrue(board.is_checkmate())
+
+    def test_fens_by_ply_without_analysis_fens_uses_index(self):
+        from .views import _fens_by_ply, get_game_positions
+
+        chess_game = ChessGame(username='bob', game_id='g1', pgn=SAMPLE_PGN)
+        fens = get_game_positions(SAMPLE_PGN, 'g1')
+        with mock.patch('chess.pgn.read_game') as read_game:
+            by_ply = _fens_by_ply(chess_game, [{'ply_count': 1, 'move': 'e2e4'}])
+        read_game.assert_not_called()
+        self.assertEqual(by_ply[1], chess.STARTING_FEN)
+        self.assertEqual(by_ply[len(fens)], fens[-1])
+
+
+class GamePositionIndexTestCase(TestCase):
+    """Positions des parties analysées retrouvées par clé Zobrist"""
+
+    def setUp(self):
+        cache.clear()
+        self.games = []
+        for index, pgn in enumerate([SAMPLE_PGN, SAMPLE_PGN.replace('4. Nxe5 Qg5 5. Nxf7 Qxg2 6. Rf1 Qxe4+ 7. Be2 Nf3# 1-0', '4. Nxd4 *')]):
+            chess_game = ChessGame.objects.create(
+                username='bob',
+                game_id=f'index-{index}',
+                game_url=f'https://www.chess.com/game/live/index-{index}',
+                white_player='alice',
+                black_player='bob',
+                time_control='600',
+                result='white_win' if index == 0 else 'black_win',
+                start_time=timezone.now() - timedelta(days=index),
+                end_time=timezone.now(),
+                pgn=pgn,
+            )
+            moves, _ = analyze_mainline(FakeEngine(), chess.pgn.read_game(StringIO(pgn)), mode='incremental')
+            self.assertEqual(index_game_positions(chess_game, moves), len(moves))
+            self.games.append((chess_game, moves))
+
+    def test_position_lookup_without_replay(self):
+        board = chess.Board()
+        for san in ('e4', 'e5', 'Nf3', 'Nc6', 'Bc4'):
+            board.push_san(san)
+
+        with mock.patch('chess.pgn.read_game') as read_game:
+            occurrences = list(position_occurrences('bob', board.fen()))
+        read_game.assert_not_called()
+        self.assertEqual([occurrence.game.game_id for occurrence in occurrences], ['index-0', 'index-1'])
+        self.assertEqual({(occurrence.ply, occurrence.move_san, occurrence.is_player_move) for occurrence in occurrences}, {(6, 'Nd4', True)})
+
+        # Même gaffe noire (3...Nd4) dans les deux parties
+        self.assertEqual(list(repeated_mistakes('bob')), [{'zobrist': occurrences[0].zobrist, 'games': 2}])
+
+        response = self.client.get('/chessTrainer/api/positions/bob/', {'fen': board.fen()})
+        data = response.json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['moves'], [{'move': 'c6d4', 'san': 'Nd4', 'count': 2, 'player_count': 2}])
+        self.assertEqual(self.client.get('/chessTrainer/api/positions/bob/').status_code, 400)
+
+    def test_reindex_replaces_rows(self):
+        chess_game, moves = self.games[1]
+        index_game_positions(chess_game, moves[:3])
+        self.assertEqual(chess_game.positions.count(), len(moves))
+        self.assertEqual(chess_game.positions.exclude(quality='').count(), 3)
+        self.assertEqual(list(position_occurrences('bob', 'not a fen')), [])
+
+    def test_opening_tree_counts_each_game_once(self):
+        # Partie synchronisée (coups seuls) puis analysée : comptée une seule fois
+        chess_game, moves = self.games[0]
+        chess_game.analyzed = False
+        index_game_positions(chess_game)
+        chess_game.analyzed = True
+        index_game_positions(chess_game, moves)
+
+        root = self.client.get('/chessTrainer/api/openings/bob/', {'color': 'black'}).json()
+        self.assertEqual(root['games'], 2)
+        e4 = root['moves'][0]
+        self.assertEqual((e4['san'], e4['games'], e4['wins'], e4['losses'], e4['score']), ('e4', 2, 1, 1, 50.0))
+        cp_losses = [moves[0]['centipawn_loss'] for _, moves in self.games]
+        self.assertAlmostEqual(e4['average_centipawn_loss'], round(sum(cp_losses) / 2, 1))
+        self.assertEqual(self.client.get('/chessTrainer/api/openings/bob/', {'color': 'white'}).json()['moves'], [])
+
+        # Descente dans l'arbre en suivant les FEN
+        node = root
+        for san in ('e4', 'e5', 'Nf3', 'Nc6', 'Bc4'):
+            fen = next(move['fen'] for move in node['moves'] if move['san'] == san)
+            node = self.client.get('/chessTrainer/api/openings/bob/', {'color': 'black', 'fen': fen}).json()
+        self.assertEqual([(move['san'], move['games']) for move in node['moves']], [('Nd4', 2)])
+
+        # Ré-analyse partielle : seules les pertes des coups analysés restent
+        index_game_positions(self.games[1][0], self.games[1][1][:3])
+        nd4 = OpeningNode.objects.get(username='bob', color='black', move='c6d4')
+        self.assertEqual((nd4.games, nd4.centipawn_loss_count), (2, 1))
+        self.assertEqual(self.client.get('/chessTrainer/api/openings/bob/', {'color': 'red'}).status_code, 400)
+
+class TrainingScheduleTestCase(TestCase):
+    """File de révision : positions ratées en tête, positions réussies espacées"""
+
+    def setUp(self):
+        game = ChessGame.objects.create(
+            username='bob',
+            game_id='train-1',
+            game_url='https://www.chess.com/game/live/train-1',
+            white_player='alice',
+            black_player='bob',
+            time_control='600',
+            result='white_win',
+            start_time=timezone.now(),
+            end_time=timezone.now(),
+            pgn=SAMPLE_PGN,
+        )
+        self.positions = []
+        for move_number in range(1, 4):
+            move = MoveAnalysis.objects.create(
+                game=game, move_number=move_number, move_notation='Nd4', fen_before=chess.STARTING_FEN, fen_after=chess.STARTING_FEN,
+            )
+            self.positions.append(TrainingPosition.objects.create(
+                username='bob', original_game=game, move_analysis=move, fen_position=chess.STARTING_FEN, player_color='black',
+                original_move='c6d4', original_evaluation=-300, best_move='g8f6', best_evaluation=20,
+            ))
+
+    def test_schedule_review_spacing(self):
+        position = self.positions[0]
+        now = timezone.now()
+        self.assertTrue(schedule_review(position, 'perfect', now))
+        self.assertEqual((position.streak, position.interval), (1, 1))
+        self.assertEqual(position.next_due, now + timedelta(days=1))
+        schedule_review(position, 'good', now)
+        self.assertEqual(position.interval, 6)
+        schedule_review(position, 'perfect', now)
+        self.assertEqual(position.interval, 15.6)
+
+        ease = position.ease
+        schedule_review(position, 'blunder', now)
+        self.assertEqual((position.streak, position.interval), (0, 0))
+        self.assertEqual(position.next_due, now + RELEARN_DELAY)
+        self.assertLess(position.ease, ease)
+
+        self.assertFalse(schedule_review(position, 'illegal', now))
+
+    def test_attempts_reorder_queue(self):
+        solved, failed, untouched = self.positions
+        for position, quality in ((solved, 'perfect'), (failed, 'blunder')):
+            result = {'evaluation': 0, 'quality': quality, 'improvement_points': 0, 'is_better': quality == 'perfect', 'is_best': quality == 'perfect'}
+            with mock.patch('chessTrainer.views.analyze_training_move', return_value=result):
+                response = self.client.post('/chessTrainer/training/check-move/', json.dumps({'position_id': position.id, 'move': 'g8f6'}), content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(list(review_queue('bob')), [untouched, failed, solved])
+        self.assertEqual(due_count('bob'), 1)
+        self.assertEqual(due_count('bob', timezone.now() + timedelta(hours=1)), 2)
+
+        response = self.client.get(f'/chessTrainer/training/bob/next/{untouched.id}/')
+        self.assertRedirects(response, f'/chessTrainer/training/bob/position/{failed.id}/', fetch_redirect_response=False)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/chessTrainer/training/bob/')
+        self.assertEqual([p.id for p in response.context['positions']], [untouched.id, failed.id, solved.id])
+        self.assertEqual(response.context['due_count'], 1)
+        self.assertFalse(any('RANDOM' in query['sql'].upper() for query in queries))
+
+    def test_attempt_counters_use_increments(self):
+        position = self.positions[0]
+        stale = TrainingPosition.objects.get(pk=position.pk)
+        session_response = self.client.get('/chessTrainer/training/bob/')
+        session = session_response.context['session']
+
+        results = [
+            {'evaluation': 20, 'quality': 'perfect', 'improvement_points': 3.2, 'is_better': True, 'is_best': True},
+            {'evaluation': -300, 'quality': 'blunder', 'improvement_points': 0, 'is_better': False, 'is_best': False},
+        ]
+        for result in results:
+            with mock.patch('chessTrainer.views.analyze_training_move', return_value=result):
+                self.client.post('/chessTrainer/training/check-move/', json.dumps({'position_id': position.id, 'move': 'g8f6', 'time_spent': 7}), content_type='application/json')
+
+        # Une instance lue avant les tentatives n'écrase pas les compteurs
+        record_attempt(stale, results[0], 'g8f6')
+        position.refresh_from_db()
+        self.assertEqual((position.times_played, position.times_solved), (3, 2))
+        self.assertEqual((stale.times_played, stale.times_solved), (3, 2))
+
+        session = TrainingSession.objects.get(pk=session.pk)
+        self.assertEqual((session.positions_attempted, session.positions_solved), (2, 1))
+        self.assertAlmostEqual(session.total_improvement_points, 3.2)
+
+        stats = TrainingStats.objects.get(username='bob')
+        self.assertEqual((stats.attempts, stats.solved, stats.total_time_seconds), (3, 2, 14))
+        breakdown = stats.breakdown()
+        self.assertEqual(breakdown['difficulty']['medium'], {'attempts': 3, 'solved': 2, 'rate': 2 / 3 * 100})
+        self.assertEqual(breakdown['phase']['opening']['attempts'], 3)
+        self.assertEqual(breakdown['phase']['endgame']['attempts'], 0)
+        self.assertEqual(breakdown['quality'], {'perfect': 2, 'good': 0, 'suboptimal': 0, 'poor': 0, 'blunder': 1})
+
+    def test_concurrent_first_attempts(self):
+        """La ligne de statistiques créée entre-temps par une autre tentative ne fait pas échouer celle-ci"""
+        TrainingStats.objects.create(username='bob')
+        update = QuerySet.update
+        missed = []
+
+        def first_update_misses(queryset, **kwargs):
+            # La ligne n'est pas encore visible au premier UPDATE
+            if queryset.model is TrainingStats and not missed:
+                missed.append(True)
+                return 0
+            return update(queryset, **kwargs)
+
+        result = {'evaluation': 20, 'quality': 'perfect', 'improvement_points': 1, 'is_better': True, 'is_best': True}
+        with mock.patch.object(QuerySet, 'update', autospec=True, side_effect=first_update_misses):
+            attempt = record_attempt(self.positions[0], result, 'g8f6', time_spent=4)
+
+        self.assertTrue(missed)
+        self.assertTrue(TrainingAttempt.objects.filter(pk=attempt.pk).exists())
+        stats = TrainingStats.objects.get(username='bob')
+        self.assertEqual((stats.attempts, stats.solved, stats.total_time_seconds), (1, 1, 4))
+
+
+class EngineServiceTestCase(TestCase):
+    """python-chess et Stockfish ne sont chargés qu'au premier usage ; les moteurs sont réutilisés"""
+
+    def test_startup_does_not_load_chess(self):
+        script = (
+            "import sys, django; django.setup(); "
+            "from django.urls import resolve; resolve('/chessTrainer/'); "
+            "import chessTrainer.views; print('chess' in sys.modules)"
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', script], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR, env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'mysite.settings'},
+        ).stdout
+        self.assertEqual(output.strip(), 'False')
+
+    def test_stockfish_path_from_settings(self):
+        engine.stockfish_path.cache_clear()
+        self.addCleanup(engine.stockfish_path.cache_clear)
+        with override_settings(STOCKFISH_PATH=sys.executable):
+            self.assertEqual(engine.stockfish_path(), sys.executable)
+            # Résultat gardé : pas de nouvelle recherche sur le disque
+            with mock.patch('shutil.which') as which:
+                self.assertTrue(engine.stockfish_available())
+            which.assert_not_called()
+
+    @override_settings(STOCKFISH_POOL_SIZE=1, STOCKFISH_HASH=64, STOCKFISH_THREADS=2)
+    def test_pool_reuses_configured_engine(self):
+        engines = []
+        with fake_stockfish(side_effect=lambda path: engines.append(FakeEngine()) or engines[-1]):
+            for _ in range(2):
+                with engine.open_engine() as first:
+                    pass
+            self.assertEqual(len(engines), 1)
+            self.assertEqual(first.options, {'Hash': 64, 'Threads': 2})
+
+            # Moteur interrompu par une erreur : arrêté, le suivant est un nouveau processus
+            with self.assertRaises(RuntimeError), engine.open_engine():
+                raise RuntimeError
+            self.assertTrue(engines[0].stopped)
+            with engine.open_engine() as second:
+                self.assertIsNot(second, first)
+
+
+class BenchAnalysisTestCase(TestCase):
+    """bench_analysis : mesure sur les parties de référence, sans rien laisser en base"""
+
+    def test_bench_compares_with_saved_baseline(self):
+        with tempfile.TemporaryDirectory() as directory, fake_stockfish(side_effect=lambda path: FakeEngine()):
+            baseline = os.path.join(directory, 'baseline.json')
+            arguments = ['bench_analysis', '--games', 'short', 'endgame', '--mode', 'incremental', '--baseline', baseline]
+            call_command(*arguments, '--save-baseline', stdout=StringIO())
+            with open(baseline) as f:
+                saved = json.load(f)
+            self.assertEqual((saved['games']['short']['plies'], saved['games']['endgame']['plies']), (33, 115))
+            self.assertEqual(set(saved['games']['short']['timings']), {'parse', 'engine', 'persist'})
+            self.assertEqual(len(saved['games']['short']['qualities']), 33)
+
+            output = StringIO()
+            call_command(*arguments, stdout=output)
+        self.assertIn('short : classement identique 33/33 (100%)', output.getvalue())
+        self.assertFalse(ChessGame.objects.exists())
+
+
+class PgnMainlineTestCase(TestCase):
+    """read_mainline : partie principale en une passe, comme chess.pgn.read_game"""
+
+    def test_same_moves_and_clocks_as_read_game(self):
+        for name in ('short', 'long', 'endgame'):
+            with open(os.path.join(os.path.dirname(__file__), 'bench', f'{name}.pgn')) as f:
+                pgn = f.read()
+            game = chess.pgn.read_game(StringIO(pgn))
+            mainline = read_mainline(pgn, clocks=True)
+            self.assertEqual(mainline['sans'], [node.san() for node in game.mainline()], name)
+            self.assertEqual(mainline['clocks'], [node.clock() for node in game.mainline()], name)
+            self.assertEqual(mainline['headers'], dict(game.headers), name)
+
+    def test_variations_comments_and_annotations_skipped(self):
+        pgn = (
+            '[Event "Live Chess"]\n[White "a \\"b\\""]\n\n'
+            '1. e4!? $1 {[%clk 0:01:02.5]} (1. d4 {variante} d5 (1... Nf6 2. c4)) 1... e5 ; fin de ligne\n'
+            '2. Nf3 {sans pendule} 2... Nc6 {[%clk 0:00:59]} 1/2-1/2\n\n[Event "Suivante"]\n\n1. d4 *\n'
+        )
+        mainline = read_mainline(pgn, clocks=True)
+        self.assertEqual(mainline['headers'], {'Event': 'Live Chess', 'White': 'a "b"'})
+        self.assertEqual(mainline['sans'], ['e4', 'e5', 'Nf3', 'Nc6'])
+        self.assertEqual(mainline['clocks'], [62.5, None, None, 59.0])
+        self.assertEqual(mainline['result'], '1/2-1/2')
+        self.assertEqual(build_position_index(pgn)['moves'], ['e2e4', 'e7e5', 'g1f3', 'b8c6'])
+
+
+CLOCK_PGN = """[Event "Live Chess"]
+[White "alice"]
+[Black "bob"]
+[Result "0-1"]
+[TimeControl "60+1"]
+
+1. e4 {[%clk 0:01:00]} 1... e5 {[%clk 0:01:00]} 2. Nf3 {[%clk 0:00:35]} 2... Nc6 {[%clk 0:00:59]}
+3. Bc4 {[%clk 0:00:08]} 3... Nd4 {[%clk 0:00:58]} 4. Nxe5 {[%clk 0:00:05]} 4... Qg5 {[%clk 0:00:57.5]} 0-1
+"""
+
+
+class TimeUsageTestCase(TestCase):
+    """Pendules lues à l'enregistrement du PGN et erreurs selon le temps restant"""
+
+    def create_game(self, game_id, time_control):
+        return ChessGame.objects.create(
+            username='alice',
+            game_id=game_id,
+            game_url=f'https://www.chess.com/game/live/{game_id}',
+            white_player='alice',
+            black_player='bob',
+            time_control=time_control,
+            result='black_win',
+            start_time=timezone.now(),
+            end_time=timezone.now(),
+            pgn=CLOCK_PGN,
+        )
+
+    def test_clocks_stored_with_pgn(self):
+        game = self.create_game('clocks-1', '60+1')
+        raw = ChessGameData.objects.get(game_key='clocks-1').clocks
+        self.assertEqual(bytes(raw), struct.pack('<8I', 600, 600, 350, 590, 80, 580, 50, 575))
+        self.assertEqual(ChessGame.objects.get(pk=game.pk).clocks, [60.0, 60.0, 35.0, 59.0, 8.0, 58.0, 5.0, 57.5])
+
+        # Parties importées avant la lecture des pendules
+        ChessGameData.objects.update(clocks=b'')
+        call_command('backfill_game_clocks', stdout=StringIO())
+        self.assertEqual(bytes(ChessGameData.objects.get(game_key='clocks-1').clocks), bytes(raw))
+
+    @unittest.skipUnless(numpy_available(), "NumPy n'est pas installé")
+    def test_errors_by_remaining_time(self):
+        game = self.create_game('clocks-1', '60+1')
+        self.create_game('clocks-daily', '1/86400')  # Correspondance : ignorée
+        for ply, quality in ((3, 'mistake'), (5, 'good'), (7, 'blunder')):
+            GamePosition.objects.create(game=game, username='alice', zobrist=ply, ply=ply, move='e2e4', quality=quality, is_player_move=True)
+
+        usage = time_usage('alice')
+        self.assertEqual((usage['games'], usage['moves'], usage['analysed_moves']), (1, 4, 3))
+        buckets = {bucket['label']: bucket for bucket in usage['buckets']}
+        # 4. Nxe5 joué avec 8 s restantes, 3. Bc4 avec 35 s, 1. e4 et 2. Nf3 avec 60 s
+        self.assertEqual(
+            {label: (bucket['moves'], bucket['analysed_moves'], bucket['errors'], bucket['blunders']) for label, bucket in buckets.items()},
+            {'< 10 s': (1, 1, 1, 1), '10-30 s': (0, 0, 0, 0), '30-60 s': (1, 1, 0, 0), '60-180 s': (2, 1, 1, 0), '180-600 s': (0, 0, 0, 0), '≥ 600 s': (0, 0, 0, 0)},
+        )
+        self.assertEqual(buckets['< 10 s']['error_rate'], 100.0)
+        self.assertEqual(buckets['60-180 s']['average_time_spent'], 13.5)
+        self.assertEqual(usage['average_time_spent']['errors'], 15.0)
+        self.assertEqual(usage['average_time_spent']['other'], 28.0)
+
+        response = self.client.get('/chessTrainer/api/time-usage/alice/', {'time_class': 'bullet'})
+        self.assertEqual(response.json()['moves'], 4)
+        self.assertEqual(self.client.get('/chessTrainer/api/time-usage/alice/', {'time_class': 'daily'}).status_code, 400)
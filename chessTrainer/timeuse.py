@@ -0,0 +1,147 @@
+"""
+Gestion du temps : erreurs selon le temps restant et temps passé par coup
+
+Les pendules sont lues à l'enregistrement du PGN (voir clocks.py) : les
+statistiques d'un joueur ne relisent aucun PGN. Les pendules de toutes ses
+parties sont concaténées en un seul tableau NumPy et tous les calculs (temps
+passé sur chaque coup, tranche de temps restant, taux d'erreurs par tranche)
+sont faits sur ce tableau, sans boucle Python par coup.
+
+Un coup est rangé dans la tranche du temps restant au moment de le jouer
+(pendule du coup précédent du joueur, temps initial pour son premier coup). Le
+temps passé sur un coup est ce temps restant, moins la pendule après le coup,
+plus l'incrément. Les parties par correspondance sont ignorées.
+
+NumPy est optionnel : importé au premier calcul, comme python-chess (engine.py).
+"""
+import importlib.util
+from functools import lru_cache
+
+from .clocks import CLOCK_DTYPE, NO_CLOCK, parse_time_control
+from .models import ChessGame, GamePosition
+
+# Bornes des tranches de temps restant (secondes)
+TIME_BUCKETS = (10, 30, 60, 180, 600)
+
+
+@lru_cache(maxsize=None)
+def numpy_available():
+    """NumPy est-il installé (sans l'importer)"""
+    return importlib.util.find_spec('numpy') is not None
+
+
+def bucket_label(index):
+    if index == 0:
+        return f"< {TIME_BUCKETS[0]} s"
+    if index == len(TIME_BUCKETS):
+        return f"≥ {TIME_BUCKETS[-1]} s"
+    return f"{TIME_BUCKETS[index - 1]}-{TIME_BUCKETS[index]} s"
+
+
+def load_clocks(games):
+    """Pendules des parties concaténées en un tableau, avec la partie et le demi-coup de chaque entrée
+
+    Les parties sont rangées par id ; starts donne la première entrée de chaque
+    partie, black, base et increment sa couleur et sa cadence.
+    """
+    import numpy as np
+
+    rows = []
+    for game_id, player_color, time_control, raw in games.values_list('id', 'player_color', 'time_control', 'blobs__clocks'):
+        control = parse_time_control(time_control)
+        if raw and control and control[0] < 86400:
+            rows.append((game_id, player_color == 'black', control, np.frombuffer(bytes(raw), CLOCK_DTYPE)))
+    rows.sort(key=lambda row: row[0])
+
+    lengths = np.array([len(row[3]) for row in rows], dtype=np.int64)
+    game = np.repeat(np.arange(len(rows)), lengths)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(rows) else lengths
+    ply = np.arange(len(game)) - starts[game]
+
+    raw_clocks = np.concatenate([row[3] for row in rows]) if rows else np.empty(0, CLOCK_DTYPE)
+    clocks = np.where(raw_clocks == NO_CLOCK, np.nan, raw_clocks / 10)
+    return {
+        'ids': np.array([row[0] for row in rows], dtype=np.int64),
+        'clocks': clocks,
+        'game': game,
+        'ply': ply,
+        'starts': starts,
+        'black': np.array([row[1] for row in rows], dtype=bool),
+        'base': np.array([row[2][0] for row in rows], dtype=float),
+        'increment': np.array([row[2][1] for row in rows], dtype=float),
+    }
+
+
+def time_usage(username, time_class=None):
+    """Erreurs par tranche de temps restant et temps passé par coup, sur toutes les parties du joueur"""
+    import numpy as np
+
+    games = ChessGame.objects.filter(username=username)
+    if time_class:
+        games = games.filter(time_class=time_class)
+    data = load_clocks(games)
+    clocks, game, ply = data['clocks'], data['game'], data['ply']
+
+    # Coups du joueur (demi-coups 0, 2, 4... avec les blancs) et temps restant avant chacun
+    own = (ply % 2 == 1) == data['black'][game]
+    before = np.full_like(clocks, np.nan)
+    before[2:] = clocks[:-2]
+    first = ply < 2
+    before[first] = data['base'][game[first]]
+    spent = before - clocks + data['increment'][game]
+    moves = own & ~np.isnan(before) & ~np.isnan(clocks)
+
+    # Qualité des coups analysés, placée à la même position que la pendule du coup
+    quality = np.zeros(len(clocks), dtype=np.int8)  # 0 non analysé, 1 correct, 2 erreur, 3 gaffe
+    positions = np.array(
+        GamePosition.objects.filter(username=username, is_player_move=True, game_id__in=data['ids'].tolist())
+        .exclude(quality='')
+        .values_list('game_id', 'ply', 'quality'),
+        dtype=object,
+    ).reshape(-1, 3)
+    if len(positions):
+        game_index = np.searchsorted(data['ids'], positions[:, 0].astype(np.int64))
+        index = data['starts'][game_index] + positions[:, 1].astype(np.int64) - 1
+        codes = np.select([positions[:, 2] == 'blunder', positions[:, 2] == 'mistake'], [3, 2], 1)
+        inside = index < np.append(data['starts'][1:], len(clocks))[game_index]
+        quality[index[inside]] = codes[inside]
+
+    analysed = moves & (quality > 0)
+    errors = moves & (quality >= 2)
+    blunders = moves & (quality == 3)
+    bucket = np.digitize(before, TIME_BUCKETS)
+
+    def count(mask):
+        return np.bincount(bucket[mask], minlength=len(TIME_BUCKETS) + 1)
+
+    def mean(values):
+        return round(float(values.mean()), 1) if len(values) else None
+
+    counts = {name: count(mask) for name, mask in (('moves', moves), ('analysed', analysed), ('errors', errors), ('blunders', blunders))}
+    spent_sums = np.bincount(bucket[moves], weights=spent[moves], minlength=len(TIME_BUCKETS) + 1)
+    buckets = []
+    for index in range(len(TIME_BUCKETS) + 1):
+        moves_count, analysed_count = int(counts['moves'][index]), int(counts['analysed'][index])
+        buckets.append({
+            'label': bucket_label(index),
+            'min_seconds': TIME_BUCKETS[index - 1] if index else 0,
+            'max_seconds': TIME_BUCKETS[index] if index < len(TIME_BUCKETS) else None,
+            'moves': moves_count,
+            'analysed_moves': analysed_count,
+            'errors': int(counts['errors'][index]),
+            'blunders': int(counts['blunders'][index]),
+            'error_rate': round(counts['errors'][index] / analysed_count * 100, 1) if analysed_count else None,
+            'average_time_spent': round(spent_sums[index] / moves_count, 1) if moves_count else None,
+        })
+
+    return {
+        'games': len(data['ids']),
+        'moves': int(moves.sum()),
+        'analysed_moves': int(analysed.sum()),
+        'buckets': buckets,
+        'average_time_spent': {
+            'all': mean(spent[moves]),
+            'errors': mean(spent[errors]),
+            'other': mean(spent[analysed & ~errors]),
+        },
+    }
@@ -0,0 +1,145 @@
+"""
+File de révision des positions d'entraînement (répétition espacée, SM-2)
+
+Chaque position porte sa prochaine échéance (next_due), un facteur de facilité
+(ease) et l'intervalle courant en jours. Le résultat d'une tentative les met à
+jour : une position réussie revient de plus en plus tard, une position ratée
+revient dans la session suivante et sa facilité baisse.
+
+La file d'un joueur est lue dans l'ordre (username, next_due), couvert par
+l'index trainingpos_user_due_idx : démarrer une session ou passer à la position
+suivante est une lecture des N premières lignes de l'index, sans tri aléatoire
+de toutes les positions du joueur.
+
+Une tentative (record_attempt) met à jour les compteurs de la position, de la
+session et des statistiques du joueur par incréments F() : pas de lecture
+préalable des lignes, et deux tentatives simultanées ne s'écrasent pas.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .analysis import game_phase
+from .models import TrainingAttempt, TrainingPosition, TrainingSession, TrainingStats
+
+# Note SM-2 (0 à 5) de chaque résultat de tentative ; les autres résultats
+# (coup illégal, analyse impossible) ne modifient pas la file
+GRADES = {
+    'perfect': 5,
+    'good': 4,
+    'suboptimal': 3,
+    'poor': 1,
+    'blunder': 0,
+}
+
+PASSING_GRADE = 3
+MIN_EASE = 1.3
+FIRST_INTERVAL = 1   # jours
+SECOND_INTERVAL = 6  # jours
+RELEARN_DELAY = timedelta(minutes=10)
+
+
+def schedule_review(position, quality, now=None):
+    """Replanifier une position d'après le résultat d'une tentative (sans sauvegarder)
+
+    Retourne False si le résultat n'est pas noté et que la position est inchangée.
+    """
+    grade = GRADES.get(quality)
+    if grade is None:
+        return False
+    now = now or timezone.now()
+
+    if grade >= PASSING_GRADE:
+        position.streak += 1
+        if position.streak == 1:
+            position.interval = FIRST_INTERVAL
+        elif position.streak == 2:
+            position.interval = SECOND_INTERVAL
+        else:
+            position.interval = round(position.interval * position.ease, 2)
+        position.next_due = now + timedelta(days=position.interval)
+    else:
+        position.streak = 0
+        position.interval = 0
+        position.next_due = now + RELEARN_DELAY
+
+    penalty = 5 - grade
+    position.ease = round(max(MIN_EASE, position.ease + 0.1 - penalty * (0.08 + penalty * 0.02)), 2)
+    return True
+
+
+def review_queue(username):
+    """Positions du joueur, les plus en retard d'abord (lecture indexée)"""
+    return TrainingPosition.objects.filter(username=username).order_by('next_due', 'id')
+
+
+def due_count(username, now=None):
+    """Nombre de positions arrivées à échéance"""
+    return review_queue(username).filter(next_due__lte=now or timezone.now()).count()
+
+
+def position_phase(fen):
+    """Phase de jeu d'une position FEN"""
+    return game_phase(sum(char.isalpha() for char in fen.split(' ', 1)[0]))
+
+
+def record_attempt(position, result, attempted_move, time_spent=0, session_id=None):
+    """Enregistrer une tentative et mettre à jour position, session et statistiques du joueur"""
+    solved = bool(result['is_better'] or result['is_best'])
+    improvement = result['improvement_points'] or 0
+
+    with transaction.atomic():
+        attempt = TrainingAttempt.objects.create(
+            training_position=position,
+            attempted_move=attempted_move,
+            evaluation_after_attempt=result['evaluation'],
+            result_quality=result['quality'],
+            improvement_points=result['improvement_points'],
+            is_better_than_original=result['is_better'],
+            is_best_move=result['is_best'],
+            time_spent_seconds=time_spent
+        )
+
+        # Compteurs et file de révision de la position en un seul UPDATE
+        update_fields = ['times_played', 'times_solved']
+        position.times_played = F('times_played') + 1
+        position.times_solved = F('times_solved') + int(solved)
+        if schedule_review(position, result['quality']):
+            update_fields += ['next_due', 'ease', 'interval', 'streak']
+        position.save(update_fields=update_fields)
+
+        if session_id:
+            TrainingSession.objects.filter(id=session_id, username=position.username).update(
+                positions_attempted=F('positions_attempted') + 1,
+                positions_solved=F('positions_solved') + int(solved),
+                total_improvement_points=F('total_improvement_points') + improvement,
+            )
+
+        increments = {
+            'attempts': 1,
+            'solved': int(solved),
+            'total_improvement_points': improvement,
+            'total_time_seconds': time_spent,
+        }
+        for bucket in (position.difficulty, position_phase(position.fen_position)):
+            increments[f'{bucket}_attempts'] = 1
+            increments[f'{bucket}_solved'] = int(solved)
+        if result['quality'] in TrainingStats.QUALITIES:
+            increments[f"{result['quality']}_count"] = 1
+        updates = {field: F(field) + value for field, value in increments.items()}
+        updates['updated_at'] = timezone.now()
+        if not TrainingStats.objects.filter(username=position.username).update(**updates):
+            # Première tentative du joueur : une tentative simultanée peut créer la
+            # ligne avant nous, le point de sauvegarde garde alors la transaction utilisable
+            try:
+                with transaction.atomic():
+                    TrainingStats.objects.create(username=position.username)
+            except IntegrityError:
+                pass
+            TrainingStats.objects.filter(username=position.username).update(**updates)
+
+    # Les compteurs ne sont plus que des expressions F() sur l'instance
+    position.refresh_from_db(fields=['times_played', 'times_solved'])
+    return attempt
@@ -6,6 +6,10 @@ app_name = 'chessTrainer'
 urlpatterns = [
     path('', views.chess_analysis, name='chess_analysis'),
     path('games/<str:username>/', views.list_games, name='list_games'),
+    path('api/games/<str:username>/', views.game_library_api, name='game_library_api'),
+    path('api/positions/<str:username>/', views.position_search_api, name='position_search_api'),
+    path('api/openings/<str:username>/', views.opening_explorer_api, name='opening_explorer_api'),
+    path('api/time-usage/<str:username>/', views.time_usage_api, name='time_usage_api'),
     path('analyze/<str:username>/<str:game_id>/', views.analyze_specific_game, name='analyze_specific_game'),
     path('force-analyze/<str:username>/<str:game_id>/', views.force_analyze_game, name='force_analyze_game'),
     path('analyze-all-async/<str:username>/', views.analyze_all_async, name='analyze_all_async'),
@@ -1,93 +1,41 @@
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from django.http import StreamingHttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
 import requests
 import json
 from datetime import datetime
-from .models import ChessGame, PlayerSyncStatus, TrainingPosition, TrainingAttempt
+from io import StringIO
+from collections.abc import Mapping
+from contextlib import nullcontext
+from .analysis import AnalysisShortcuts, analyze_mainline, summarize_moves
+from .engine import chess_available, open_engine, stockfish_available
+from .explorer import opening_children
+from .jobs import active_batch, batch_event, enqueue_analysis, enqueue_unanalyzed_games, game_event, queue_status
+from .library import LibraryError, build_game_info, filter_games, paginate_games, serialize_game, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from .models import AnalysisJob, ChessGame, PlayerSyncStatus, TrainingPosition, TrainingStats
+from .pgn import read_mainline
+from .positions import game_positions, index_game_positions, position_key, position_occurrences
+from .timeuse import numpy_available, time_usage
+from .training import due_count, record_attempt, review_queue
+import logging
 import threading
 import time
 
-try:
-    import chess
-    import chess.pgn
-    import chess.engine
-    from io import StringIO
-    CHESS_AVAILABLE = True
-    print("Librairies d'échecs importées avec succès")
-except ImportError as e:
-    print(f"Erreur d'importation des librairies d'échecs: {e}")
-    CHESS_AVAILABLE = False
-
-# Configuration Stockfish
-STOCKFISH_PATH = "/opt/homebrew/bin/stockfish"  # Chemin par défaut sur macOS avec Homebrew
-STOCKFISH_AVAILABLE = False
-
-def check_stockfish():
-    """Vérifier si Stockfish est disponible"""
-    global STOCKFISH_AVAILABLE
-    import shutil
-    
-    # Essayer plusieurs emplacements possibles
-    possible_paths = [
-        "/opt/homebrew/bin/stockfish",  # Homebrew sur Apple Silicon
-        "/usr/local/bin/stockfish",     # Homebrew sur Intel
-        "stockfish",                    # Dans le PATH
-        "/usr/bin/stockfish",          # Installation système Linux
-    ]
-    
-    for path in possible_paths:
-        if shutil.which(path):
-            global STOCKFISH_PATH
-            STOCKFISH_PATH = path
-            STOCKFISH_AVAILABLE = True
-            print(f"✅ Stockfish trouvé: {path}")
-            return True
-    
-    print("❌ Stockfish non trouvé. Installation recommandée: brew install stockfish")
-    return False
-
-# Vérifier Stockfish au démarrage
-check_stockfish()
-
-# Dictionnaire global pour les événements d'analyse en temps réel
-analysis_events = {}  # {username_gameId: {'progress': 0, 'message': '', 'current_move': 0, 'total_moves': 0, 'errors_count': 0, 'status': 'running|completed|error'}}
-
-def send_analysis_event(username, game_id, progress, message, current_move=0, total_moves=0, errors_count=0, status='running'):
-    """Envoyer un événement d'analyse"""
-    key = f"{username}_{game_id}"
-    analysis_events[key] = {
-        'progress': progress,
-        'message': message,
-        'current_move': current_move,
-        'total_moves': total_moves,
-        'errors_count': errors_count,
-        'status': status,
-        'timestamp': time.time()
-    }
-
-def clear_analysis_event(username, game_id):
-    """Nettoyer un événement d'analyse terminé"""
-    key = f"{username}_{game_id}"
-    if key in analysis_events:
-        del analysis_events[key]
-
-
-def deduce_player_results(game_result, white_player, black_player):
-    """Déduire le résultat de chaque joueur à partir du résultat global de la partie"""
-    if game_result == 'white_win':
-        return 'win', 'loss'
-    elif game_result == 'black_win':
-        return 'loss', 'win'
-    elif game_result in ['agreed', 'stalemate', 'repetition', 'insufficient']:
-        return game_result, game_result  # Les deux joueurs ont le même résultat pour les nulles
-    else:
-        # Si on ne peut pas déterminer, retourner unknown
-        return 'unknown', 'unknown'
+# Journaux par domaine (niveaux réglés dans settings.LOGGING)
+analysis_logger = logging.getLogger('chessTrainer.analysis')
+sync_logger = logging.getLogger('chessTrainer.sync')
+sse_logger = logging.getLogger('chessTrainer.sse')
 
+# Dictionnaire global pour les événements de synchronisation en temps réel
+# (la progression des analyses est stockée dans AnalysisJob, voir jobs.py)
+analysis_events = {}  # {username_sessionId: {'progress': 0, 'message': '', 'type': '...', 'status': 'running|complete|finished|error'}}
 
 def get_time_class_category(time_class):
     """Catégoriser les parties selon leur cadence"""
@@ -155,10 +103,10 @@ def analyze_game_async(request, username):
     if request.method != 'POST':
         return JsonResponse({'error': 'Méthode non autorisée'}, status=405)
 
-    if not CHESS_AVAILABLE:
+    if not chess_available():
         return JsonResponse({'error': 'Les librairies d\'analyse d\'échecs ne sont pas installées.'}, status=500)
 
-    if not STOCKFISH_AVAILABLE:
+    if not stockfish_available():
         return JsonResponse({'error': 'Stockfish n\'est pas disponible. Installation recommandée: brew install stockfish'}, status=500)
 
     try:
@@ -239,49 +187,22 @@ def analyze_game_async(request, username):
                     
                     return
                 
-                # 2. Analyse des parties non analysées
-                unanalyzed_games = ChessGame.objects.filter(
-                    username=username,
-                    analyzed=False,
-                    pgn__isnull=False
-                ).exclude(pgn='')
-                
-                total_games = unanalyzed_games.count()
+                # 2. Mise en file des parties non analysées : les workers (manage.py analysis_worker)
+                # les analysent et le flux SSE suit la progression dans AnalysisJob
+                total_games = enqueue_unanalyzed_games(username, priority=AnalysisJob.PRIORITY_SYNC, batch_id=session_id)
                 send_analysis_progress(username, session_id, 'analysis_start', 'Début de l\'analyse...', 0, total_games, 0, extra={'total_games': total_games})
                 
-                analyzed_count = 0
-                total_training_positions = 0
-                for i, chess_game in enumerate(unanalyzed_games):
-                    try:
-                        game_info = f"{chess_game.white_player} vs {chess_game.black_player}"
-                        send_analysis_progress(username, session_id, 'analysis_progress', f'Analyse en cours...', i + 1, total_games, 0, extra={'game_info': game_info})
-                        
-                        # L'analyse crée automatiquement les positions d'entraînement
-                        analyze_game_with_stockfish(chess_game)
-                        analyzed_count += 1
-                        
-                        # Compter les positions d'entraînement créées pour ce joueur
-                        from .models import TrainingPosition
-                        user_training_positions = TrainingPosition.objects.filter(username=username).count()
-                        total_training_positions = user_training_positions
-                        
-                    except Exception as e:
-                        print(f"Erreur analyse partie {chess_game.game_id}: {e}")
-                
-                # Terminé - les positions d'entraînement ont été créées pendant l'analyse
-                send_analysis_progress(username, session_id, 'complete', f'Analyse terminée ! {games_count} nouvelles parties synchronisées et analysées', total_games, total_games, 0, extra={
-                    'analyzed_games': analyzed_count,
-                    'training_positions': total_training_positions,
-                    'games_count': games_count
-                })
-                
-                # Envoyer finished pour cohérence avec les autres analyses
-                send_analysis_progress(username, session_id, 'finished', f'Import et analyse terminés avec succès', total_games, total_games, 0, extra={
-                    'status': 'completed',
-                    'analyzed_games': analyzed_count,
-                    'training_positions': total_training_positions,
-                    'games_count': games_count
-                })
+                if total_games == 0:
+                    send_analysis_progress(username, session_id, 'complete', f'Import terminé ! {games_count} nouvelles parties synchronisées', 0, 0, 0, extra={
+                        'analyzed_games': 0,
+                        'training_positions': TrainingPosition.objects.filter(username=username).count(),
+                        'games_count': games_count
+                    })
+                    send_analysis_progress(username, session_id, 'finished', 'Import terminé - aucune partie à analyser', 0, 0, 0, extra={
+                        'status': 'completed',
+                        'analyzed_games': 0,
+                        'games_count': games_count
+                    })
                 
             except Exception as e:
                 send_analysis_progress(username, session_id, 'error', f'Erreur: {str(e)}', 0, 0, 0)
@@ -305,70 +226,22 @@ def analyze_all_async(request, username):
         import uuid
         session_id = str(uuid.uuid4())
         
-        def run_analysis_all():
-            try:
-                # Compter les parties non analysées
-                unanalyzed_games = ChessGame.objects.filter(
-                    username=username,
-                    analyzed=False,
-                    pgn__isnull=False
-                ).exclude(pgn='')
-                
-                total_games = unanalyzed_games.count()
-                
-                if total_games == 0:
-                    send_analysis_progress(username, session_id, 'complete', 'Toutes les parties sont déjà analysées', 0, 0, 0, extra={
-                        'analyzed_games': 0,
-                        'games_count': 0
-                    })
-                    send_analysis_progress(username, session_id, 'finished', 'Analyse terminée - toutes les parties déjà analysées', 0, 0, 0, extra={
-                        'status': 'completed',
-                        'analyzed_games': 0,
-                        'games_count': 0
-                    })
-                    return
-                
-                send_analysis_progress(username, session_id, 'analysis_start', f'Début de l\'analyse de {total_games} parties', 0, total_games, 0)
-                
-                analyzed_count = 0
-                total_errors = 0
-                
-                for i, chess_game in enumerate(unanalyzed_games):
-                    try:
-                        send_analysis_progress(username, session_id, 'analysis_progress', f'Analyse de la partie {i+1}/{total_games}', i+1, total_games, total_errors)
-                        
-                        # Analyser la partie
-                        analyze_game_with_stockfish(chess_game)
-                        analyzed_count += 1
-                        
-                        # Compter les erreurs pour cette partie
-                        errors = get_game_errors(chess_game)
-                        if errors:
-                            total_errors += len(errors)
-                            
-                    except Exception as e:
-                        print(f"❌ Erreur lors de l'analyse de la partie {chess_game.game_id}: {e}")
-                        continue
-                
-                # Terminé
-                send_analysis_progress(username, session_id, 'complete', f'Analyse terminée ! {analyzed_count} parties analysées', total_games, total_games, total_errors, extra={
-                    'analyzed_games': analyzed_count,
-                    'games_count': analyzed_count
-                })
-                
-                send_analysis_progress(username, session_id, 'finished', f'Analyse de toutes les parties terminée avec succès', total_games, total_games, total_errors, extra={
-                    'status': 'completed',
-                    'analyzed_games': analyzed_count,
-                    'games_count': analyzed_count
-                })
-                
-            except Exception as e:
-                send_analysis_progress(username, session_id, 'error', f'Erreur: {str(e)}', 0, 0, 0)
+        # Mettre en file les parties non analysées (exécutées par manage.py analysis_worker),
+        # en priorité basse : une partie consultée entre-temps passe devant
+        total_games = enqueue_unanalyzed_games(username, priority=AnalysisJob.PRIORITY_BULK, batch_id=session_id)
         
-        # Démarrer le thread d'analyse
-        analysis_thread = threading.Thread(target=run_analysis_all)
-        analysis_thread.daemon = True
-        analysis_thread.start()
+        if total_games == 0:
+            send_analysis_progress(username, session_id, 'complete', 'Toutes les parties sont déjà analysées', 0, 0, 0, extra={
+                'analyzed_games': 0,
+                'games_count': 0
+            })
+            send_analysis_progress(username, session_id, 'finished', 'Analyse terminée - toutes les parties déjà analysées', 0, 0, 0, extra={
+                'status': 'completed',
+                'analyzed_games': 0,
+                'games_count': 0
+            })
+        else:
+            send_analysis_progress(username, session_id, 'analysis_start', f'Début de l\'analyse de {total_games} parties', 0, total_games, 0)
         
         return JsonResponse({'success': True, 'session_id': session_id})
         
@@ -381,7 +254,7 @@ def send_analysis_progress(username, session_id, event_type, message, current, t
     key = f"{username}_{session_id}"
     
     # Logger l'événement envoyé
-    print(f"📤 Envoi événement SSE: {event_type} - {message} (session: {session_id})")
+    sse_logger.debug("📤 Envoi événement SSE: %s - %s (session: %s)", event_type, message, session_id)
     
     # Récupérer les données existantes pour conserver le start_time
     existing_data = analysis_events.get(key, {})
@@ -404,7 +277,7 @@ def send_analysis_progress(username, session_id, event_type, message, current, t
         event_data['status'] = event_type
     
     analysis_events[key] = event_data
-    print(f"📊 Événement stocké dans analysis_events[{key}]: {event_data['type']} - {event_data['message']}")
+    sse_logger.debug("📊 Événement stocké dans analysis_events[%s]: %s - %s", key, event_data['type'], event_data['message'])
 
 
 def analysis_progress_stream(request, username, session_id):
@@ -420,30 +293,41 @@ def analysis_progress_stream(request, username, session_id):
         
         while True:
             try:
-                if key in analysis_events:
-                    event_data = analysis_events[key]
+                event_data = analysis_events.get(key)
+                batch = batch_event(session_id)
+                if batch is not None:
+                    # Analyse confiée aux workers : la progression vient de la table AnalysisJob
+                    event_data = {**(event_data or {}), **batch}
+                    if batch['type'] == 'finished':
+                        event_data['training_positions'] = TrainingPosition.objects.filter(username=username).count()
+                
+                if event_data is not None:
                     current_progress = event_data.get('progress', 0)
                     
                     # Logger l'événement trouvé
-                    print(f"📡 Streaming SSE: {event_data.get('type')} - {event_data.get('message')} (session: {session_id})")
+                    sse_logger.debug("📡 Streaming SSE: %s - %s (session: %s)", event_data.get('type'), event_data.get('message'), session_id)
                     
                     # Envoyer un événement initial avec l'état actuel (pour reconnexions)
                     if not sent_initial:
                         initial_event = {**event_data, 'type': 'reconnected', 'message': f"Reprise: {event_data.get('message', 'En cours...')}"}
-                        print(f"📤 Envoi initial SSE: {initial_event}")
+                        sse_logger.debug("📤 Envoi initial SSE: %s", initial_event)
                         yield f"data: {json.dumps(initial_event)}\n\n".encode('utf-8')
                         sent_initial = True
                         last_progress = current_progress
                     
+                    # Fin d'un lot d'analyse : 'complete' puis 'finished', comme pour les autres analyses
+                    if batch is not None and batch['type'] == 'finished':
+                        yield f"data: {json.dumps({**event_data, 'type': 'complete'})}\n\n".encode('utf-8')
+                    
                     # Envoyer seulement si changement significatif
                     if (current_progress != last_progress or 
                         event_data.get('type') in ['sync_start', 'sync_progress', 'sync_complete', 'analysis_start', 'complete', 'finished', 'error']):
-                        print(f"📤 Envoi événement SSE: {event_data}")
+                        sse_logger.debug("📤 Envoi événement SSE: %s", event_data)
                         yield f"data: {json.dumps(event_data)}\n\n".encode('utf-8')
                         last_progress = current_progress
                     
                     # Si terminé, arrêter (finished est maintenant explicite, pas besoin de doubler)
-                    if event_data.get('status') in ['finished', 'error']:
+                    if event_data.get('status') in ['finished', 'error'] or event_data.get('type') == 'finished':
                         # Garder l'événement un peu plus longtemps pour les reconnexions tardives
                         time.sleep(10)
                         if key in analysis_events:
@@ -504,13 +388,29 @@ def check_analysis_status(request, username):
                 'progress': event_data.get('progress', 0),
                 'message': event_data.get('message', 'Analyse en cours...'),
                 'status': event_data.get('status', 'running'),
-                'is_full_sync': event_data.get('is_full_sync', False)
+                'is_full_sync': event_data.get('is_full_sync', False),
+                'queue': queue_status(),
             })
-        else:
-            # Pas d'analyse en cours
+        
+        batch_id = active_batch(username)
+        if batch_id:
+            # Analyse groupée en cours dans la file des workers
+            event_data = batch_event(batch_id) or {}
             return JsonResponse({
-                'analysis_in_progress': False
+                'analysis_in_progress': True,
+                'session_id': batch_id,
+                'progress': event_data.get('progress', 0),
+                'message': event_data.get('message', 'Analyse en cours...'),
+                'status': event_data.get('status', 'running'),
+                'is_full_sync': False,
+                'queue': queue_status(),
             })
+        
+        # Pas d'analyse groupée en cours ; l'état de la file montre un worker absent
+        return JsonResponse({
+            'analysis_in_progress': False,
+            'queue': queue_status(),
+        })
             
     except Exception as e:
         return JsonResponse({
@@ -522,7 +422,7 @@ def check_analysis_status(request, username):
 def list_games(request, username):
     """Lister toutes les parties disponibles pour un joueur avec synchronisation incrémentale"""
     
-    if not CHESS_AVAILABLE:
+    if not chess_available():
         messages.error(request, "Les librairies d'analyse d'échecs ne sont pas installées. Veuillez installer python-chess et stockfish.")
         return redirect('chessTrainer:chess_analysis')
     
@@ -536,7 +436,7 @@ def list_games(request, username):
         
         if sync_only:
             # Mode synchronisation seule - récupérer nouvelles parties et rediriger
-            print(f"� Mode synchronisation seule pour {username}")
+            sync_logger.info("🔄 Mode synchronisation seule pour %s", username)
             new_games = fetch_new_games_only(username, force_full_sync=force_full_sync, months_limit=None)
             
             if new_games:
@@ -548,24 +448,24 @@ def list_games(request, username):
                 
                 messages.success(request, f"✅ {len(new_games)} nouvelles parties synchronisées !")
                 
-                # Analyser toutes les parties non analysées en arrière-plan
-                analyzed_count = analyze_unanalyzed_games(username)
-                if analyzed_count > 0:
-                    messages.info(request, f"🔍 {analyzed_count} parties analysées automatiquement")
+                # Mettre en file d'analyse toutes les parties non analysées
+                queued_count = enqueue_unanalyzed_games(username, priority=AnalysisJob.PRIORITY_SYNC)
+                if queued_count > 0:
+                    messages.info(request, f"🔍 {queued_count} parties en file d'analyse")
             else:
                 messages.info(request, "ℹ️ Aucune nouvelle partie trouvée.")
             
             return redirect('chessTrainer:list_games', username=username)
         
         # Mode affichage normal - récupérer les parties depuis la base
-        print(f"📋 Affichage des parties pour {username}")
+        sync_logger.debug("📋 Affichage des parties pour %s", username)
         
         # Récupérer toutes les parties depuis la base de données
-        all_games_db = ChessGame.objects.filter(username=username).order_by('-end_time')
+        all_games_db = ChessGame.objects.filter(username=username)
         
         if not all_games_db.exists():
             # Aucune partie en base - faire une première synchronisation
-            print("🆕 Aucune partie en base - synchronisation initiale")
+            sync_logger.info("🆕 Aucune partie en base pour %s - synchronisation initiale", username)
             new_games = fetch_new_games_only(username, force_full_sync=True, months_limit=None)
             
             if new_games:
@@ -575,90 +475,41 @@ def list_games(request, username):
                     if game_details:
                         save_or_update_game(username, game_data, game_details, auto_analyze=False)
                 
-                # Recharger les parties depuis la base
-                all_games_db = ChessGame.objects.filter(username=username).order_by('-end_time')
                 messages.success(request, f"✅ {len(new_games)} parties synchronisées pour la première fois !")
                 
-                # Analyser toutes les parties non analysées
-                analyzed_count = analyze_unanalyzed_games(username)
-                if analyzed_count > 0:
-                    messages.info(request, f"🔍 {analyzed_count} parties analysées automatiquement")
+                # Mettre en file d'analyse toutes les parties non analysées
+                queued_count = enqueue_unanalyzed_games(username, priority=AnalysisJob.PRIORITY_SYNC)
+                if queued_count > 0:
+                    messages.info(request, f"🔍 {queued_count} parties en file d'analyse")
             else:
                 messages.error(request, f"❌ Aucune partie trouvée pour {username}")
                 return redirect('chessTrainer:chess_analysis')
         
-        # Convertir les parties de la base en format d'affichage
-        games_with_analysis = []
-        for chess_game in all_games_db:
-            # Déduire le résultat de chaque joueur à partir du résultat global
-            white_result, black_result = deduce_player_results(chess_game.result, chess_game.white_player, chess_game.black_player)
-            
-            # Reconstruire le format game_data depuis la base
-            game_data = {
-                'url': chess_game.game_url,
-                'game_id': chess_game.game_id,
-                'white': {'username': chess_game.white_player, 'result': white_result},
-                'black': {'username': chess_game.black_player, 'result': black_result},
-                'time_class': 'unknown',  # On pourrait l'ajouter au modèle plus tard
-                'time_control': chess_game.time_control,
-                'start_time': chess_game.start_time,
-                'end_time': chess_game.end_time
+        # Statistiques par cadence calculées par la base (GROUP BY time_class)
+        games_by_time_class = {}
+        for stats in all_games_db.order_by().values('time_class').annotate(
+            count=Count('id'),
+            analyzed_count=Count('id', filter=Q(analyzed=True)),
+            total_errors=Sum('error_count', filter=Q(analyzed=True)),
+        ):
+            games_by_time_class[stats['time_class']] = {
+                'info': get_time_class_category(stats['time_class']),
+                'games': [],
+                'count': stats['count'],
+                'analyzed_count': stats['analyzed_count'],
+                'total_errors': stats['total_errors'] or 0,
+                'next_cursor': None
             }
-            
-            # Déterminer la cadence depuis le time_control
-            time_control = chess_game.time_control
-            if '+' in time_control:
-                base_time = int(time_control.split('+')[0])
-            else:
-                base_time = int(time_control) if time_control.isdigit() else 600
-            
-            if base_time < 180:
-                game_data['time_class'] = 'bullet'
-            elif base_time < 600:
-                game_data['time_class'] = 'blitz'
-            elif base_time < 86400:  # Moins d'un jour
-                game_data['time_class'] = 'rapid'
-            else:
-                game_data['time_class'] = 'daily'
-            
-            # Enrichir avec les informations de cadence
-            time_class_info = get_time_class_category(game_data['time_class'])
-            game_data['time_class_info'] = time_class_info
-            
-            # Compter les erreurs
-            error_count = len(chess_game.get_errors()) if chess_game.analyzed else None
-            
-            games_with_analysis.append({
-                'game_data': game_data,
-                'existing_game': chess_game,
-                'error_count': error_count,
-                'is_analyzed': chess_game.analyzed,
-                'time_class': game_data['time_class'],
-                'time_class_info': time_class_info
-            })
         
-        # Grouper les parties par cadence
-        games_by_time_class = {}
-        for game_info in games_with_analysis:
-            time_class = game_info['time_class']
-            time_class_info = game_info['time_class_info']
-            
-            if time_class not in games_by_time_class:
-                games_by_time_class[time_class] = {
-                    'info': time_class_info,
-                    'games': [],
-                    'count': 0,
-                    'analyzed_count': 0,
-                    'total_errors': 0
-                }
-            
-            games_by_time_class[time_class]['games'].append(game_info)
-            games_by_time_class[time_class]['count'] += 1
-            
-            if game_info['is_analyzed']:
-                games_by_time_class[time_class]['analyzed_count'] += 1
-                if game_info['error_count'] is not None:
-                    games_by_time_class[time_class]['total_errors'] += game_info['error_count']
+        # Première page de chaque cadence (projection sans pgn ni moves_data) ;
+        # la suite est chargée au défilement via l'API game_library_api
+        for time_class, category_data in games_by_time_class.items():
+            rows, next_cursor = paginate_games(all_games_db.filter(time_class=time_class))
+            for row in rows:
+                game_info = build_game_info(row)
+                game_info['time_class_info'] = category_data['info']
+                category_data['games'].append(game_info)
+            category_data['next_cursor'] = next_cursor
         
         # Trier les groupes par ordre de cadence
         sorted_time_classes = sorted(
@@ -666,25 +517,20 @@ def list_games(request, username):
             key=lambda x: x[1]['info']['order']
         )
         
-        # Calculer les statistiques globales
-        total_analyzed = sum(1 for game in games_with_analysis if game['is_analyzed'])
-        
-        # Calculer la plage de dates
-        date_range = None
-        if games_with_analysis:
-            dates = [game['game_data']['start_time'] for game in games_with_analysis if game['game_data']['start_time']]
-            if dates:
-                date_range = {
-                    'start': min(dates),
-                    'end': max(dates)
-                }
+        # Calculer les statistiques globales et la plage de dates
+        totals = all_games_db.aggregate(
+            total=Count('id'),
+            analyzed=Count('id', filter=Q(analyzed=True)),
+            start=Min('start_time'),
+            end=Max('start_time'),
+        )
+        date_range = {'start': totals['start'], 'end': totals['end']} if totals['start'] else None
         
         context = {
             'username': username,
-            'games': games_with_analysis,
             'games_by_time_class': sorted_time_classes,
-            'total_games': len(games_with_analysis),
-            'analyzed_count': total_analyzed,
+            'total_games': totals['total'],
+            'analyzed_count': totals['analyzed'],
             'date_range': date_range,
             'sync_status': sync_status
         }
@@ -692,19 +538,151 @@ def list_games(request, username):
         return render(request, 'chessTrainer/games_list.html', context)
         
     except Exception as e:
-        print(f"Erreur dans list_games: {e}")
+        sync_logger.exception("Erreur dans list_games: %s", e)
         messages.error(request, f"Erreur lors de la récupération des parties: {str(e)}")
         return redirect('chessTrainer:chess_analysis')
 
 
+def game_library_api(request, username):
+    """API JSON de la bibliothèque de parties : filtres et pagination par curseur
+    
+    Paramètres : cadence (liste séparée par des virgules), color (white/black),
+    result (win/loss/draw), analyzed (true/false), date_from / date_to (AAAA-MM-JJ),
+    opening (code ECO ou nom), sort (date/errors), cursor, page_size, fragment=1
+    pour recevoir aussi le HTML des cartes (défilement de games_list.html).
+    """
+    try:
+        page_size = min(max(int(request.GET.get('page_size', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'page_size invalide'}, status=400)
+    
+    try:
+        games = filter_games(ChessGame.objects.filter(username=username), request.GET)
+        rows, next_cursor = paginate_games(
+            games,
+            sort=request.GET.get('sort', 'date'),
+            cursor=request.GET.get('cursor'),
+            page_size=page_size,
+        )
+    except LibraryError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    data = {
+        'games': [serialize_game(row) for row in rows],
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+    }
+    if request.GET.get('fragment') == '1':
+        data['html'] = ''.join(
+            render_to_string('chessTrainer/game_card.html', {'game_info': build_game_info(row), 'username': username}, request=request)
+            for row in rows
+        )
+    return JsonResponse(data)
+
+
+def position_search_api(request, username):
+    """API JSON : parties du joueur passées par une position (paramètre fen) et coups joués"""
+    fen = request.GET.get('fen', '').strip()
+    if not fen:
+        return JsonResponse({'error': 'Paramètre fen manquant'}, status=400)
+    if not chess_available():
+        return JsonResponse({'error': 'Les librairies d\'analyse d\'échecs ne sont pas installées.'}, status=500)
+    
+    occurrences = list(position_occurrences(username, fen))
+    moves = {}
+    for occurrence in occurrences:
+        stats = moves.setdefault(occurrence.move, {'move': occurrence.move, 'san': occurrence.move_san, 'count': 0, 'player_count': 0})
+        stats['count'] += 1
+        stats['player_count'] += occurrence.is_player_move
+    
+    return JsonResponse({
+        'fen': fen,
+        'count': len(occurrences),
+        'moves': sorted(moves.values(), key=lambda stats: -stats['count']),
+        'games': [
+            {
+                'game_id': occurrence.game.game_id,
+                'white_player': occurrence.game.white_player,
+                'black_player': occurrence.game.black_player,
+                'start_time': occurrence.game.start_time.isoformat() if occurrence.game.start_time else None,
+                'ply': occurrence.ply,
+                'move': occurrence.move,
+                'move_san': occurrence.move_san,
+                'evaluation': occurrence.evaluation,
+                'quality': occurrence.quality,
+                'is_player_move': occurrence.is_player_move,
+            }
+            for occurrence in occurrences
+        ],
+    })
+
+
+def opening_explorer_api(request, username):
+    """API JSON de l'arbre d'ouvertures du joueur : coups joués depuis une position
+    
+    Paramètres : color (white/black, défaut white), fen (défaut : position initiale).
+    Chaque coup indique le nombre de parties, le score du joueur, la perte moyenne
+    en centipawns (parties analysées) et la FEN obtenue pour descendre dans l'arbre.
+    """
+    color = request.GET.get('color', 'white')
+    if color not in ('white', 'black'):
+        return JsonResponse({'error': 'color invalide (white ou black)'}, status=400)
+    if not chess_available():
+        return JsonResponse({'error': 'Les librairies d\'analyse d\'échecs ne sont pas installées.'}, status=500)
+    import chess
+    
+    fen = request.GET.get('fen', '').strip() or chess.STARTING_FEN
+    key = position_key(fen)
+    if key is None:
+        return JsonResponse({'error': 'FEN invalide'}, status=400)
+    
+    board = chess.Board(fen)
+    moves = []
+    for node in opening_children(username, color, key):
+        board.push_uci(node.move)
+        moves.append({
+            'move': node.move,
+            'san': node.move_san,
+            'games': node.games,
+            'wins': node.wins,
+            'draws': node.draws,
+            'losses': node.losses,
+            'score': round(node.score, 1),
+            'average_centipawn_loss': round(node.average_centipawn_loss, 1) if node.centipawn_loss_count else None,
+            'fen': board.fen(),
+        })
+        board.pop()
+    
+    return JsonResponse({
+        'color': color,
+        'fen': fen,
+        'games': sum(move['games'] for move in moves),
+        'moves': moves,
+    })
+
+
+def time_usage_api(request, username):
+    """API JSON de la gestion du temps : erreurs par tranche de temps restant, temps passé par coup
+    
+    Paramètre : time_class (bullet, blitz ou rapid) pour se limiter à une cadence.
+    """
+    time_class = request.GET.get('time_class', '')
+    if time_class not in ('', 'bullet', 'blitz', 'rapid'):
+        return JsonResponse({'error': 'time_class invalide (bullet, blitz ou rapid)'}, status=400)
+    if not numpy_available():
+        return JsonResponse({'error': 'NumPy n\'est pas installé.'}, status=500)
+    
+    return JsonResponse({'time_class': time_class or None, **time_usage(username, time_class)})
+
+
 def analyze_specific_game(request, username, game_id):
     """Analyser une partie spécifique"""
     
-    if not CHESS_AVAILABLE:
+    if not chess_available():
         messages.error(request, "Les librairies d'analyse d'échecs ne sont pas installées.")
         return redirect('chessTrainer:chess_analysis')
     
-    if not STOCKFISH_AVAILABLE:
+    if not stockfish_available():
         messages.error(request, "❌ Stockfish n'est pas disponible. Analyse impossible. Installation recommandée: brew install stockfish")
         return redirect('chessTrainer:list_games', username=username)
     
@@ -718,19 +696,15 @@ def analyze_specific_game(request, username, game_id):
             
             # Si la partie est déjà en base, vérifier si elle est analysée
             if chess_game.pgn:
-                print(f"🎯 Analyse de la partie {game_id} depuis la base de données")
+                analysis_logger.debug("🎯 Analyse de la partie %s depuis la base de données", game_id)
                 
                 # Analyser seulement si pas encore analysée
                 if not chess_game.analyzed:
-                    print(f"📊 Partie non analysée - lancement de l'analyse Stockfish")
+                    analysis_logger.info("📊 Partie %s non analysée - mise en file de l'analyse Stockfish", game_id)
                     
-                    # Toujours lancer l'analyse en arrière-plan pour éviter les blocages
-                    analysis_thread = threading.Thread(
-                        target=analyze_game_in_background, 
-                        args=(chess_game, username, game_id, False)
-                    )
-                    analysis_thread.daemon = True
-                    analysis_thread.start()
+                    # Analyse exécutée par un worker (manage.py analysis_worker) en priorité
+                    # interactive ; une demande déjà en file pour cette partie est réutilisée
+                    enqueue_analysis(chess_game, priority=AnalysisJob.PRIORITY_INTERACTIVE)
                     
                     # Si c'est une requête AJAX, retourner immédiatement
                     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -738,12 +712,10 @@ def analyze_specific_game(request, username, game_id):
                             'status': 'started',
                             'message': 'Analyse lancée en arrière-plan'
                         })
-                    else:
-                        # Pour les requêtes normales, attendre un moment puis rediriger
-                        messages.info(request, "Analyse lancée en arrière-plan. Rafraîchissez la page dans quelques instants.")
-                        return redirect('chessTrainer:analyze_specific_game', username=username, game_id=game_id)
+                    # Pour les requêtes normales, afficher la partie en attendant l'analyse
+                    messages.info(request, "Analyse lancée en arrière-plan. Rafraîchissez la page dans quelques instants.")
                 else:
-                    print(f"✅ Partie déjà analysée - utilisation des données existantes")
+                    analysis_logger.debug("✅ Partie %s déjà analysée - utilisation des données existantes", game_id)
                 
                 # Récupérer les erreurs pour l'affichage
                 errors = get_game_errors(chess_game)
@@ -761,6 +733,8 @@ def analyze_specific_game(request, username, game_id):
                     'chess_game': chess_game,
                     'username': username,
                     'orientation': orientation,
+                    # Positions de chaque coup (index en cache) : l'échiquier n'a pas à rejouer la partie
+                    'positions': get_game_positions(chess_game.pgn, chess_game.game_id),
                     'errors_count': 0,
                     'best_moves_count': 0,
                     'excellent_moves_count': 0,
@@ -825,10 +799,10 @@ def analyze_specific_game(request, username, game_id):
                 
                 return render(request, 'chessTrainer/game_detail_enhanced.html', context)
             else:
-                print(f"⚠️ Partie {game_id} trouvée en base mais sans PGN - récupération depuis l'API")
+                sync_logger.warning("⚠️ Partie %s trouvée en base mais sans PGN - récupération depuis l'API", game_id)
                 
         except ChessGame.DoesNotExist:
-            print(f"⚠️ Partie {game_id} non trouvée en base - récupération depuis l'API")
+            sync_logger.warning("⚠️ Partie %s non trouvée en base - récupération depuis l'API", game_id)
         
         # Si la partie n'est pas en base ou sans PGN, la récupérer depuis l'API
         # Récupérer toutes les parties pour trouver celle demandée
@@ -856,20 +830,19 @@ def analyze_specific_game(request, username, game_id):
             messages.error(request, "Impossible de récupérer les détails de la partie")
             return redirect('chessTrainer:list_games', username=username)
         
-        # Sauvegarder ou mettre à jour la partie en base
-        chess_game = save_or_update_game(username, selected_game, game_details, auto_analyze=True)
+        # Sauvegarder ou mettre à jour la partie en base et la mettre en file d'analyse
+        chess_game = save_or_update_game(username, selected_game, game_details, auto_analyze=True,
+                                         analysis_priority=AnalysisJob.PRIORITY_INTERACTIVE)
         
-        # Analyser la partie avec Stockfish
-        analysis_result = analyze_game_with_stockfish(chess_game)
-        
-        if not analysis_result:
-            messages.error(request, "Erreur lors de l'analyse de la partie. Le PGN pourrait être invalide.")
-            return redirect('chessTrainer:list_games', username=username)
+        if not chess_game.analyzed:
+            messages.info(request, "Analyse lancée en arrière-plan. Rafraîchissez la page dans quelques instants.")
+            return redirect('chessTrainer:analyze_specific_game', username=username, game_id=game_id)
         
         # Préparer le contexte pour l'affichage enrichi
         context = {
             'chess_game': chess_game,
             'username': username,
+            'positions': get_game_positions(chess_game.pgn, chess_game.game_id),
             'errors_count': 0,
             'best_moves_count': 0,
             'excellent_moves_count': 0,
@@ -924,61 +897,19 @@ def analyze_specific_game(request, username, game_id):
         return render(request, 'chessTrainer/game_detail_enhanced.html', context)
         
     except Exception as e:
-        print(f"Erreur dans analyze_specific_game: {e}")
+        analysis_logger.exception("Erreur dans analyze_specific_game: %s", e)
         messages.error(request, f"Erreur lors de l'analyse: {str(e)}")
         return redirect('chessTrainer:list_games', username=username)
 
 
-def analyze_game_in_background(chess_game, username, game_id, force_reanalyze=False):
-    """Analyser une partie en arrière-plan avec callback de progression"""
-    def progress_callback(progress, message, current, total, errors):
-        # Envoyer des événements SSE
-        send_analysis_event(username, game_id, progress, message, current, total, errors, 'running')
-    
-    try:
-        # Initialiser la progression
-        send_analysis_event(username, game_id, 0, "Démarrage de l'analyse...", 0, 0, 0, 'running')
-        
-        if force_reanalyze:
-            # Marquer comme non analysée pour forcer la re-analyse
-            chess_game.analyzed = False
-            chess_game.moves_data = {}
-            chess_game.save()
-        
-        # Lancer l'analyse avec callback de progression
-        analyze_game_with_stockfish(chess_game, progress_callback=progress_callback)
-        
-        # Calculer le nombre total de coups
-        total_moves = len(chess_game.moves_data.get('moves', [])) if chess_game.moves_data else 0
-        errors_count = len([m for m in chess_game.moves_data.get('moves', []) if m.get('is_error', False)]) if chess_game.moves_data else 0
-        
-        # Marquer comme terminée
-        send_analysis_event(username, game_id, 100, "Analyse terminée !", 
-                           total_moves, total_moves, errors_count, 'completed')
-        
-        print(f"✅ Analyse de {game_id} terminée en arrière-plan")
-        
-        # Nettoyer l'événement après 3 secondes
-        def cleanup():
-            time.sleep(3)
-            clear_analysis_event(username, game_id)
-        
-        cleanup_thread = threading.Thread(target=cleanup)
-        cleanup_thread.daemon = True
-        cleanup_thread.start()
-        
-    except Exception as e:
-        print(f"❌ Erreur lors de l'analyse en arrière-plan: {e}")
-        send_analysis_event(username, game_id, -1, f"Erreur: {str(e)}", 0, 0, 0, 'error')
-
 def force_analyze_game(request, username, game_id):
     """Forcer la re-analyse d'une partie (même si déjà analysée)"""
     
-    if not CHESS_AVAILABLE:
+    if not chess_available():
         messages.error(request, "Les librairies d'analyse d'échecs ne sont pas installées.")
         return redirect('chessTrainer:list_games', username=username)
     
-    if not STOCKFISH_AVAILABLE:
+    if not stockfish_available():
         messages.error(request, "❌ Stockfish n'est pas disponible. Re-analyse impossible. Installation recommandée: brew install stockfish")
         return redirect('chessTrainer:list_games', username=username)
     
@@ -988,15 +919,10 @@ def force_analyze_game(request, username, game_id):
             chess_game = ChessGame.objects.get(game_id=game_id, username=username)
             
             if chess_game.pgn:
-                print(f"🔄 Lancement re-analyse de la partie {game_id} en arrière-plan")
+                analysis_logger.info("🔄 Mise en file de la re-analyse de la partie %s", game_id)
                 
-                # Lancer l'analyse en arrière-plan
-                analysis_thread = threading.Thread(
-                    target=analyze_game_in_background, 
-                    args=(chess_game, username, game_id, True)
-                )
-                analysis_thread.daemon = True
-                analysis_thread.start()
+                # Re-analyse exécutée par un worker (manage.py analysis_worker)
+                enqueue_analysis(chess_game, priority=AnalysisJob.PRIORITY_INTERACTIVE, force=True)
                 
                 # Retourner immédiatement une réponse JSON pour les requêtes AJAX
                 if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -1022,7 +948,7 @@ def force_analyze_game(request, username, game_id):
             return redirect('chessTrainer:list_games', username=username)
         
     except Exception as e:
-        print(f"❌ Erreur dans force_analyze_game: {e}")
+        analysis_logger.exception("❌ Erreur dans force_analyze_game: %s", e)
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({'error': f'Erreur lors de la re-analyse: {str(e)}'})
         messages.error(request, f"Erreur lors de la re-analyse: {str(e)}")
@@ -1042,21 +968,21 @@ def fetch_new_games_only(username, force_full_sync=False, months_limit=None, ses
             }
         )
         
-        print(f"🔄 Synchronisation pour {username}")
-        print(f"📊 État actuel: {sync_status.total_games_count} parties, dernière sync: {sync_status.last_sync_time}")
+        sync_logger.info("🔄 Synchronisation pour %s", username)
+        sync_logger.debug("📊 État actuel: %s parties, dernière sync: %s", sync_status.total_games_count, sync_status.last_sync_time)
         
         if session_id:
             send_analysis_progress(username, session_id, 'sync_progress', f'Vérification des archives Chess.com...', 0, 0, 0)
         
         if created or force_full_sync:
-            print("🆕 Première synchronisation ou synchronisation forcée - récupération complète")
+            sync_logger.info("🆕 Première synchronisation ou synchronisation forcée - récupération complète")
             max_archives = months_limit if months_limit else 12
         else:
             # Synchronisation incrémentale - chercher dans les archives récentes
-            print("⚡ Synchronisation incrémentale - recherche des nouvelles parties")
+            sync_logger.info("⚡ Synchronisation incrémentale - recherche des nouvelles parties")
             max_archives = months_limit if months_limit else 3  # Utiliser months_limit ou 3 par défaut
         
-        print(f"📅 Recherche dans les {max_archives if max_archives else 'toutes les'} dernières archives")
+        sync_logger.debug("📅 Recherche dans les %s dernières archives", max_archives if max_archives else 'toutes les')
         
         if session_id:
             send_analysis_progress(username, session_id, 'sync_progress', f'Téléchargement des {max_archives} dernières archives...', 0, 0, 0)
@@ -1065,7 +991,7 @@ def fetch_new_games_only(username, force_full_sync=False, months_limit=None, ses
         all_games = fetch_all_games(username, max_archives=max_archives)
         
         if not all_games:
-            print("❌ Aucune partie récupérée depuis l'API")
+            sync_logger.warning("❌ Aucune partie récupérée depuis l'API pour %s", username)
             if session_id:
                 send_analysis_progress(username, session_id, 'sync_progress', 'Aucune partie trouvée sur Chess.com', 0, 0, 0)
             return []
@@ -1075,7 +1001,7 @@ def fetch_new_games_only(username, force_full_sync=False, months_limit=None, ses
         
         # Filtrer les nouvelles parties si on fait une sync incrémentale
         if not created and not force_full_sync and sync_status.last_game_end_time:
-            print(f"🔍 Filtrage des parties postérieures à {sync_status.last_game_end_time}")
+            sync_logger.debug("🔍 Filtrage des parties postérieures à %s", sync_status.last_game_end_time)
             
             last_sync_timestamp = sync_status.last_game_end_time.timestamp()
             new_games = []
@@ -1085,10 +1011,10 @@ def fetch_new_games_only(username, force_full_sync=False, months_limit=None, ses
                 if game_end_time > last_sync_timestamp:
                     new_games.append(game)
             
-            print(f"✨ {len(new_games)} nouvelles parties trouvées sur {len(all_games)} récupérées")
+            sync_logger.info("✨ %d nouvelles parties trouvées sur %d récupérées", len(new_games), len(all_games))
             filtered_games = new_games
         else:
-            print(f"📥 Récupération complète de {len(all_games)} parties")
+            sync_logger.info("📥 Récupération complète de %d parties", len(all_games))
             filtered_games = all_games
         
         # Mettre à jour l'état de synchronisation
@@ -1103,12 +1029,12 @@ def fetch_new_games_only(username, force_full_sync=False, months_limit=None, ses
             sync_status.sync_count += 1
             sync_status.save()
             
-            print(f"💾 État de sync mis à jour: dernière partie du {latest_end_time}")
+            sync_logger.debug("💾 État de sync mis à jour: dernière partie du %s", latest_end_time)
         
         return filtered_games
         
     except Exception as e:
-        print(f"❌ Erreur lors de la synchronisation: {e}")
+        sync_logger.exception("❌ Erreur lors de la synchronisation: %s", e)
         return []
 
 
@@ -1119,7 +1045,7 @@ def fetch_all_games(username, max_archives=12):
         # Récupérer la liste des archives
         archives_url = f"https://api.chess.com/pub/player/{username}/games/archives"
         
-        print(f"Récupération des archives: {archives_url}")
+        sync_logger.debug("Récupération des archives: %s", archives_url)
         
         response = requests.get(archives_url, timeout=15, headers={
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
@@ -1136,10 +1062,10 @@ def fetch_all_games(username, max_archives=12):
                 # Prendre les dernières archives (max_archives au lieu de 3)
                 recent_archives = archives[-max_archives:] if len(archives) > max_archives else archives
                 
-                print(f"Récupération de {len(recent_archives)} archives sur {len(archives)} disponibles")
+                sync_logger.info("Récupération de %d archives sur %d disponibles", len(recent_archives), len(archives))
                 
                 for i, archive_url in enumerate(recent_archives):
-                    print(f"Récupération de l'archive {i+1}/{len(recent_archives)}: {archive_url}")
+                    sync_logger.debug("Récupération de l'archive %d/%d: %s", i + 1, len(recent_archives), archive_url)
                     
                     try:
                         archive_response = requests.get(archive_url, timeout=15, headers={
@@ -1150,49 +1076,47 @@ def fetch_all_games(username, max_archives=12):
                             archive_data = archive_response.json()
                             games = archive_data.get('games', [])
                             all_games.extend(games)
-                            print(f"  → {len(games)} parties ajoutées (total: {len(all_games)})")
+                            sync_logger.debug("  → %d parties ajoutées (total: %d)", len(games), len(all_games))
                         else:
-                            print(f"  → Erreur HTTP {archive_response.status_code}")
+                            sync_logger.warning("  → Erreur HTTP %s pour l'archive %s", archive_response.status_code, archive_url)
                             
                     except requests.exceptions.Timeout:
-                        print(f"  → Timeout pour l'archive {archive_url}")
+                        sync_logger.warning("  → Timeout pour l'archive %s", archive_url)
                         continue
                     except requests.exceptions.RequestException as e:
-                        print(f"  → Erreur réseau pour l'archive {archive_url}: {e}")
+                        sync_logger.warning("  → Erreur réseau pour l'archive %s: %s", archive_url, e)
                         continue
                 
                 if all_games:
                     # Trier par date décroissante
                     all_games.sort(key=lambda x: x.get('end_time', 0), reverse=True)
-                    print(f"✅ Total final: {len(all_games)} parties récupérées pour {username}")
+                    sync_logger.info("✅ Total final: %d parties récupérées pour %s", len(all_games), username)
                     
-                    # Afficher quelques statistiques
-                    time_classes = {}
-                    for game in all_games:
-                        tc = game.get('time_class', 'unknown')
-                        time_classes[tc] = time_classes.get(tc, 0) + 1
-                    
-                    print("📊 Répartition par cadence:")
-                    for tc, count in sorted(time_classes.items()):
-                        print(f"  - {tc}: {count} parties")
+                    # Afficher quelques statistiques (calculées seulement si le niveau DEBUG est actif)
+                    if sync_logger.isEnabledFor(logging.DEBUG):
+                        time_classes = {}
+                        for game in all_games:
+                            tc = game.get('time_class', 'unknown')
+                            time_classes[tc] = time_classes.get(tc, 0) + 1
+                        sync_logger.debug("📊 Répartition par cadence: %s", ', '.join(f"{tc}: {count}" for tc, count in sorted(time_classes.items())))
                     
                     return all_games
                 else:
-                    print("❌ Aucune partie trouvée dans les archives")
+                    sync_logger.warning("❌ Aucune partie trouvée dans les archives de %s", username)
                     return []
             else:
-                print("❌ Aucune archive trouvée")
+                sync_logger.warning("❌ Aucune archive trouvée pour %s", username)
                 return []
         
         elif response.status_code == 404:
-            print(f"❌ Joueur {username} non trouvé")
+            sync_logger.warning("❌ Joueur %s non trouvé", username)
             return []
         else:
-            print(f"❌ Erreur API {response.status_code}: {response.text}")
+            sync_logger.error("❌ Erreur API %s: %s", response.status_code, response.text)
             return []
         
     except Exception as e:
-        print(f"❌ Erreur API Chess.com: {e}")
+        sync_logger.exception("❌ Erreur API Chess.com: %s", e)
         return []
 
 
@@ -1218,7 +1142,7 @@ def fetch_game_details(game_data):
         
         # Si pas de PGN, retourner None car on ne peut pas analyser sans PGN
         if not pgn:
-            print("Aucun PGN trouvé dans les données de la partie")
+            sync_logger.warning("Aucun PGN trouvé dans les données de la partie")
             return None
         
         return {
@@ -1234,11 +1158,11 @@ def fetch_game_details(game_data):
         }
         
     except Exception as e:
-        print(f"Erreur récupération détails: {e}")
+        sync_logger.warning("Erreur récupération détails: %s", e)
         return None
 
 
-def save_or_update_game(username, game_data, game_details, auto_analyze=True):
+def save_or_update_game(username, game_data, game_details, auto_analyze=True, analysis_priority=AnalysisJob.PRIORITY_SYNC):
     """Sauvegarder ou mettre à jour une partie en base"""
     
     game_id = str(game_data.get('uuid', ''))
@@ -1250,7 +1174,7 @@ def save_or_update_game(username, game_data, game_details, auto_analyze=True):
     # Si start_time est 0 (manquant), utiliser end_time comme fallback
     if start_time_raw == 0 and end_time_raw > 0:
         start_time = datetime.fromtimestamp(end_time_raw)
-        print(f"⚠️ start_time manquant pour {game_id[:8]}, utilisation de end_time: {start_time}")
+        sync_logger.debug("⚠️ start_time manquant pour %s, utilisation de end_time: %s", game_id[:8], start_time)
     else:
         start_time = datetime.fromtimestamp(start_time_raw)
     
@@ -1267,10 +1191,11 @@ def save_or_update_game(username, game_data, game_details, auto_analyze=True):
     else:
         overall_result = white_result  # draw, agreed, etc.
     
+    # Une vue par joueur suivi : un adversaire lui aussi suivi a sa propre ligne
     chess_game, created = ChessGame.objects.get_or_create(
         game_id=game_id,
+        username=username,
         defaults={
-            'username': username,
             'game_url': game_data.get('url', ''),
             'white_player': game_data.get('white', {}).get('username', ''),
             'black_player': game_data.get('black', {}).get('username', ''),
@@ -1284,50 +1209,31 @@ def save_or_update_game(username, game_data, game_details, auto_analyze=True):
     )
     
     # Si la partie existe déjà mais n'est pas analysée, on met à jour le PGN
+    pgn_changed = created
     if not created and not chess_game.analyzed:
+        pgn_changed = chess_game.pgn != game_details.get('pgn', '')
         chess_game.pgn = game_details.get('pgn', '')
         chess_game.save()
     
-    # Analyser automatiquement si demandé et pas encore analysé
-    if auto_analyze and not chess_game.analyzed and chess_game.pgn:
-        analyze_game_with_stockfish(chess_game)
-    
-    return chess_game
-
-
-def analyze_unanalyzed_games(username):
-    """Analyser toutes les parties non analysées d'un utilisateur avec Stockfish uniquement"""
-    
-    if not CHESS_AVAILABLE:
-        print("❌ Librairies d'échecs non disponibles")
-        return 0
-    
-    if not STOCKFISH_AVAILABLE:
-        print("❌ Stockfish non disponible - aucune partie ne sera analysée")
-        return 0
+    # Partie déjà analysée pour l'autre joueur : reprendre l'analyse partagée
+    if created and ChessGame.objects.filter(game_id=game_id, analyzed=True).exclude(pk=chess_game.pk).exists():
+        adopt_shared_analysis(chess_game)
     
-    unanalyzed_games = ChessGame.objects.filter(
-        username=username,
-        analyzed=False,
-        pgn__isnull=False
-    ).exclude(pgn='')
-    
-    print(f"🔍 Analyse de {unanalyzed_games.count()} parties non analysées pour {username}")
-    
-    analyzed_count = 0
-    for chess_game in unanalyzed_games:
+    # Indexer les positions (recherche par position, arbre d'ouvertures)
+    elif pgn_changed and chess_game.pgn:
         try:
-            analyze_game_with_stockfish(chess_game)
-            analyzed_count += 1
-            print(f"  ✅ Partie {chess_game.game_id} analysée ({analyzed_count}/{unanalyzed_games.count()})")
+            index_game_positions(chess_game)
         except Exception as e:
-            print(f"  ❌ Erreur lors de l'analyse de la partie {chess_game.game_id}: {e}")
+            analysis_logger.warning("⚠️ Erreur indexation des positions: %s", e)
+    
+    # Mettre en file d'analyse si demandé et pas encore analysé
+    if auto_analyze and not chess_game.analyzed and chess_game.pgn:
+        enqueue_analysis(chess_game, priority=analysis_priority)
     
-    print(f"🎯 {analyzed_count} parties analysées avec succès")
-    return analyzed_count
+    return chess_game
 
 
-def analyze_game_with_stockfish(chess_game, depth=18, time_limit=0.5, progress_callback=None):
+def analyze_game_with_stockfish(chess_game, depth=18, time_limit=0.5, progress_callback=None, mode=None, engine=None):
     """
     Analyser une partie avec Stockfish - Version améliorée
     
@@ -1339,406 +1245,77 @@ def analyze_game_with_stockfish(chess_game, depth=18, time_limit=0.5, progress_c
     - Analyse plus rapide mais plus précise
     - Évaluation toujours du point de vue des blancs
     - Callback de progression pour la barre de progression
-    """
+    - Mode incrémental (settings.CHESS_ANALYSIS_MODE) : une recherche par position
+    - Mode budget : passe rapide puis analyse complète des coups critiques (settings.CHESS_ANALYSIS_BUDGET)
     
-    def score_to_centipawns(score):
-        """Convertir un score Stockfish en centipawns du point de vue des blancs"""
-        if score.is_mate():
-            mate_value = score.white().mate()
-            if mate_value is None:
-                return 0
-            return 1000 if mate_value > 0 else -1000
-        else:
-            cp_score = score.white().score()
-            return cp_score if cp_score is not None else 0
-    
-    if not CHESS_AVAILABLE:
-        print("❌ Librairies d'échecs non disponibles")
-        chess_game.moves_data = {
-            'moves': [],
-            'total_moves': 0,
-            'errors_count': 0,
-            'error_message': 'Les librairies d\'analyse d\'échecs ne sont pas installées.'
-        }
-        chess_game.analyzed = False
-        chess_game.save()
+    engine : moteur déjà ouvert (bench_analysis) ; par défaut, un moteur du pool
+    """
+    if mode is None:
+        mode = getattr(settings, 'CHESS_ANALYSIS_MODE', 'per_ply')
+    time_budget = getattr(settings, 'CHESS_ANALYSIS_BUDGET', 30)
+    chess_game.analysis_error = ''
+    
+    if not chess_available():
+        analysis_logger.error("❌ Librairies d'échecs non disponibles")
+        record_analysis_failure(chess_game, 'Les librairies d\'analyse d\'échecs ne sont pas installées.')
         return False
     
-    if not STOCKFISH_AVAILABLE:
-        print("❌ Stockfish non disponible - partie marquée comme non analysée")
-        chess_game.analyzed = False
-        chess_game.save()
+    if engine is None and not stockfish_available():
+        analysis_logger.warning("❌ Stockfish non disponible - partie %s marquée comme non analysée", chess_game.game_id)
+        record_analysis_failure(chess_game, 'Stockfish n\'est pas disponible.')
         return False
     
+    import chess.pgn
+
     try:
+        # Durée de chaque phase (lecture du PGN, moteur, enregistrement), journalisée en DEBUG
+        phase_start = time.perf_counter()
+        timings = {}
+        
         # Parser le PGN avec python-chess
         pgn_io = StringIO(chess_game.pgn)
         game = chess.pgn.read_game(pgn_io)
+        timings['parse'] = time.perf_counter() - phase_start
         
         if not game:
-            print("❌ Impossible de parser le PGN")
-            chess_game.moves_data = {
-                'moves': [],
-                'total_moves': 0,
-                'errors_count': 0,
-                'error_message': 'Impossible de parser le PGN de la partie'
-            }
-            chess_game.analyzed = True
-            chess_game.save()
+            analysis_logger.error("❌ Impossible de parser le PGN de la partie %s", chess_game.game_id)
+            # Marquée analysée (sans coups) pour ne pas être relancée indéfiniment
+            record_analysis_failure(chess_game, 'Impossible de parser le PGN de la partie', analyzed=True)
             return False
         
-        # Initialiser Stockfish avec des paramètres optimisés
-        with chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH) as engine:
-            # Configurer Stockfish pour de meilleures performances
-            engine.configure({"Hash": 128, "Threads": 1})
-            
-            board = game.board()
-            move_analysis = []
-            ply_count = 0  # Compteur de demi-coups (ply)
-            errors_count = 0
-            inaccuracies_count = 0
-            mistakes_count = 0
-            blunders_count = 0
-            
-            # Compter le nombre total de coups pour la progression
-            total_moves = sum(1 for node in game.mainline() if node.move is not None)
-            if progress_callback:
-                progress_callback(0, "Début de l'analyse...", 0, total_moves, 0)
-            
-            current_move_index = 0
-            last_sent_progress = -1  # Pour éviter d'envoyer le même pourcentage plusieurs fois
-            
-            # Analyser chaque coup
-            for node in game.mainline():
-                if node.move is None:
-                    continue
-                    
-                ply_count += 1
-                current_move_index += 1
-                move = node.move
-                
-                # Calculer le numéro de coup selon la notation standard d'échecs
-                move_number = (ply_count + 1) // 2  # Numéro du coup (1, 2, 3, ...)
-                is_white_move = (ply_count % 2 == 1)  # True si c'est le coup des blancs
-                
-                # Mettre à jour la progression - envoyer uniquement quand on change de tranche de 10%
-                progress_percent = int((current_move_index / total_moves) * 100)
-                
-                # Envoyer un événement de progression tous les 10% ou pour certains coups importants
-                if (progress_percent >= last_sent_progress + 10 or 
-                    progress_percent == 100 or 
-                    current_move_index == 1 or
-                    current_move_index % max(1, total_moves // 10) == 0):
-                    
-                    if progress_callback:
-                        progress_callback(
-                            progress_percent, 
-                            f"Analyse en cours... {progress_percent}% (coup {move_number}{'.' if is_white_move else '...'})", 
-                            current_move_index, 
-                            total_moves, 
-                            errors_count
-                        )
-                    last_sent_progress = progress_percent
-                
-                # Position avant le coup
-                position_before = board.copy()
-                
-                # Profondeur adaptative selon la phase de jeu
-                piece_count = len(position_before.piece_map())
-                if piece_count <= 10:  # Finale
-                    adaptive_depth = min(depth + 4, 22)
-                elif piece_count <= 20:  # Milieu de jeu
-                    adaptive_depth = depth
-                else:  # Ouverture
-                    adaptive_depth = max(depth - 2, 12)
-                
-                try:
-                    # Analyse de la position avant le coup avec MultiPV
-                    limit = chess.engine.Limit(depth=adaptive_depth, time=time_limit)
-                    
-                    try:
-                        # Analyser avec MultiPV=5 pour plus de précision
-                        multi_info = engine.analyse(position_before, limit, multipv=5)
-                        
-                        top_moves = []
-                        evaluation_before = None
-                        
-                        if isinstance(multi_info, list):
-                            # Stockfish retourne une liste avec MultiPV
-                            for i, pv_info in enumerate(multi_info):
-                                if 'pv' in pv_info and pv_info['pv'] and len(pv_info['pv']) > 0:
-                                    move_candidate = pv_info['pv'][0]
-                                    score = pv_info.get('score', chess.engine.PovScore(chess.engine.Cp(0), position_before.turn))
-                                    
-                                    # Gestion des scores de mat - toujours du point de vue des blancs
-                                    eval_cp = score_to_centipawns(score)
-                                    
-                                    # Extraire les 6 premiers coups de la variante principale
-                                    pv_moves = []
-                                    temp_board = position_before.copy()
-                                    for j, pv_move in enumerate(pv_info['pv'][:6]):  # Limiter à 6 coups
-                                        try:
-                                            san_move = temp_board.san(pv_move)
-                                            pv_moves.append({
-                                                'uci': pv_move.uci(),
-                                                'san': san_move,
-                                                'move_number': (temp_board.fullmove_number if temp_board.turn == chess.WHITE 
-                                                               else temp_board.fullmove_number),
-                                                'is_white': temp_board.turn == chess.WHITE
-                                            })
-                                            temp_board.push(pv_move)
-                                        except:
-                                            break  # Arrêter si coup invalide
-                                    
-                                    top_moves.append({
-                                        'move': move_candidate.uci(),
-                                        'move_san': position_before.san(move_candidate),
-                                        'evaluation': eval_cp,
-                                        'rank': i + 1,
-                                        'is_mate': score.is_mate(),
-                                        'mate_in': score.relative.mate() if score.is_mate() else None,
-                                        'pv_line': pv_moves  # Nouvelle donnée : variante principale
-                                    })
-                                    
-                                    # L'évaluation de référence est celle du meilleur coup
-                                    if i == 0:
-                                        evaluation_before = score
-                        else:
-                            # Fallback pour un seul résultat
-                            if 'pv' in multi_info and multi_info['pv'] and len(multi_info['pv']) > 0:
-                                move_candidate = multi_info['pv'][0]
-                                score = multi_info.get('score', chess.engine.PovScore(chess.engine.Cp(0), position_before.turn))
-                                
-                                # Gestion des scores de mat - toujours du point de vue des blancs
-                                eval_cp = score_to_centipawns(score)
-                                
-                                top_moves.append({
-                                    'move': move_candidate.uci(),
-                                    'move_san': position_before.san(move_candidate),
-                                    'evaluation': eval_cp,
-                                    'rank': 1,
-                                    'is_mate': score.is_mate(),
-                                    'mate_in': score.relative.mate() if score.is_mate() else None
-                                })
-                                evaluation_before = score
-                        
-                    except Exception as multipv_error:
-                        print(f"⚠️ MultiPV échoué, fallback: {multipv_error}")
-                        # Analyse simple
-                        info = engine.analyse(position_before, limit)
-                        evaluation_before = info.get("score", chess.engine.PovScore(chess.engine.Cp(0), position_before.turn))
-                        
-                        best_move_result = engine.play(position_before, limit)
-                        best_move_candidate = best_move_result.move
-                        
-                        # Utiliser notre fonction pour normaliser l'évaluation
-                        eval_cp = score_to_centipawns(evaluation_before)
-                        
-                        top_moves = [{
-                            'move': best_move_candidate.uci(),
-                            'move_san': position_before.san(best_move_candidate),
-                            'evaluation': eval_cp,
-                            'rank': 1,
-                            'is_mate': evaluation_before.is_mate(),
-                            'mate_in': evaluation_before.relative.mate() if evaluation_before.is_mate() else None
-                        }]
-                    
-                    if not top_moves:
-                        raise Exception("Aucun coup trouvé par Stockfish")
-                    
-                    best_move_uci = top_moves[0]['move']
-                    best_move_obj = chess.Move.from_uci(best_move_uci)
-                    
-                    # Calculer l'évaluation du coup joué
-                    played_move_eval = None
-                    played_move_rank = None
-                    
-                    # Chercher le coup joué dans les top moves
-                    for i, top_move in enumerate(top_moves):
-                        if chess.Move.from_uci(top_move['move']) == move:
-                            played_move_eval = top_move['evaluation']
-                            played_move_rank = i + 1
-                            break
-                    
-                    # Si le coup joué n'est pas dans les top moves, l'analyser séparément
-                    if played_move_eval is None:
-                        temp_board = position_before.copy()
-                        temp_board.push(move)
-                        played_info = engine.analyse(temp_board, chess.engine.Limit(depth=adaptive_depth-2, time=time_limit*0.5))
-                        played_score = played_info.get("score", chess.engine.PovScore(chess.engine.Cp(0), temp_board.turn))
-                        
-                        # Le score est du point de vue du joueur qui vient de jouer (temp_board.turn)
-                        # Mais nous voulons toujours l'évaluation du point de vue des blancs
-                        played_move_eval = score_to_centipawns(played_score)
-                        
-                        played_move_rank = len(top_moves) + 1
-                    
-                    # Calculer le centipawn loss du point de vue du joueur actuel
-                    best_eval = top_moves[0]['evaluation']
-                    
-                    # Avec .white(), les évaluations sont toujours du point de vue des blancs
-                    # Le centipawn_loss est la différence entre le meilleur coup et le coup joué
-                    if position_before.turn == chess.WHITE:
-                        # Tour des blancs : meilleur coup a une évaluation plus élevée
-                        centipawn_loss = max(0, best_eval - played_move_eval)
-                    else:
-                        # Tour des noirs : meilleur coup a une évaluation plus basse (du point de vue des blancs)
-                        # Donc la perte est : (évaluation du coup joué) - (évaluation du meilleur coup)
-                        centipawn_loss = max(0, played_move_eval - best_eval)
-                    
-                    # Jouer le coup réel
-                    board.push(move)
-                    
-                    # Pour les erreurs importantes, analyser aussi le meilleur coup de l'adversaire
-                    opponent_punishment = None
-                    if centipawn_loss >= 100:  # Pour les erreurs et gaffes
-                        try:
-                            # Analyser la position APRÈS le coup de gaffe pour trouver le meilleur coup de l'adversaire
-                            position_after_blunder = board.copy()
-                            opponent_analysis = engine.analyse(position_after_blunder, 
-                                                            chess.engine.Limit(depth=adaptive_depth, time=time_limit), 
-                                                            multipv=3)
-                            
-                            if isinstance(opponent_analysis, list) and len(opponent_analysis) > 0:
-                                best_opponent_move = opponent_analysis[0]
-                                if 'pv' in best_opponent_move and best_opponent_move['pv']:
-                                    # Extraire la ligne de jeu de l'adversaire qui punit la gaffe
-                                    punishment_moves = []
-                                    temp_board = position_after_blunder.copy()
-                                    for j, pv_move in enumerate(best_opponent_move['pv'][:6]):  # 6 coups max
-                                        try:
-                                            san_move = temp_board.san(pv_move)
-                                            punishment_moves.append({
-                                                'uci': pv_move.uci(),
-                                                'san': san_move,
-                                                'move_number': (temp_board.fullmove_number if temp_board.turn == chess.WHITE 
-                                                               else temp_board.fullmove_number),
-                                                'is_white': temp_board.turn == chess.WHITE
-                                            })
-                                            temp_board.push(pv_move)
-                                        except:
-                                            break
-                                    
-                                    opponent_punishment = {
-                                        'move_san': position_after_blunder.san(best_opponent_move['pv'][0]),
-                                        'evaluation': score_to_centipawns(best_opponent_move.get('score', 
-                                                     chess.engine.PovScore(chess.engine.Cp(0), position_after_blunder.turn))),
-                                        'pv_line': punishment_moves
-                                    }
-                        except Exception as e:
-                            print(f"⚠️ Erreur analyse coup adversaire: {e}")
-                    
-                    # Classification améliorée selon les nouveaux critères
-                    is_best_move = (move == best_move_obj)
-                    is_in_top5 = played_move_rank <= 5 if played_move_rank else False
-                    
-                    # Déterminer la qualité du coup selon les nouveaux critères
-                    if is_best_move or centipawn_loss < 10:
-                        move_quality = "best"
-                        error_type = "aucune"
-                        quality_icon = "⭐"
-                        quality_text = "Meilleur coup"
-                    elif is_in_top5 and centipawn_loss < 20:
-                        move_quality = "good"
-                        error_type = "aucune"
-                        quality_icon = "👍"
-                        quality_text = "Bon coup"
-                    elif centipawn_loss >= 200:
-                        # Gaffe : perte très importante
-                        move_quality = "blunder"
-                        error_type = "blunder"
-                        quality_icon = "💥"
-                        quality_text = "Gaffe"
-                        blunders_count += 1
-                    elif centipawn_loss >= 100:
-                        # Erreur grave
-                        move_quality = "mistake"
-                        error_type = "mistake"
-                        quality_icon = "❌"
-                        quality_text = "Erreur"
-                        mistakes_count += 1
-                    elif centipawn_loss >= 70:
-                        # Imprécision : première catégorie d'erreur
-                        move_quality = "inaccuracy"
-                        error_type = "inaccuracy"
-                        quality_icon = "?!"
-                        quality_text = "Imprécision"
-                        inaccuracies_count += 1
-                    else:
-                        # Coup acceptable : toutes les pertes < 80 cp
-                        move_quality = "acceptable"
-                        error_type = "aucune"
-                        quality_icon = "✓"
-                        quality_text = "Coup acceptable"
-                    
-                    # Compter les erreurs selon la nouvelle classification
-                    is_error = error_type != "aucune"
-                    if is_error:
-                        errors_count += 1
-                        # Log détaillé pour chaque erreur/gaffe/imprécision du côté du joueur analysé
-                        # On ne log que les erreurs du côté du joueur (noir ou blanc selon la partie)
-                        joueur_analyse_noir = chess_game.username.lower() == chess_game.black_player.lower()
-                        if (joueur_analyse_noir and not is_white_move) or (not joueur_analyse_noir and is_white_move):
-                            # Notation officielle : 14. ..f5 ou 14. f5
-                            notation = f"{move_number}. {'..' if not is_white_move else ''}{position_before.san(move)}"
-                            print(f"   ➡️ Erreur détectée : {notation} ({error_type})")
-                    
-                    # Calculer l'accuracy (pourcentage)
-                    accuracy = max(0, 100 - (centipawn_loss / 2))  # Formule simplifiée
-                    
-                    move_analysis.append({
-                        'move_number': move_number,
-                        'is_white_move': is_white_move,  # Nouveau champ pour indiquer si c'est le coup des blancs
-                        'ply_count': ply_count,  # Numéro du demi-coup
-                        'move': move.uci(),
-                        'move_san': position_before.san(move),
-                        'best_move': best_move_uci,
-                        'best_move_san': top_moves[0]['move_san'],
-                        'top_moves': top_moves,
-                        'opponent_punishment': opponent_punishment,  # Nouveau : coup de l'adversaire qui punit la gaffe
-                        'evaluation_before': best_eval,
-                        'evaluation_after': played_move_eval,
-                        'evaluation_diff': -centipawn_loss,  # Négatif car c'est une perte
-                        'centipawn_loss': centipawn_loss,
-                        'accuracy': round(accuracy, 1),
-                        'move_rank': played_move_rank,
-                        'is_error': is_error,
-                        'error_type': error_type,
-                        'move_quality': move_quality,
-                        'quality_icon': quality_icon,
-                        'quality_text': quality_text,
-                        'is_best_move': is_best_move,
-                        'is_in_top5': is_in_top5,
-                        'depth': adaptive_depth,
-                        'time_spent': time_limit,
-                        'piece_count': piece_count,  # Pour statistiques
-                    })
-                    
-                    if ply_count % 10 == 0:  # Afficher tous les 10 demi-coups (= 5 coups complets)
-                        print(f"  📊 Analysé {ply_count//2} coups complets... (Prof: {adaptive_depth}, Erreurs: {errors_count})")
-                        
-                except Exception as e:
-                    print(f"❌ Erreur analyse coup {move_number}: {e}")
-                    # Jouer le coup même en cas d'erreur
-                    board.push(move)
-                    continue
+        player_color = 'black' if chess_game.username.lower() == chess_game.black_player.lower() else 'white'
+        
+        # Moteur du pool, configuré d'après les réglages STOCKFISH_*
+        # (livre d'ouvertures et tables de finales consultés avant le moteur si configurés)
+        with (nullcontext(engine) if engine else open_engine()) as engine, \
+                AnalysisShortcuts.from_settings() as shortcuts:
+            move_analysis, ply_count = analyze_mainline(
+                engine, game,
+                depth=depth,
+                time_limit=time_limit,
+                progress_callback=progress_callback,
+                mode=mode,
+                game_key=chess_game.game_id,
+                player_color=player_color,
+                shortcuts=shortcuts,
+                time_budget=time_budget,
+            )
+        timings['engine'] = time.perf_counter() - phase_start - timings['parse']
         
         # Calculer des statistiques avancées
-        total_accuracy = sum(move['accuracy'] for move in move_analysis) / len(move_analysis) if move_analysis else 0
+        summary = summarize_moves(move_analysis)
         
         # Sauvegarder les résultats avec plus de détails
         chess_game.moves_data = {
             'moves': move_analysis,
             'total_moves': ply_count,  # Nombre de demi-coups
-            'total_full_moves': move_number,  # Nombre de coups complets
-            'errors_count': errors_count,
-            'inaccuracies_count': inaccuracies_count,
-            'mistakes_count': mistakes_count,
-            'blunders_count': blunders_count,
-            'average_accuracy': round(total_accuracy, 1),
+            'total_full_moves': (ply_count + 1) // 2,  # Nombre de coups complets
+            **summary,
             'analysis_engine': 'stockfish',
+            'analysis_mode': mode,
             'analysis_depth': depth,
             'analysis_time': time_limit,
+            **({'analysis_budget': time_budget} if mode == 'budget' else {}),
             'version': '2.0'  # Version améliorée
         }
         chess_game.analyzed = True
@@ -1747,145 +1324,213 @@ def analyze_game_with_stockfish(chess_game, depth=18, time_limit=0.5, progress_c
         # Créer les objets MoveAnalysis et TrainingPosition pour le module d'entraînement
         training_positions_created = create_move_analyses_from_data(chess_game, move_analysis)
         
+        # Vues des autres joueurs suivis de la partie : même analyse, leurs propres positions
+        for other_view in ChessGame.objects.filter(game_id=chess_game.game_id).exclude(pk=chess_game.pk):
+            adopt_shared_analysis(other_view, move_analysis)
+        
+        # Indexer les positions de la partie (recherche par clé Zobrist)
+        try:
+            positions_indexed = index_game_positions(chess_game, move_analysis)
+        except Exception as e:
+            analysis_logger.warning("⚠️ Erreur indexation des positions: %s", e)
+            positions_indexed = 0
+        timings['persist'] = time.perf_counter() - phase_start - timings['parse'] - timings['engine']
+        
         # Mise à jour finale de la progression
         if progress_callback:
-            progress_callback(100, "Analyse terminée !", ply_count//2, ply_count//2, errors_count)
-        
-        print(f"✅ Analyse Stockfish améliorée terminée:")
-        print(f"   📊 {ply_count} demi-coups analysés ({ply_count//2} coups complets)")
-        print(f"   ❌ {blunders_count} gaffes, {mistakes_count} erreurs, {inaccuracies_count} imprécisions")
-        print(f"   🎯 Précision moyenne: {total_accuracy:.1f}%")
-        print(f"   🏋️ {training_positions_created} positions d'entraînement créées")
+            progress_callback(100, "Analyse terminée !", ply_count//2, ply_count//2, summary['errors_count'])
+        
+        analysis_logger.info(
+            "✅ Analyse Stockfish terminée pour %s (mode %s) : %d demi-coups, %d gaffes, %d erreurs, %d imprécisions, "
+            "précision moyenne %.1f%%, %d positions d'entraînement, %d positions indexées",
+            chess_game.game_id, mode, ply_count,
+            summary['blunders_count'], summary['mistakes_count'], summary['inaccuracies_count'],
+            summary['average_accuracy'], training_positions_created, positions_indexed,
+        )
+        analysis_logger.debug(
+            "⏱️ Partie %s : lecture %.1f ms, moteur %.1f ms, enregistrement %.1f ms",
+            chess_game.game_id, timings['parse'] * 1000, timings['engine'] * 1000, timings['persist'] * 1000,
+            extra={'game_id': chess_game.game_id, 'timings': timings},
+        )
         return True
         
     except Exception as e:
-        print(f"❌ Erreur lors de l'analyse Stockfish: {e}")
-        chess_game.analyzed = False
-        chess_game.moves_data = {
-            'moves': [],
-            'total_moves': 0,
-            'errors_count': 0,
-            'error_message': f'Erreur lors de l\'analyse Stockfish: {str(e)}'
-        }
-        chess_game.save()
+        analysis_logger.exception("❌ Erreur lors de l'analyse Stockfish: %s", e)
+        record_analysis_failure(chess_game, f'Erreur lors de l\'analyse Stockfish: {str(e)}')
         return False
 
 
+def record_analysis_failure(chess_game, message, analyzed=False):
+    """
+    Enregistrer l'échec d'une analyse sur la seule vue du joueur
+
+    moves_data (ChessGameData) est partagé par tous les joueurs suivis de la
+    partie : il n'est écrit qu'après une analyse réussie. Le message d'erreur
+    reste sur l'instance (analysis_error), repris par le job d'analyse.
+    """
+    chess_game.analysis_error = message
+    chess_game.analyzed = analyzed
+    # Recharger moves_data partagé (sans l'écrire) pour recalculer le résumé de la vue
+    chess_game.__dict__.get('_blobs', {}).pop('moves_data', None)
+    chess_game.moves_data
+    chess_game.save()
+
+
+def adopt_shared_analysis(chess_game, move_analysis_data=None):
+    """
+    Dériver la vue d'un joueur de l'analyse partagée de la partie (ChessGameData)
+
+    La partie n'est pas réanalysée : résumé, positions d'entraînement (couleur
+    du joueur) et index des positions sont recalculés depuis moves_data.
+    """
+    if move_analysis_data is None:
+        move_analysis_data = (chess_game.moves_data or {}).get('moves', [])
+    else:
+        # Charger moves_data partagé pour recalculer le résumé de la vue
+        chess_game.moves_data
+    chess_game.analyzed = True
+    chess_game.save()
+    
+    created = create_move_analyses_from_data(chess_game, move_analysis_data)
+    try:
+        index_game_positions(chess_game, move_analysis_data)
+    except Exception as e:
+        analysis_logger.warning("⚠️ Erreur indexation des positions: %s", e)
+    analysis_logger.info("♻️ Analyse partagée reprise pour %s (%s) : %d positions d'entraînement", chess_game.username, chess_game.game_id, created)
+    return created
+
+
 def create_move_analyses_from_data(chess_game, move_analysis_data):
-    """Créer les objets MoveAnalysis et TrainingPosition à partir des données d'analyse"""
+    """
+    Créer ou mettre à jour les objets MoveAnalysis et TrainingPosition à partir des données d'analyse
+
+    Seules les erreurs et gaffes du joueur sont enregistrées. Les positions FEN
+    viennent de moves_data (fen_before, calculé pendant l'analyse) ; le PGN
+    n'est rejoué que pour d'anciennes analyses sans FEN. L'écriture se fait en
+    quelques requêtes groupées dans une transaction : les lignes existantes
+    sont mises à jour (l'historique d'entraînement des positions est conservé)
+    et celles qui ne correspondent plus à une erreur sont supprimées.
+    """
     from .models import MoveAnalysis, TrainingPosition
     
-    # Supprimer les analyses existantes pour cette partie
-    MoveAnalysis.objects.filter(game=chess_game).delete()
-    TrainingPosition.objects.filter(original_game=chess_game).delete()
-    
-    if not CHESS_AVAILABLE:
+    if not chess_available():
         return 0
-    
-    training_positions_created = 0
+    import chess
     
     try:
-        import chess
-        from io import StringIO
-        
-        # Parser le PGN pour obtenir les positions FEN
-        pgn_io = StringIO(chess_game.pgn)
-        game = chess.pgn.read_game(pgn_io)
-        
-        if not game:
-            return 0
+        player_color = chess_game.player_color or (
+            'white' if chess_game.white_player.lower() == chess_game.username.lower() else 'black'
+        )
+        player_is_white = player_color == 'white'
         
-        # Déterminer la couleur du joueur dans cette partie
-        player_is_white = game.headers.get('White', '').lower() == chess_game.username.lower()
-        player_color = 'white' if player_is_white else 'black'
+        # Erreurs et gaffes du joueur, une par coup complet (clé unique game + move_number)
+        player_errors = {}
+        for move_data in move_analysis_data:
+            quality = move_data.get('move_quality')
+            if quality not in ['mistake', 'blunder']:  # ✅ Seulement erreurs et gaffes
+                continue
+            if move_data.get('is_white_move', True) != player_is_white:
+                # Erreur de l'adversaire - on l'affiche dans les logs mais on ne crée pas d'objet
+                analysis_logger.debug("ℹ️ Erreur adverse ignorée: %s (%s)", move_data.get('move_san'), quality)
+                continue
+            player_errors[move_data['move_number']] = move_data
         
-        board = game.board()
-        move_index = 0
+        fens = _fens_by_ply(chess_game, move_analysis_data) if player_errors else {}
         
-        # Parcourir chaque coup et créer les objets MoveAnalysis + TrainingPosition
-        for node in game.mainline():
-            if node.move is None or move_index >= len(move_analysis_data):
+        move_analyses = []
+        for move_number, move_data in player_errors.items():
+            ply_count = move_data.get('ply_count', 2 * move_number - (1 if player_is_white else 0))
+            fen_before = move_data.get('fen_before') or fens.get(ply_count)
+            fen_after = fens.get(ply_count + 1)
+            if not fen_before:
+                analysis_logger.warning("⚠️ Position introuvable pour le coup %s", move_data.get('move_san'))
                 continue
+            if not fen_after:
+                # Position après le coup : rejouer ce seul coup depuis la FEN
+                board = chess.Board(fen_before)
+                board.push_uci(move_data['move'])
+                fen_after = board.fen()
             
-            move_data = move_analysis_data[move_index]
-            move = node.move
-            
-            # Position avant le coup
-            fen_before = board.fen()
-            
-            # Jouer le coup pour obtenir la position après
-            board.push(move)
-            fen_after = board.fen()
-            
-            # Déterminer la qualité selon nos critères d'entraînement
-            quality = None
-            if move_data.get('move_quality') in ['mistake', 'blunder']:  # ✅ Seulement erreurs et gaffes
-                quality = move_data['move_quality']
-            
-            # Vérifier si c'est bien le tour du joueur
-            is_white_move = move_data.get('is_white_move', True)
-            is_player_move = (player_is_white and is_white_move) or (not player_is_white and not is_white_move)
+            move_analyses.append(MoveAnalysis(
+                game=chess_game,
+                move_number=move_number,
+                move_notation=move_data.get('move_san', move_data.get('move', '')),
+                evaluation_before=move_data.get('evaluation_before', 0),
+                evaluation_after=move_data.get('evaluation_after', 0),
+                quality=move_data['move_quality'],
+                fen_before=fen_before,
+                fen_after=fen_after,
+                best_move=move_data.get('best_move', '')
+            ))
+        
+        with transaction.atomic():
+            # Supprimer les coups qui ne sont plus des erreurs (et leurs positions d'entraînement)
+            MoveAnalysis.objects.filter(game=chess_game).exclude(
+                move_number__in=[move_analysis.move_number for move_analysis in move_analyses]
+            ).delete()
             
-            # Créer l'objet MoveAnalysis seulement pour les erreurs et gaffes DU JOUEUR
-            if quality and is_player_move:
-                try:
-                    move_analysis_obj = MoveAnalysis.objects.create(
-                        game=chess_game,
-                        move_number=move_data.get('move_number', move_index + 1),
-                        move_notation=move_data.get('move_san', move.uci()),
-                        evaluation_before=move_data.get('evaluation_before', 0),
-                        evaluation_after=move_data.get('evaluation_after', 0),
-                        quality=quality,
-                        fen_before=fen_before,
-                        fen_after=fen_after,
-                        best_move=move_data.get('best_move', '')
-                    )
-                    
-                    # Créer la position d'entraînement pour cette erreur du joueur
-                    # Déterminer la difficulté basée sur la qualité du coup
-                    difficulty = 'medium' if quality == 'mistake' else 'hard'  # blunder = hard
-                    
-                    # Préparer les évaluations
-                    original_eval = move_data.get('evaluation_after', 0)
-                    best_eval = move_data.get('evaluation_before', 0)
-                    
-                    # Créer la position d'entraînement directement
-                    TrainingPosition.objects.create(
-                        username=chess_game.username,
-                        original_game=chess_game,
-                        move_analysis=move_analysis_obj,
-                        fen_position=fen_before,
-                        player_color=player_color,
-                        original_move=move_data.get('move_san', move.uci()),
-                        original_evaluation=original_eval,
-                        best_move=move_data.get('best_move', ''),
-                        best_evaluation=best_eval,
-                        difficulty=difficulty
-                    )
-                    
-                    training_positions_created += 1
-                    print(f"✅ Position d'entraînement créée: {move_data.get('move_san')} ({quality}) - Tour du joueur: {'Blancs' if is_white_move else 'Noirs'}")
-                        
-                except Exception as e:
-                    # Ignorer les erreurs de contrainte unique
-                    if 'UNIQUE constraint' not in str(e):
-                        print(f"⚠️ Erreur création MoveAnalysis/TrainingPosition #{move_index}: {e}")
-            elif quality:
-                # Erreur de l'adversaire - on l'affiche dans les logs mais on ne crée pas d'objet
-                print(f"ℹ️ Erreur adverse ignorée: {move_data.get('move_san')} ({quality}) - Tour de l'adversaire: {'Blancs' if is_white_move else 'Noirs'}")
-            
-            move_index += 1
+            MoveAnalysis.objects.bulk_create(
+                move_analyses,
+                update_conflicts=True,
+                unique_fields=['game', 'move_number'],
+                update_fields=['move_notation', 'evaluation_before', 'evaluation_after', 'quality', 'fen_before', 'fen_after', 'best_move'],
+            )
             
-        print(f"✅ Créé {MoveAnalysis.objects.filter(game=chess_game).count()} objets MoveAnalysis")
-        print(f"✅ Créé {training_positions_created} positions d'entraînement")
+            # Une position d'entraînement par erreur du joueur
+            # (difficulté selon la qualité du coup : blunder = hard)
+            training_positions = [
+                TrainingPosition(
+                    username=chess_game.username,
+                    original_game=chess_game,
+                    move_analysis=move_analysis,
+                    fen_position=move_analysis.fen_before,
+                    player_color=player_color,
+                    original_move=move_analysis.move_notation,
+                    original_evaluation=move_analysis.evaluation_after or 0,
+                    best_move=move_analysis.best_move or '',
+                    best_evaluation=move_analysis.evaluation_before or 0,
+                    difficulty='medium' if move_analysis.quality == 'mistake' else 'hard'
+                )
+                for move_analysis in move_analyses
+            ]
+            TrainingPosition.objects.bulk_create(
+                training_positions,
+                update_conflicts=True,
+                unique_fields=['username', 'original_game', 'move_analysis'],
+                update_fields=['fen_position', 'player_color', 'original_move', 'original_evaluation', 'best_move', 'best_evaluation', 'difficulty'],
+            )
         
-        return training_positions_created
+        analysis_logger.debug("✅ %d objets MoveAnalysis, %d positions d'entraînement", len(move_analyses), len(training_positions))
+        
+        return len(training_positions)
         
     except Exception as e:
-        print(f"⚠️ Erreur création MoveAnalysis/TrainingPosition: {e}")
+        analysis_logger.exception("⚠️ Erreur création MoveAnalysis/TrainingPosition: %s", e)
         return 0
 
 
+def _fens_by_ply(chess_game, move_analysis_data):
+    """
+    Positions FEN indexées par demi-coup (position avant le coup n° ply_count)
+
+    Construites depuis moves_data ; le PGN n'est rejoué qu'en l'absence de FEN
+    (analyses antérieures à l'enregistrement de fen_before), via l'index des
+    positions mis en cache.
+    """
+    fens = {
+        move_data['ply_count']: move_data['fen_before']
+        for move_data in move_analysis_data
+        if move_data.get('fen_before') and move_data.get('ply_count')
+    }
+    if fens:
+        return fens
+    
+    positions = game_positions(chess_game.pgn, chess_game.game_id)
+    if not positions:
+        return {}
+    return {ply_count: fen for ply_count, fen in enumerate(positions['fens'], start=1)}
+
+
 def get_game_errors(chess_game):
     """Récupérer seulement les erreurs réelles d'une partie"""
     
@@ -1901,7 +1546,7 @@ def get_game_errors(chess_game):
         # Filtrer pour ne retourner que les vraies erreurs selon notre nouveau système
         errors = []
         for move in all_moves:
-            if isinstance(move, dict):
+            if isinstance(move, Mapping):
                 # Utiliser le nouveau système de qualité s'il existe
                 move_quality = move.get('move_quality', '')
                 if move_quality in ['mistake', 'blunder']:
@@ -1917,88 +1562,24 @@ def get_game_errors(chess_game):
 
 
 def parse_pgn_moves(pgn):
-    """Parser simple pour extraire les coups du PGN"""
-    
-    try:
-        # Trouver la ligne avec les coups (après les métadonnées)
-        lines = pgn.strip().split('\n')
-        moves_line = ""
-        
-        for line in lines:
-            if not line.startswith('[') and line.strip():
-                moves_line += line + " "
-        
-        # Nettoyer et extraire les coups
-        moves_text = moves_line.strip()
-        
-        # Supprimer les commentaires et annotations avec regex plus robuste
-        import re
-        
-        # Supprimer tous les commentaires entre accolades { ... }
-        moves_text = re.sub(r'\{[^}]*\}', ' ', moves_text)
-        
-        # Supprimer toutes les annotations entre crochets [ ... ] (y compris %clk)
-        moves_text = re.sub(r'\[[^\]]*\]', ' ', moves_text)
-        
-        # Supprimer les numéros de coups (ex: 1. 2. 15. etc.)
-        moves_text = re.sub(r'\d+\.+', ' ', moves_text)
-        
-        # Supprimer le résultat final
-        moves_text = re.sub(r'\b(1-0|0-1|1/2-1/2|\*)\b', ' ', moves_text)
-        
-        # Supprimer les espaces multiples
-        moves_text = re.sub(r'\s+', ' ', moves_text)
-        
-        # Diviser en coups individuels et nettoyer
-        moves = moves_text.split()
-        
-        # Filtrer les coups valides (ne contiennent que des caractères d'échecs)
-        valid_moves = []
-        chess_pattern = re.compile(r'^[NBRQK]?[a-h]?[1-8]?x?[a-h][1-8](\+|#)?$|^O-O(-O)?(\+|#)?$')
-        
-        for move in moves:
-            move = move.strip()
-            if move and not move.startswith('{') and not move.startswith('['):
-                # Enlever les caractères parasites
-                clean_move = re.sub(r'[{}[\]%]', '', move)
-                if clean_move and (chess_pattern.match(clean_move) or len(clean_move) >= 2):
-                    valid_moves.append(clean_move)
-        
-        print(f"Coups extraits: {valid_moves[:10]}...")  # Debug: afficher les 10 premiers coups
-        return valid_moves
-        
-    except Exception as e:
-        print(f"Erreur parsing PGN: {e}")
-        return []
+    """Coups SAN de la partie principale (commentaires, pendules, NAG et variantes ignorés)"""
+    return read_mainline(pgn)['sans'] if pgn else []
 
 
-def get_game_positions(pgn):
-    """Calculer les positions pour chaque coup avec python-chess"""
+def get_game_positions(pgn, game_id=''):
+    """Positions FEN de la partie (position initiale puis après chaque coup), mises en cache"""
     
-    if CHESS_AVAILABLE:
+    if chess_available():
         try:
-            # Utiliser python-chess pour calculer les vraies positions
-            pgn_io = StringIO(pgn)
-            game = chess.pgn.read_game(pgn_io)
-            
-            if not game:
-                print("Impossible de parser le PGN pour les positions")
-                return ['rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1']
-            
-            positions = []
-            board = game.board()
-            positions.append(board.fen())  # Position initiale
-            
-            for move in game.mainline_moves():
-                board.push(move)
-                positions.append(board.fen())
-                
-            return positions
+            positions = game_positions(pgn, game_id)
+            if positions:
+                return positions['fens']
+            analysis_logger.warning("Impossible de parser le PGN pour les positions")
         except Exception as e:
-            print(f"Erreur lors du calcul des positions: {e}")
+            analysis_logger.warning("Erreur lors du calcul des positions: %s", e)
     
     # Fallback : retourner seulement la position initiale
-    print("Utilisation du fallback pour les positions")
+    analysis_logger.debug("Utilisation du fallback pour les positions")
     return ['rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1']
 
 
@@ -2032,12 +1613,18 @@ def get_move_analysis_data(request, username, game_id):
         else:
             moves_data = chess_game.moves_data if isinstance(chess_game.moves_data, list) else []
         
+        # Positions de la partie (index en cache) : fens[n] = position après n demi-coups
+        fens = get_game_positions(chess_game.pgn, chess_game.game_id)
+        
         # Formater les données pour l'affichage
         formatted_moves = []
         for move_data in moves_data:
+            ply_count = move_data.get('ply_count') or 0
             formatted_move = {
                 'move_number': move_data.get('move_number'),
                 'move_san': move_data.get('move_san'),
+                'fen_before': fens[ply_count - 1] if 0 < ply_count <= len(fens) else None,
+                'fen_after': fens[ply_count] if 0 < ply_count < len(fens) else None,
                 'evaluation_before': move_data.get('evaluation_before', 0),
                 'evaluation_after': move_data.get('evaluation_after', 0),
                 'evaluation_diff': move_data.get('evaluation_diff', 0),
@@ -2068,14 +1655,11 @@ def get_move_analysis_data(request, username, game_id):
         return JsonResponse({'error': 'Partie non trouvée'})
 
 
-# Ancien système de cache supprimé - utilisation des SSE analysis_events
-
 def analysis_events_stream(request, username, game_id):
     """
-    Server-Sent Events pour le suivi en temps réel de l'analyse
+    Server-Sent Events pour le suivi en temps réel de l'analyse (progression lue dans AnalysisJob)
     """
     def event_stream():
-        key = f"{username}_{game_id}"
         last_progress = -1
         start_time = time.time()
         
@@ -2085,8 +1669,9 @@ def analysis_events_stream(request, username, game_id):
         
         while True:
             try:
-                if key in analysis_events:
-                    event_data = analysis_events[key]
+                # Progression écrite par le worker dans AnalysisJob
+                event_data = game_event(game_id)
+                if event_data is not None:
                     current_progress = event_data['progress']
                 
                     # Envoyer seulement si il y a du changement
@@ -2142,30 +1727,35 @@ def training_session(request, username):
     """Démarrer une session d'entraînement pour un utilisateur"""
     from .models import TrainingPosition, TrainingSession
     
-    # Récupérer toutes les positions d'entraînement disponibles (sans limite)
-    available_positions = TrainingPosition.objects.filter(username=username).order_by('?')
+    # Positions les plus en retard d'abord, lues dans l'index (username, next_due)
+    max_positions_per_session = 50  # Limite raisonnable pour une session
+    session_positions = list(review_queue(username).select_related('original_game')[:max_positions_per_session])
     
-    if not available_positions:
+    if not session_positions:
         messages.warning(request, f"Aucune position d'entraînement trouvée pour {username}. Analysez d'abord quelques parties pour générer des positions d'entraînement.")
         return redirect('chessTrainer:chess_analysis')
     
-    # Pour une session d'entraînement, on peut prendre un échantillon plus large
-    # mais pas forcément toutes les positions pour éviter une session trop longue
-    max_positions_per_session = 50  # Limite raisonnable pour une session
-    session_positions = available_positions[:max_positions_per_session]
+    if len(session_positions) < max_positions_per_session:
+        total_available = len(session_positions)
+    else:
+        total_available = TrainingPosition.objects.filter(username=username).count()
     
     # Créer une nouvelle session d'entraînement
     session = TrainingSession.objects.create(
         username=username,
         max_positions=len(session_positions)
     )
+    # Les tentatives suivantes sont comptées dans cette session
+    request.session['training_session_id'] = session.id
     
     context = {
         'username': username,
         'session': session,
         'positions': session_positions,
         'total_positions': len(session_positions),
-        'total_available': available_positions.count()
+        'total_available': total_available,
+        'due_count': due_count(username),
+        'stats': TrainingStats.objects.filter(username=username).first(),
     }
     
     return render(request, 'chessTrainer/training/session.html', context)
@@ -2217,15 +1807,12 @@ def next_training_position(request, username, current_position_id):
     from .models import TrainingPosition
     
     try:
-        # Obtenir toutes les positions de l'utilisateur, triées par ID
-        positions = TrainingPosition.objects.filter(username=username).order_by('id')
-        
-        # Trouver la position suivante
-        next_position = positions.filter(id__gt=current_position_id).first()
+        # Position la plus en retard dans la file de révision, hors position courante
+        next_position = review_queue(username).exclude(id=current_position_id).first()
         
-        # Si pas de position suivante, prendre la première (boucle)
+        # Si c'est la seule position, la reproposer
         if not next_position:
-            next_position = positions.first()
+            next_position = review_queue(username).first()
         
         if next_position:
             return redirect('chessTrainer:training_position', username=username, position_id=next_position.id)
@@ -2251,7 +1838,7 @@ def check_training_move(request):
         data = json.loads(request.body)
         position_id = data.get('position_id')
         attempted_move = data.get('move')
-        time_spent = data.get('time_spent', 0)
+        time_spent = int(data.get('time_spent') or 0)
         
         if not position_id or not attempted_move:
             return JsonResponse({'error': 'Données manquantes'}, status=400)
@@ -2261,70 +1848,17 @@ def check_training_move(request):
         # Analyser le coup avec Stockfish
         result = analyze_training_move(position, attempted_move)
         
-        # Enregistrer la tentative
-        attempt = TrainingAttempt.objects.create(
-            training_position=position,
-            attempted_move=attempted_move,
-            evaluation_after_attempt=result['evaluation'],
-            result_quality=result['quality'],
-            improvement_points=result['improvement_points'],
-            is_better_than_original=result['is_better'],
-            is_best_move=result['is_best'],
-            time_spent_seconds=time_spent
+        # Enregistrer la tentative : compteurs de la position, de la session et du joueur
+        attempt = record_attempt(
+            position, result, attempted_move, time_spent,
+            session_id=request.session.get('training_session_id')
         )
         
-        # Mettre à jour les statistiques de la position
-        position.times_played += 1
-        if result['is_better'] or result['is_best']:
-            position.times_solved += 1
-        position.save()
-        
-        return JsonResponse({
-            'success': True,
-            'result': result
-        })
-        
-    except TrainingPosition.DoesNotExist:
-        return JsonResponse({'error': 'Position introuvable'}, status=404)
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
-    
-    try:
-        data = json.loads(request.body)
-        position_id = data.get('position_id')
-        attempted_move = data.get('move')
-        time_spent = data.get('time_spent', 0)
-        
-        if not position_id or not attempted_move:
-            return JsonResponse({'error': 'Données manquantes'}, status=400)
-        
-        position = TrainingPosition.objects.get(id=position_id)
-        
-        # Analyser le coup avec Stockfish
-        result = analyze_training_move(position, attempted_move)
-        
-        # Enregistrer la tentative
-        attempt = TrainingAttempt.objects.create(
-            training_position=position,
-            attempted_move=attempted_move,
-            evaluation_after_attempt=result['evaluation'],
-            result_quality=result['quality'],
-            improvement_points=result['improvement_points'],
-            is_better_than_original=result['is_better'],
-            is_best_move=result['is_best'],
-            time_spent_seconds=time_spent
-        )
-        
-        # Mettre à jour les statistiques de la position
-        position.times_played += 1
-        if result['is_better'] or result['is_best']:
-            position.times_solved += 1
-        position.save()
-        
         return JsonResponse({
             'success': True,
             'result': result,
-            'attempt_id': attempt.id
+            'attempt_id': attempt.id,
+            'next_due': position.next_due.isoformat()
         })
         
     except TrainingPosition.DoesNotExist:
@@ -2336,7 +1870,7 @@ def check_training_move(request):
 def analyze_training_move(position, attempted_move):
     """Analyser un coup d'entraînement avec Stockfish"""
     
-    if not STOCKFISH_AVAILABLE:
+    if not stockfish_available():
         return {
             'evaluation': 0,
             'quality': 'unknown',
@@ -2376,7 +1910,7 @@ def analyze_training_move(position, attempted_move):
             }
         
         # Analyser avec Stockfish
-        with chess.engine.SimpleEngine.popen_uci("/opt/homebrew/bin/stockfish") as engine:
+        with open_engine() as engine:
             # Analyser la position initiale pour les 5 meilleurs coups
             initial_board = chess.Board(position.fen_position)
             multipv_info = engine.analyse(initial_board, chess.engine.Limit(depth=16), multipv=5)
@@ -1,11 +1,11 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Photo, Definition, GameSession
+from .models import Photo, Definition, GameSession, ThumbnailJob
 
 @admin.register(Photo)
 class PhotoAdmin(admin.ModelAdmin):
-    list_display = ('name', 'image_preview', 'image_400_preview', 'created_at')
-    list_filter = ('created_at',)
+    list_display = ('name', 'image_preview', 'image_400_preview', 'image_ready', 'created_at')
+    list_filter = ('image_ready', 'created_at')
     search_fields = ('name',)
     fields = ('name', 'image', 'image_400_display')
     readonly_fields = ('image_400_display',)
@@ -26,7 +26,14 @@ class PhotoAdmin(admin.ModelAdmin):
     def image_400_display(self, obj):
         if obj.image_400x400:
             return format_html('<img src="{}" style="width: 400px; height: 400px; border: 2px solid #ccc;">', obj.image_400x400.url)
-        return "L'image 400x400 sera générée automatiquement après sauvegarde"
+        return "L'image 400x400 sera générée en arrière-plan après sauvegarde"
+
+@admin.register(ThumbnailJob)
+class ThumbnailJobAdmin(admin.ModelAdmin):
+    list_display = ('photo', 'status', 'attempts', 'created_at', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('photo__name',)
+    readonly_fields = ('photo', 'attempts', 'error', 'created_at', 'updated_at')
 
 @admin.register(Definition)
 class DefinitionAdmin(admin.ModelAdmin):
@@ -77,7 +84,7 @@ class GameSessionAdmin(admin.ModelAdmin):
             'fields': ('current_definition',)
         }),
         ('État du jeu (automatique)', {
-            'fields': ('team_a_revealed_squares', 'team_b_revealed_squares', 'team_a_photo_revealed', 'team_b_photo_revealed', 'revealed_words', 'used_definitions', 'used_photos'),
+            'fields': ('team_a_revealed_squares', 'team_b_revealed_squares', 'team_a_photo_revealed', 'team_b_photo_revealed', 'revealed_words', 'used_definitions', 'used_photos', 'definition_decks', 'photo_deck'),
             'classes': ('collapse',)
         })
     )
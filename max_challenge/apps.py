@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MaxChallengeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'max_challenge'
+    
+    def ready(self):
+        """Importer les signaux quand l'app est prête"""
+        import max_challenge.signals
@@ -0,0 +1,110 @@
+"""
+Catalogue compact des définitions et photos pour l'interface de l'animateur
+
+Le catalogue (ids, mots, difficulté, URLs des miniatures) est mis en cache et
+servi en mode stale-while-revalidate : une version périmée est renvoyée
+immédiatement pendant qu'un thread la reconstruit. Les signaux de signals.py
+marquent le cache comme périmé à chaque modification d'une définition ou photo.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connection
+
+from .models import Definition, Photo
+
+CACHE_KEY = 'max_challenge:catalogue'
+INVALIDATED_KEY = 'max_challenge:catalogue:invalidated_at'
+# Durée pendant laquelle le catalogue est considéré frais (secondes)
+FRESH_SECONDS = 60
+# Durée de conservation d'une version périmée dans le cache
+STALE_SECONDS = 60 * 60 * 24
+
+_refresh_lock = threading.Lock()
+_refreshing = False
+
+
+def build_catalogue():
+    """Construit le catalogue à partir de projections values() (sans charger les objets complets)"""
+    definitions = [
+        {
+            'id': row['id'],
+            'word': row['word'],
+            'difficulty': row['difficulty'],
+            'preview': row['definition'][:80],
+        }
+        for row in Definition.objects.order_by('difficulty', 'word').values('id', 'word', 'difficulty', 'definition')
+    ]
+
+    photos = []
+    for row in Photo.objects.order_by('name').values('id', 'name', 'image', 'image_400x400', 'image_ready'):
+        # Reconstruire l'URL via le champ du modèle sans instancier de Photo
+        field_name = 'image_400x400' if row['image_400x400'] else 'image'
+        url = Photo._meta.get_field(field_name).storage.url(row[field_name]) if row[field_name] else None
+        photos.append({
+            'id': row['id'],
+            'name': row['name'],
+            'thumbnail_url': url,
+            'ready': row['image_ready'],
+        })
+
+    return {
+        'definitions': definitions,
+        'photos': photos,
+        'built_at': time.time(),
+    }
+
+
+def get_catalogue():
+    """Retourne le catalogue depuis le cache ; une version périmée déclenche une reconstruction en arrière-plan"""
+    entry = cache.get(CACHE_KEY)
+    if entry is None:
+        return refresh_catalogue()
+
+    if entry['fresh_until'] < time.time():
+        _refresh_in_background()
+    return entry['payload']
+
+
+def refresh_catalogue():
+    """Reconstruit le catalogue et le stocke dans le cache"""
+    started = time.time()
+    payload = build_catalogue()
+    # Une modification pendant la reconstruction laisse la nouvelle version périmée
+    fresh_until = 0 if cache.get(INVALIDATED_KEY, 0) >= started else time.time() + FRESH_SECONDS
+    cache.set(CACHE_KEY, {'payload': payload, 'fresh_until': fresh_until}, STALE_SECONDS)
+    return payload
+
+
+def invalidate_catalogue():
+    """Marque le catalogue comme périmé (la prochaine lecture lancera la reconstruction)"""
+    cache.set(INVALIDATED_KEY, time.time(), STALE_SECONDS)
+    entry = cache.get(CACHE_KEY)
+    if entry is not None:
+        entry['fresh_until'] = 0
+        cache.set(CACHE_KEY, entry, STALE_SECONDS)
+
+
+def _refresh_in_background():
+    """Lance une seule reconstruction à la fois, même si plusieurs requêtes lisent une version périmée"""
+    global _refreshing
+    with _refresh_lock:
+        if _refreshing:
+            return
+        _refreshing = True
+
+    def run():
+        global _refreshing
+        try:
+            refresh_catalogue()
+        except Exception as e:
+            print(f"❌ Erreur lors de la reconstruction du catalogue: {e}")
+        finally:
+            with _refresh_lock:
+                _refreshing = False
+            connection.close()
+
+    refresh_thread = threading.Thread(target=run, name='max_challenge-catalogue')
+    refresh_thread.daemon = True
+    refresh_thread.start()
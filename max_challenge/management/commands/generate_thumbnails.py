@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from max_challenge.models import Photo, ThumbnailJob
+from max_challenge.thumbnails import process_pending_jobs, requeue_expired_jobs
+
+
+class Command(BaseCommand):
+    help = 'Génère les images redimensionnées manquantes des photos (backfill de la file de jobs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Régénérer les images de toutes les photos, même celles déjà prêtes',
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Remettre en attente les jobs en échec',
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            retried = ThumbnailJob.objects.filter(status=ThumbnailJob.FAILED).update(
+                status=ThumbnailJob.PENDING, attempts=0
+            )
+            self.stdout.write(f'🔄 {retried} jobs en échec remis en attente')
+
+        # Jobs restés « en cours » après l'arrêt d'un worker
+        requeued = requeue_expired_jobs()
+        if requeued:
+            self.stdout.write(f'⏱️ {requeued} jobs interrompus remis en attente')
+
+        photos = Photo.objects.exclude(image='')
+        if not options['force']:
+            photos = photos.filter(Q(image_400x400='') | Q(image_ready=False))
+
+        queued_ids = set(
+            ThumbnailJob.objects.filter(
+                status__in=[ThumbnailJob.PENDING, ThumbnailJob.RUNNING]
+            ).values_list('photo_id', flat=True)
+        )
+        new_jobs = [
+            ThumbnailJob(photo_id=photo_id)
+            for photo_id in photos.values_list('pk', flat=True)
+            if photo_id not in queued_ids
+        ]
+        ThumbnailJob.objects.bulk_create(new_jobs)
+        self.stdout.write(f'📥 {len(new_jobs)} jobs ajoutés à la file')
+
+        processed = process_pending_jobs()
+        failed = ThumbnailJob.objects.filter(status=ThumbnailJob.FAILED).count()
+
+        self.stdout.write(self.style.SUCCESS(f'\n🎉 {processed} jobs traités'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'⚠️ {failed} jobs en échec (voir l\'admin)'))
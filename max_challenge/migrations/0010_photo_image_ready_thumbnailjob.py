@@ -0,0 +1,44 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mark_existing_ready(apps, schema_editor):
+    """Les photos déjà redimensionnées avant la file de jobs sont prêtes"""
+    Photo = apps.get_model('max_challenge', 'Photo')
+    Photo.objects.exclude(image_400x400='').update(image_ready=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('max_challenge', '0009_gamesession_squares_per_reveal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='image_ready',
+            field=models.BooleanField(default=False, verbose_name='Image redimensionnée prête'),
+        ),
+        migrations.CreateModel(
+            name='ThumbnailJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminé'), ('failed', 'Échec')], default='pending', max_length=10, verbose_name='Statut')),
+                ('attempts', models.IntegerField(default=0, verbose_name='Tentatives')),
+                ('error', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('photo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thumbnail_jobs', to='max_challenge.photo', verbose_name='Photo')),
+            ],
+            options={
+                'verbose_name': 'Job de redimensionnement',
+                'verbose_name_plural': 'Jobs de redimensionnement',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='max_challen_status_eaa114_idx')],
+            },
+        ),
+        migrations.RunPython(mark_existing_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('max_challenge', '0010_photo_image_ready_thumbnailjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='definition_decks',
+            field=models.JSONField(default=dict, verbose_name='Paquets mélangés des définitions restantes (par difficulté)'),
+        ),
+        migrations.AddField(
+            model_name='gamesession',
+            name='photo_deck',
+            field=models.JSONField(default=list, verbose_name='Paquet mélangé des photos restantes'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('max_challenge', '0011_gamesession_decks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='leased_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name="Réservé jusqu'à"),
+        ),
+    ]
@@ -1,11 +1,11 @@
 from django.db import models
-from PIL import Image
 
 class Photo(models.Model):
     """Photo à deviner découpée en grille 10x10"""
     name = models.CharField(max_length=200, verbose_name="Nom de la personne")
     image = models.ImageField(upload_to='max_challenge/photos/', verbose_name="Photo")
     image_400x400 = models.ImageField(upload_to='max_challenge/photos_400/', blank=True, verbose_name="Image redimensionnée")
+    image_ready = models.BooleanField(default=False, verbose_name="Image redimensionnée prête")
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -18,67 +18,61 @@ class Photo(models.Model):
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         if self.image and not self.image_400x400:
-            self.resize_to_400x400()
+            # Le redimensionnement est fait hors requête par le worker de thumbnails.py
+            from .thumbnails import schedule_thumbnail
+            schedule_thumbnail(self)
+    
+    @property
+    def thumbnail_url(self):
+        """URL de l'image redimensionnée, ou de l'originale tant qu'elle n'est pas prête"""
+        if self.image_400x400:
+            return self.image_400x400.url
+        if self.image:
+            return self.image.url
+        return None
     
     def resize_to_400x400(self):
-        """Redimensionne l'image en 400x600 pixels (ratio 2:3 pour images portrait)"""
+        """Redimensionne l'image immédiatement (sans passer par la file de jobs)"""
+        from .thumbnails import generate_thumbnail
         try:
-            from django.core.files.base import ContentFile
-            from io import BytesIO
-            
-            # Ouvrir l'image
-            img = Image.open(self.image.path)
-            
-            # Convertir en RGB si nécessaire
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Détecter si l'image est portrait (hauteur > largeur) ou paysage
-            width, height = img.size
-            is_portrait = height > width
-            
-            if is_portrait:
-                # Image portrait : redimensionner en 400x600 (ratio 2:3)
-                target_width, target_height = 400, 600
-                # Calculer le ratio pour crop
-                target_ratio = 2 / 3  # largeur / hauteur
-                current_ratio = width / height
-                
-                if current_ratio > target_ratio:
-                    # Image trop large, crop sur la largeur
-                    new_width = int(height * target_ratio)
-                    left = (width - new_width) // 2
-                    img = img.crop((left, 0, left + new_width, height))
-                else:
-                    # Image trop haute, crop sur la hauteur
-                    new_height = int(width / target_ratio)
-                    top = (height - new_height) // 2
-                    img = img.crop((0, top, width, top + new_height))
-            else:
-                # Image paysage ou carrée : crop en carré 400x400
-                target_width, target_height = 400, 400
-                size = min(width, height)
-                left = (width - size) // 2
-                top = (height - size) // 2
-                img = img.crop((left, top, left + size, top + size))
-            
-            # Redimensionner à la taille cible
-            img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-            
-            # Sauvegarder dans un buffer avec compression modérée
-            buffer = BytesIO()
-            img.save(buffer, format='JPEG', quality=85, optimize=True)
-            buffer.seek(0)
-            
-            # Sauvegarder dans le champ image_400x400
-            filename = f"{self.name}_{target_width}x{target_height}.jpg"
-            self.image_400x400.save(filename, ContentFile(buffer.read()), save=False)
-            self.save(update_fields=['image_400x400'])
-            
-            print(f"✅ Image {target_width}x{target_height} générée pour {self.name}")
+            generate_thumbnail(self)
         except Exception as e:
             print(f"❌ Erreur lors du redimensionnement: {e}")
 
+
+class ThumbnailJob(models.Model):
+    """Job de redimensionnement d'une photo, traité en arrière-plan après l'upload"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'En attente'),
+        (RUNNING, 'En cours'),
+        (DONE, 'Terminé'),
+        (FAILED, 'Échec'),
+    ]
+    
+    photo = models.ForeignKey(Photo, on_delete=models.CASCADE, related_name='thumbnail_jobs', verbose_name="Photo")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="Statut")
+    attempts = models.IntegerField(default=0, verbose_name="Tentatives")
+    error = models.TextField(blank=True, verbose_name="Dernière erreur")
+    # Un job en cours dont le bail a expiré (worker arrêté en plein traitement) est remis en attente
+    leased_until = models.DateTimeField(null=True, blank=True, verbose_name="Réservé jusqu'à")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Job de redimensionnement"
+        verbose_name_plural = "Jobs de redimensionnement"
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.photo} - {self.get_status_display()}"
+
 class Definition(models.Model):
     """Définition d'un mot à deviner"""
     word = models.CharField(max_length=100, verbose_name="Mot à deviner")
@@ -145,6 +139,10 @@ class GameSession(models.Model):
     used_definitions = models.JSONField(default=list, verbose_name="IDs des définitions déjà utilisées")
     used_photos = models.JSONField(default=list, verbose_name="IDs des photos déjà utilisées")
     
+    # Paquets mélangés des IDs restants : le prochain tirage est un simple pop() (pas de ORDER BY RANDOM())
+    definition_decks = models.JSONField(default=dict, verbose_name="Paquets mélangés des définitions restantes (par difficulté)")
+    photo_deck = models.JSONField(default=list, verbose_name="Paquet mélangé des photos restantes")
+    
     is_active = models.BooleanField(default=True, verbose_name="Partie active")
     created_at = models.DateTimeField(auto_now_add=True)
     
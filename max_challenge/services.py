@@ -7,6 +7,32 @@ from django.shortcuts import get_object_or_404
 from .models import GameSession, Photo, Definition
 
 
+def draw_from_deck(deck, queryset, skip_ids):
+    """Tire un objet au hasard depuis un paquet d'IDs mélangé
+    
+    Chaque tirage est un pop() en fin de liste. Le paquet n'est (re)construit
+    à partir des IDs du queryset que lorsqu'il est vide, ce qui permet aussi de
+    prendre en compte les objets ajoutés en cours de partie.
+    
+    Retourne (objet ou None, paquet restant).
+    """
+    deck = list(deck or [])
+    refilled = False
+    while True:
+        while deck:
+            candidate_id = deck.pop()
+            if candidate_id in skip_ids:
+                continue
+            candidate = queryset.filter(pk=candidate_id).first()
+            if candidate is not None:
+                return candidate, deck
+        if refilled:
+            return None, deck
+        deck = list(queryset.exclude(pk__in=skip_ids).values_list('pk', flat=True))
+        random.shuffle(deck)
+        refilled = True
+
+
 class GameService:
     """Service pour gérer toute la logique métier du jeu"""
     
@@ -20,8 +46,8 @@ class GameService:
             'team_a_grid': self._get_team_grid_data('A'),
             'team_b_grid': self._get_team_grid_data('B'),
             'definition_display': self._get_definition_display(),
-            'team_a_photo_url': self.game.team_a_photo.image_400x400.url if self.game.team_a_photo_revealed and self.game.team_a_photo.image_400x400 else None,
-            'team_b_photo_url': self.game.team_b_photo.image_400x400.url if self.game.team_b_photo_revealed and self.game.team_b_photo.image_400x400 else None,
+            'team_a_photo_url': self.game.team_a_photo.thumbnail_url if self.game.team_a_photo_revealed else None,
+            'team_b_photo_url': self.game.team_b_photo.thumbnail_url if self.game.team_b_photo_revealed else None,
         }
     
     def add_point_to_team(self, team_name):
@@ -64,77 +90,55 @@ class GameService:
     
     def hide_team_photo(self, team):
         """Masque la photo d'une équipe et charge une nouvelle photo aléatoire non utilisée"""
-        from .models import Photo
-        import random
+        if team not in ('A', 'B'):
+            return {'success': True, 'new_photo_name': ''}
         
         # Récupérer les photos déjà utilisées
         used_photo_ids = self.game.used_photos or []
-        
-        # Récupérer les photos disponibles (non utilisées)
-        available_photos = list(Photo.objects.exclude(pk__in=used_photo_ids))
+        current_photo_id = self.game.team_a_photo_id if team == 'A' else self.game.team_b_photo_id
+        
+        # Tirer une photo du paquet en excluant les deux photos actuelles
+        skip_ids = set(used_photo_ids) | {self.game.team_a_photo_id, self.game.team_b_photo_id}
+        new_photo, self.game.photo_deck = draw_from_deck(self.game.photo_deck, Photo.objects.all(), skip_ids)
+        
+        if new_photo is None:
+            # Si pas de candidat, au moins exclure la photo de cette équipe
+            new_photo = (
+                Photo.objects
+                .exclude(pk__in=used_photo_ids)
+                .exclude(pk=current_photo_id)
+                .first()
+            )
         
         # Si toutes les photos ont été utilisées, message d'erreur
-        if not available_photos:
+        if new_photo is None:
             return {
                 'success': False, 
                 'error': 'Toutes les photos ont déjà été utilisées'
             }
         
-        new_photo = None
-        
-        # Sélectionner une nouvelle photo aléatoire différente des photos actuelles
         if team == 'A':
-            current_photo_a = self.game.team_a_photo
-            current_photo_b = self.game.team_b_photo
-            # Exclure les deux photos actuelles
-            candidate_photos = [p for p in available_photos if p != current_photo_a and p != current_photo_b]
-            if not candidate_photos:
-                # Si pas de candidat, au moins exclure la photo de cette équipe
-                candidate_photos = [p for p in available_photos if p != current_photo_a]
-            if not candidate_photos:
-                candidate_photos = available_photos
-            
-            new_photo = random.choice(candidate_photos)
             self.game.team_a_photo = new_photo
             self.game.team_a_photo_revealed = False
             self.game.team_a_revealed_squares = []  # Réinitialiser les carrés révélés
-        elif team == 'B':
-            current_photo_a = self.game.team_a_photo
-            current_photo_b = self.game.team_b_photo
-            # Exclure les deux photos actuelles
-            candidate_photos = [p for p in available_photos if p != current_photo_a and p != current_photo_b]
-            if not candidate_photos:
-                # Si pas de candidat, au moins exclure la photo de cette équipe
-                candidate_photos = [p for p in available_photos if p != current_photo_b]
-            if not candidate_photos:
-                candidate_photos = available_photos
-            
-            new_photo = random.choice(candidate_photos)
+        else:
             self.game.team_b_photo = new_photo
             self.game.team_b_photo_revealed = False
             self.game.team_b_revealed_squares = []  # Réinitialiser les carrés révélés
         
         # Ajouter la nouvelle photo à la liste des photos utilisées
-        if new_photo and new_photo.pk not in used_photo_ids:
+        if new_photo.pk not in used_photo_ids:
             used_photo_ids.append(new_photo.pk)
             self.game.used_photos = used_photo_ids
         
         self.game.save()
-        return {'success': True, 'new_photo_name': new_photo.name if new_photo else ''}
+        return {'success': True, 'new_photo_name': new_photo.name}
     
     def set_current_definition(self, definition_id):
-        """Définit la définition actuelle et révèle 4 mots aléatoires"""
-        if definition_id:
-            definition = get_object_or_404(Definition, id=definition_id)
-            self.game.current_definition = definition
-
-            # Révéler 4 mots aléatoires
-            words = re.findall(r'\b\w+\b', definition.definition)
-            self.game.revealed_words = random.sample(words, min(4, len(words)))
-
-            self.game.save()
-        
-        return {'success': True}
+        """Définit la définition choisie par l'animateur et révèle 4 mots aléatoires"""
+        if not definition_id:
+            return {'success': False, 'message': 'Aucune définition choisie'}
+        return self._start_definition(get_object_or_404(Definition, id=definition_id))
     
     def set_next_definition(self, difficulty=None):
         """Définit la prochaine définition selon la difficulté choisie ou aléatoirement"""
@@ -142,55 +146,42 @@ class GameService:
         used_definition_ids = self.game.used_definitions or []
         
         if difficulty:
-            # Filtrer par difficulté choisie ET exclure celles déjà utilisées
-            available_definitions = list(
-                Definition.objects
-                .filter(difficulty=difficulty)
-                .exclude(id__in=used_definition_ids)
-                .order_by('?')
+            # Tirer une définition du paquet mélangé de ce niveau (hors définitions déjà utilisées)
+            decks = self.game.definition_decks or {}
+            deck_key = str(difficulty)
+            next_definition, decks[deck_key] = draw_from_deck(
+                decks.get(deck_key, []),
+                Definition.objects.filter(difficulty=difficulty),
+                set(used_definition_ids),
             )
+            self.game.definition_decks = decks
             
-            if not available_definitions:
+            if next_definition is None:
                 return {
                     'success': False, 
                     'message': f'Aucune définition de niveau {difficulty} disponible (toutes ont été utilisées)'
                 }
-            
-            # Prendre une définition aléatoire du niveau choisi
-            next_definition = available_definitions[0]
         else:
-            # Mode automatique : ordre de difficulté (ancien comportement) excluant celles déjà utilisées
-            all_definitions = list(
+            # Mode automatique : ordre de difficulté excluant celles déjà utilisées
+            # (la définition en cours est déjà marquée utilisée, on prend donc la première restante)
+            next_definition = (
                 Definition.objects
                 .exclude(id__in=used_definition_ids)
                 .order_by('difficulty', 'pk')
+                .first()
             )
             
-            if not all_definitions:
+            if next_definition is None:
                 return {
                     'success': False,
                     'message': 'Toutes les définitions ont été utilisées'
                 }
-            
-            if not all_definitions:
-                return {'success': False, 'message': 'Aucune définition disponible'}
-            
-            # Si aucune définition n'est active, prendre la première
-            if not self.game.current_definition:
-                next_definition = all_definitions[0]
-            else:
-                # Trouver la définition suivante après la définition actuelle
-                current_index = None
-                for idx, definition in enumerate(all_definitions):
-                    if definition.pk == self.game.current_definition.pk:
-                        current_index = idx
-                        break
-                
-                # Passer à la suivante, ou revenir à la première si on est à la fin
-                if current_index is not None and current_index < len(all_definitions) - 1:
-                    next_definition = all_definitions[current_index + 1]
-                else:
-                    next_definition = all_definitions[0]
+        
+        return self._start_definition(next_definition)
+    
+    def _start_definition(self, next_definition):
+        """Passe à la définition donnée : marquée utilisée, 4 mots révélés"""
+        used_definition_ids = self.game.used_definitions or []
         
         # Définir la nouvelle définition
         self.game.current_definition = next_definition
@@ -283,8 +274,8 @@ class GameService:
             'team_b_score': self.game.team_b_score,
             'team_a_grid': self._get_team_grid_data('A'),
             'team_b_grid': self._get_team_grid_data('B'),
-            'team_a_photo_url': self.game.team_a_photo.image_400x400.url if self.game.team_a_photo_revealed and self.game.team_a_photo.image_400x400 else None,
-            'team_b_photo_url': self.game.team_b_photo.image_400x400.url if self.game.team_b_photo_revealed and self.game.team_b_photo.image_400x400 else None,
+            'team_a_photo_url': self.game.team_a_photo.thumbnail_url if self.game.team_a_photo_revealed else None,
+            'team_b_photo_url': self.game.team_b_photo.thumbnail_url if self.game.team_b_photo_revealed else None,
             'team_a_photo_revealed': self.game.team_a_photo_revealed,
             'team_b_photo_revealed': self.game.team_b_photo_revealed,
             'definition_display': self._get_definition_display(),
@@ -297,14 +288,14 @@ class GameService:
             if self.game.team_a_photo_revealed:
                 return None  # Photo complète visible
             return {
-                'image_url': self.game.team_a_photo.image_400x400.url if self.game.team_a_photo.image_400x400 else None,
+                'image_url': self.game.team_a_photo.thumbnail_url,
                 'revealed_squares': self.game.team_a_revealed_squares
             }
         elif team == 'B':
             if self.game.team_b_photo_revealed:
                 return None
             return {
-                'image_url': self.game.team_b_photo.image_400x400.url if self.game.team_b_photo.image_400x400 else None,
+                'image_url': self.game.team_b_photo.thumbnail_url,
                 'revealed_squares': self.game.team_b_revealed_squares
             }
     
@@ -400,16 +391,15 @@ class GameCreationService:
         if GameSession.objects.exists():
             return {'success': False, 'error': 'Il existe déjà une fête. Impossible d\'en créer une nouvelle.'}
 
-        photos = list(Photo.objects.all())
-        if len(photos) < 2:
+        # Mélanger les IDs (sans charger les photos) : les 3 premiers sont tirés, le reste forme le paquet
+        photo_ids = list(Photo.objects.values_list('pk', flat=True))
+        if len(photo_ids) < 2:
             return {'success': False, 'error': 'Il faut au moins 2 photos différentes pour créer une partie'}
 
-        # Sélectionner des photos aléatoires (au moins 2 différentes)
-        selected_photos = random.sample(photos, min(len(photos), 3))
-        
-        # S'assurer qu'on a au moins 2 photos différentes
-        if len(selected_photos) < 2:
-            return {'success': False, 'error': 'Il faut au moins 2 photos différentes pour créer une partie'}
+        random.shuffle(photo_ids)
+        selected_ids = [photo_ids.pop() for _ in range(min(len(photo_ids), 3))]
+        photos_by_id = Photo.objects.in_bulk(selected_ids)
+        selected_photos = [photos_by_id[pk] for pk in selected_ids]
 
         game = GameSession.objects.create(
             name=game_data.get('name'),
@@ -425,6 +415,7 @@ class GameCreationService:
             # Marquer les 2 photos initiales comme utilisées (on a vérifié qu'il y en a 2)
             used_photos=[selected_photos[0].pk, selected_photos[1].pk],
             used_definitions=[],
+            photo_deck=photo_ids,
         )
 
         # Ajouter les photos globales
@@ -0,0 +1,16 @@
+"""
+Signaux pour invalider le catalogue de l'animateur quand une définition ou une photo change
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .catalogue import invalidate_catalogue
+from .models import Definition, Photo
+
+
+@receiver(post_save, sender=Definition)
+@receiver(post_delete, sender=Definition)
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+def invalidate_catalogue_on_change(sender, **kwargs):
+    """Marque le catalogue comme périmé après un ajout, une modification ou une suppression"""
+    invalidate_catalogue()
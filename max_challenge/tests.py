@@ -1,3 +1,246 @@
-from django.test import TestCase
+"""
+Tests de la logique de tirage du Max Challenge
+"""
 
-# Create your tests here.
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from .catalogue import get_catalogue, refresh_catalogue
+from .models import Definition, GameSession, Photo, ThumbnailJob
+from .services import GameService, draw_from_deck
+
+
+class DeckSelectionTestCase(TestCase):
+    """Tirage des définitions et photos depuis les paquets mélangés de la partie"""
+
+    def setUp(self):
+        Photo.objects.bulk_create([
+            Photo(name=f"Photo {i}", image=f"max_challenge/photos/photo{i}.jpg")
+            for i in range(5)
+        ])
+        self.photos = list(Photo.objects.order_by('pk'))
+        Definition.objects.bulk_create([
+            Definition(word=f"mot{i}", definition=f"Définition numéro {i} du mot", difficulty=1 + i % 3)
+            for i in range(9)
+        ])
+        self.game = GameSession.objects.create(
+            name="Fête de test",
+            team_a_photo=self.photos[0],
+            team_b_photo=self.photos[1],
+            used_photos=[self.photos[0].pk, self.photos[1].pk],
+        )
+
+    def test_draw_from_deck_skips_and_refills(self):
+        """Le paquet est construit à la demande et ignore les IDs exclus"""
+        skip_ids = {self.photos[0].pk, self.photos[1].pk}
+        drawn, deck = draw_from_deck([], Photo.objects.all(), skip_ids)
+        self.assertNotIn(drawn.pk, skip_ids)
+        self.assertEqual(len(deck), 2)
+
+        # Un ID supprimé entre-temps est simplement sauté
+        drawn, deck = draw_from_deck([9999, self.photos[2].pk], Photo.objects.all(), set())
+        self.assertEqual(drawn, self.photos[2])
+        self.assertEqual(deck, [9999])
+
+    def test_definitions_by_difficulty_are_never_repeated(self):
+        """Toutes les définitions d'un niveau sont tirées une seule fois, puis le niveau est épuisé"""
+        seen = []
+        for _ in range(3):
+            result = GameService(self.game.pk).set_next_definition(difficulty=2)
+            self.assertTrue(result['success'])
+            seen.append(result['definition']['word'])
+
+        self.assertEqual(len(set(seen)), 3)
+        self.assertEqual(
+            set(seen),
+            set(Definition.objects.filter(difficulty=2).values_list('word', flat=True)),
+        )
+        result = GameService(self.game.pk).set_next_definition(difficulty=2)
+        self.assertFalse(result['success'])
+
+    def test_hide_photo_draws_unused_photos(self):
+        """Changer de photo tire uniquement des photos jamais utilisées"""
+        for _ in range(3):
+            result = GameService(self.game.pk).hide_team_photo('A')
+            self.assertTrue(result['success'])
+
+        self.game.refresh_from_db()
+        self.assertEqual(len(set(self.game.used_photos)), 5)
+        self.assertEqual(self.game.photo_deck, [])
+
+        result = GameService(self.game.pk).hide_team_photo('B')
+        self.assertFalse(result['success'])
+
+
+class CatalogueTestCase(TestCase):
+    """Catalogue mis en cache de l'interface animateur"""
+
+    def setUp(self):
+        cache.clear()
+        photos = Photo.objects.bulk_create([
+            Photo(name="Alice", image="max_challenge/photos/alice.jpg"),
+            Photo(name="Bob", image="max_challenge/photos/bob.jpg"),
+        ])
+        Definition.objects.create(word="chat", definition="Animal domestique qui miaule", difficulty=1)
+        Definition.objects.create(word="chien", definition="Animal domestique qui aboie", difficulty=2)
+        self.game = GameSession.objects.create(
+            name="Fête de test",
+            team_a_photo=photos[0],
+            team_b_photo=photos[1],
+        )
+
+    def test_catalogue_invalidated_on_save(self):
+        """Une nouvelle définition apparaît après l'invalidation par signal"""
+        self.assertEqual(len(get_catalogue()['definitions']), 2)
+
+        Definition.objects.create(word="oiseau", definition="Animal qui vole", difficulty=1)
+        # La version périmée reste servie pendant que la reconstruction est lancée en arrière-plan
+        with mock.patch('max_challenge.catalogue._refresh_in_background') as refresh_in_background:
+            self.assertEqual(len(get_catalogue()['definitions']), 2)
+        refresh_in_background.assert_called_once()
+        refresh_catalogue()
+        self.assertEqual(len(get_catalogue()['definitions']), 3)
+
+    def test_catalogue_api_pagination(self):
+        """L'API pagine, filtre par difficulté et signale les éléments déjà utilisés"""
+        self.game.used_definitions = [Definition.objects.get(word="chat").pk]
+        self.game.save()
+
+        response = self.client.get(f'/max_challenge/api/catalogue/{self.game.pk}/', {'page_size': 1})
+        data = response.json()
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(data['num_pages'], 2)
+        self.assertTrue(data['items'][0]['used'])
+
+        response = self.client.get(f'/max_challenge/api/catalogue/{self.game.pk}/', {'difficulty': '2'})
+        self.assertEqual([item['word'] for item in response.json()['items']], ['chien'])
+
+        response = self.client.get(f'/max_challenge/api/catalogue/{self.game.pk}/', {'type': 'photos'})
+        self.assertEqual(response.json()['items'][0]['thumbnail_url'], '/media/max_challenge/photos/alice.jpg')
+
+    def test_admin_pickers_use_catalogue_api(self):
+        """La page animateur charge ses listes via l'API ; une définition choisie sort de la liste"""
+        response = self.client.get(f'/max_challenge/admin/{self.game.pk}/')
+        self.assertNotIn('definitions', response.context)
+        self.assertContains(response, f'/max_challenge/api/catalogue/{self.game.pk}/')
+        self.assertContains(response, 'id="definition-picker"')
+
+        chien = Definition.objects.get(word="chien")
+        response = self.client.post(
+            f'/max_challenge/api/set_definition/{self.game.pk}/',
+            {'definition_id': chien.pk},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['definition']['word'], 'chien')
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.current_definition, chien)
+
+        response = self.client.get(f'/max_challenge/api/catalogue/{self.game.pk}/', {'exclude_used': 'true'})
+        self.assertEqual([item['word'] for item in response.json()['items']], ['chat'])
+
+
+def jpeg_upload(name, size):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(buffer, format='JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MAX_CHALLENGE_THUMBNAILS_ASYNC=False, RESPONSIVE_IMAGE_FORMATS=['jpeg'])
+class ThumbnailJobTestCase(TestCase):
+    """Redimensionnement des photos par la file de jobs (worker synchrone)"""
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_upload_queues_job_then_generates_thumbnail(self):
+        """L'upload crée un job ; l'image originale est servie jusqu'au traitement après commit"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            photo = Photo.objects.create(name="Alice", image=jpeg_upload('alice.jpg', (800, 1200)))
+
+        job = ThumbnailJob.objects.get(photo=photo)
+        self.assertEqual(job.status, ThumbnailJob.PENDING)
+        self.assertFalse(photo.image_ready)
+        self.assertEqual(photo.thumbnail_url, photo.image.url)
+
+        for callback in callbacks:
+            callback()
+
+        job.refresh_from_db()
+        photo.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (ThumbnailJob.DONE, 1))
+        self.assertTrue(photo.image_ready)
+        self.assertEqual(photo.thumbnail_url, photo.image_400x400.url)
+        with Image.open(photo.image_400x400.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (400, 600))
+
+    def test_landscape_photo_cropped_square(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            photo = Photo.objects.create(name="Bob", image=jpeg_upload('bob.jpg', (900, 500)))
+
+        photo.refresh_from_db()
+        with Image.open(photo.image_400x400.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (400, 400))
+
+    def test_command_backfills_and_retries_failed_jobs(self):
+        """Photos sans job (import en masse) et jobs en échec traités par generate_thumbnails"""
+        with self.captureOnCommitCallbacks():
+            failed = Photo.objects.create(name="Alice", image=jpeg_upload('alice.jpg', (600, 600)))
+        ThumbnailJob.objects.filter(photo=failed).update(status=ThumbnailJob.FAILED, attempts=3, error="Fichier illisible")
+        imported = Photo.objects.create(name="Bob", image=jpeg_upload('bob.jpg', (600, 900)))
+        ThumbnailJob.objects.filter(photo=imported).delete()
+
+        out = StringIO()
+        call_command('generate_thumbnails', '--retry-failed', stdout=out)
+
+        self.assertIn('1 jobs en échec remis en attente', out.getvalue())
+        self.assertIn('1 jobs ajoutés à la file', out.getvalue())
+        self.assertEqual(ThumbnailJob.objects.get(photo=failed).status, ThumbnailJob.DONE)
+        self.assertEqual(ThumbnailJob.objects.get(photo=imported).status, ThumbnailJob.DONE)
+        self.assertEqual(Photo.objects.filter(image_ready=True).count(), 2)
+
+    def test_interrupted_job_requeued_after_lease(self):
+        """Un job resté en cours (worker arrêté) est repris à l'expiration du bail, puis abandonné après MAX_ATTEMPTS"""
+        with self.captureOnCommitCallbacks():
+            photo = Photo.objects.create(name="Alice", image=jpeg_upload('alice.jpg', (600, 600)))
+            stuck = Photo.objects.create(name="Bob", image=jpeg_upload('bob.jpg', (600, 600)))
+        expired = timezone.now() - timedelta(seconds=1)
+        ThumbnailJob.objects.filter(photo=photo).update(status=ThumbnailJob.RUNNING, attempts=1, leased_until=expired)
+        ThumbnailJob.objects.filter(photo=stuck).update(status=ThumbnailJob.RUNNING, attempts=3, leased_until=expired)
+
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+
+        self.assertIn('1 jobs interrompus remis en attente', out.getvalue())
+        job = ThumbnailJob.objects.get(photo=photo)
+        self.assertEqual((job.status, job.attempts, job.leased_until), (ThumbnailJob.DONE, 2, None))
+        photo.refresh_from_db()
+        self.assertTrue(photo.image_ready)
+        # Job abandonné ; le backfill a ajouté un nouveau job pour la photo toujours sans miniature
+        self.assertEqual(
+            list(ThumbnailJob.objects.filter(photo=stuck).order_by('pk').values_list('status', flat=True)),
+            [ThumbnailJob.FAILED, ThumbnailJob.DONE],
+        )
+
+    def test_job_in_progress_keeps_its_lease(self):
+        with self.captureOnCommitCallbacks():
+            photo = Photo.objects.create(name="Alice", image=jpeg_upload('alice.jpg', (600, 600)))
+        ThumbnailJob.objects.filter(photo=photo).update(status=ThumbnailJob.RUNNING, attempts=1, leased_until=timezone.now() + timedelta(minutes=1))
+
+        call_command('generate_thumbnails', stdout=StringIO())
+
+        self.assertEqual(ThumbnailJob.objects.get(photo=photo).status, ThumbnailJob.RUNNING)
+        self.assertEqual(ThumbnailJob.objects.filter(photo=photo).count(), 1)
@@ -0,0 +1,198 @@
+"""
+Génération différée des images redimensionnées des photos
+
+Le redimensionnement (ouverture, crop, LANCZOS, encodage JPEG) ne se fait plus
+dans la requête d'upload : Photo.save() crée un ThumbnailJob en base et un
+worker en arrière-plan le traite après le commit de la transaction.
+
+Un job en cours est réservé pour LEASE_SECONDS : si le processus s'arrête en
+plein traitement (rechargement du serveur, thread démon interrompu), le job est
+remis en attente à l'expiration du bail par le worker suivant ou par la
+commande generate_thumbnails.
+"""
+import threading
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image
+from responsive_images.services import generate_derivatives
+
+from .catalogue import invalidate_catalogue
+from .models import Photo, ThumbnailJob
+
+# Nombre maximum de tentatives avant de marquer un job en échec
+MAX_ATTEMPTS = 3
+# Durée de réservation d'un job en cours (secondes)
+LEASE_SECONDS = 120
+
+_worker_lock = threading.Lock()
+_worker_thread = None
+
+
+def build_thumbnail(photo):
+    """Calcule l'image redimensionnée d'une photo et retourne (nom_fichier, contenu JPEG)
+
+    Portrait : 400x600 (ratio 2:3), paysage ou carré : 400x400, avec crop centré.
+    """
+    with Image.open(photo.image.path) as img:
+        # Convertir en RGB si nécessaire
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        width, height = img.size
+        is_portrait = height > width
+
+        if is_portrait:
+            target_width, target_height = 400, 600
+            target_ratio = 2 / 3  # largeur / hauteur
+            current_ratio = width / height
+
+            if current_ratio > target_ratio:
+                # Image trop large, crop sur la largeur
+                new_width = int(height * target_ratio)
+                left = (width - new_width) // 2
+                box = (left, 0, left + new_width, height)
+            else:
+                # Image trop haute, crop sur la hauteur
+                new_height = int(width / target_ratio)
+                top = (height - new_height) // 2
+                box = (0, top, width, top + new_height)
+        else:
+            target_width, target_height = 400, 400
+            size = min(width, height)
+            left = (width - size) // 2
+            top = (height - size) // 2
+            box = (left, top, left + size, top + size)
+
+        img = img.crop(box).resize((target_width, target_height), Image.Resampling.LANCZOS)
+
+        buffer = BytesIO()
+        img.save(buffer, format='JPEG', quality=85, optimize=True)
+
+    filename = f"{photo.name}_{target_width}x{target_height}.jpg"
+    return filename, buffer.getvalue()
+
+
+def generate_thumbnail(photo):
+    """Génère l'image redimensionnée et la marque prête en une seule requête UPDATE"""
+    filename, content = build_thumbnail(photo)
+    photo.image_400x400.save(filename, ContentFile(content), save=False)
+    photo.image_ready = True
+    Photo.objects.filter(pk=photo.pk).update(
+        image_400x400=photo.image_400x400.name,
+        image_ready=True,
+    )
+    # update() ne déclenche pas post_save : invalider le catalogue explicitement
+    invalidate_catalogue()
+    print(f"✅ Image redimensionnée générée pour {photo.name}")
+
+    # Déclinaisons WebP/AVIF de l'image servie pendant la partie
+    try:
+        generate_derivatives(photo.image_400x400.name)
+    except Exception as e:
+        print(f"⚠️ Déclinaisons non générées pour {photo.name}: {e}")
+
+
+def schedule_thumbnail(photo):
+    """Ajoute un job de redimensionnement pour la photo (sans doublon) et réveille le worker après commit"""
+    requeue_expired_jobs()
+    already_queued = ThumbnailJob.objects.filter(
+        photo=photo,
+        status__in=[ThumbnailJob.PENDING, ThumbnailJob.RUNNING],
+    ).exists()
+    if not already_queued:
+        ThumbnailJob.objects.create(photo=photo)
+    transaction.on_commit(start_worker)
+
+
+def start_worker():
+    """Démarre le worker en arrière-plan s'il ne tourne pas déjà"""
+    global _worker_thread
+
+    if not getattr(settings, 'MAX_CHALLENGE_THUMBNAILS_ASYNC', True):
+        process_pending_jobs()
+        return
+
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return
+        _worker_thread = threading.Thread(target=_worker_loop, name='max_challenge-thumbnails')
+        _worker_thread.daemon = True
+        _worker_thread.start()
+
+
+def _worker_loop():
+    """Traite les jobs en attente jusqu'à ce que la file soit vide"""
+    global _worker_thread
+    try:
+        while True:
+            process_pending_jobs()
+            # Vérification finale sous verrou : un job arrivé entre-temps relancerait sinon un worker
+            with _worker_lock:
+                if not ThumbnailJob.objects.filter(status=ThumbnailJob.PENDING).exists():
+                    _worker_thread = None
+                    return
+    finally:
+        connection.close()
+
+
+def requeue_expired_jobs():
+    """Remet en attente les jobs en cours dont le bail a expiré ; retourne le nombre de jobs remis en attente
+
+    Un job dont le worker s'est déjà arrêté MAX_ATTEMPTS fois passe en échec.
+    """
+    expired = ThumbnailJob.objects.filter(
+        Q(leased_until__lt=timezone.now()) | Q(leased_until__isnull=True),
+        status=ThumbnailJob.RUNNING,
+    )
+    expired.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=ThumbnailJob.FAILED,
+        error="Traitement interrompu (bail expiré)",
+        leased_until=None,
+    )
+    return expired.update(status=ThumbnailJob.PENDING, leased_until=None)
+
+
+def process_pending_jobs(limit=None):
+    """Traite les jobs en attente dans l'ordre d'arrivée, retourne le nombre de jobs traités"""
+    requeue_expired_jobs()
+    processed = 0
+    while limit is None or processed < limit:
+        job = ThumbnailJob.objects.filter(status=ThumbnailJob.PENDING).order_by('created_at').first()
+        if job is None:
+            break
+        if run_job(job):
+            processed += 1
+    return processed
+
+
+def run_job(job):
+    """Réserve puis exécute un job ; retourne False si un autre worker l'a déjà pris"""
+    claimed = ThumbnailJob.objects.filter(pk=job.pk, status=ThumbnailJob.PENDING).update(
+        status=ThumbnailJob.RUNNING,
+        attempts=F('attempts') + 1,
+        leased_until=timezone.now() + timedelta(seconds=LEASE_SECONDS),
+    )
+    if not claimed:
+        return False
+    job.refresh_from_db()
+
+    try:
+        photo = Photo.objects.get(pk=job.photo_id)
+        if photo.image:
+            generate_thumbnail(photo)
+        job.status = ThumbnailJob.DONE
+        job.error = ''
+    except Exception as e:
+        print(f"❌ Erreur lors du redimensionnement (job {job.pk}): {e}")
+        job.error = str(e)
+        job.status = ThumbnailJob.PENDING if job.attempts < MAX_ATTEMPTS else ThumbnailJob.FAILED
+
+    job.leased_until = None
+    job.save(update_fields=['status', 'error', 'leased_until', 'updated_at'])
+    return True
@@ -19,4 +19,5 @@ urlpatterns = [
     path('api/reset_scores/<int:game_id>/', views.reset_scores, name='reset_scores'),
     path('api/update_squares_per_reveal/<int:game_id>/', views.update_squares_per_reveal, name='update_squares_per_reveal'),
     path('api/game_state/<int:game_id>/', views.get_game_state, name='game_state'),
+    path('api/catalogue/<int:game_id>/', views.catalogue_api, name='catalogue'),
 ]
@@ -1,10 +1,12 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.contrib import messages
+from django.core.paginator import Paginator
 import json
-from .models import Definition, GameSession, Photo
+from .catalogue import get_catalogue
+from .models import GameSession, Photo
 from .services import GameService, GameCreationService
 
 def index(request):
@@ -26,14 +28,49 @@ def admin_view(request, game_id):
     """Interface d'administration pour l'animateur"""
     service = GameService(game_id)
     game_data = service.get_game_data()
-    definitions = Definition.objects.all().order_by('?')
-    photos = Photo.objects.all()  # Récupérer toutes les photos disponibles
+    # Les listes de définitions et de photos sont chargées par la page via catalogue_api (catalogue en cache)
+    return render(request, 'max_challenge/admin.html', game_data)
+
+def catalogue_api(request, game_id):
+    """API paginée du catalogue (définitions ou photos) pour l'interface de l'animateur"""
+    game = get_object_or_404(GameSession, pk=game_id)
+    catalogue = get_catalogue()
+    
+    kind = request.GET.get('type', 'definitions')
+    if kind == 'photos':
+        items = catalogue['photos']
+        used_ids = set(game.used_photos or [])
+    else:
+        kind = 'definitions'
+        items = catalogue['definitions']
+        used_ids = set(game.used_definitions or [])
+        difficulty = request.GET.get('difficulty')
+        if difficulty:
+            items = [item for item in items if str(item['difficulty']) == difficulty]
+    
+    query = request.GET.get('q', '').strip().lower()
+    if query:
+        label = 'name' if kind == 'photos' else 'word'
+        items = [item for item in items if query in item[label].lower()]
     
-    context = game_data.copy()
-    context['definitions'] = definitions
-    context['photos'] = photos  # Ajouter les photos au contexte
+    if request.GET.get('exclude_used', '').lower() == 'true':
+        items = [item for item in items if item['id'] not in used_ids]
     
-    return render(request, 'max_challenge/admin.html', context)
+    try:
+        page_size = min(max(int(request.GET.get('page_size', 50)), 1), 200)
+    except ValueError:
+        page_size = 50
+    paginator = Paginator(items, page_size)
+    page = paginator.get_page(request.GET.get('page', 1))
+    
+    return JsonResponse({
+        'type': kind,
+        'items': [{**item, 'used': item['id'] in used_ids} for item in page.object_list],
+        'page': page.number,
+        'num_pages': paginator.num_pages,
+        'total': paginator.count,
+        'has_next': page.has_next(),
+    })
 
 @csrf_exempt
 @require_POST
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     "biblio",
     "chessTrainer.apps.ChessTrainerConfig",
     "max_challenge.apps.MaxChallengeConfig",
+    "responsive_images.apps.ResponsiveImagesConfig",
     'django_ckeditor_5',
 ]
 
@@ -91,6 +92,17 @@ DATABASES = {
 }
 
 
+# Cache
+# Cache en mémoire par processus ; avec plusieurs workers, préférer un cache partagé
+# (FileBasedCache ou Redis) pour que les invalidations soient vues par tous les processus
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mysite',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -144,6 +156,50 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Max Challenge - Redimensionnement des photos dans un thread en arrière-plan après l'upload
+# (False : traitement synchrone au commit, utile pour les scripts et les tests)
+MAX_CHALLENGE_THUMBNAILS_ASYNC = True
+
+# Déclinaisons responsives des images uploadées (largeurs en pixels, formats par ordre de préférence)
+# Les formats non supportés par Pillow (ex : AVIF sur une ancienne version) sont ignorés
+RESPONSIVE_IMAGE_WIDTHS = [320, 640, 960, 1280]
+RESPONSIVE_IMAGE_FORMATS = ['avif', 'webp', 'jpeg']
+RESPONSIVE_IMAGE_DIRS = ['uploads', 'max_challenge/photos_400']
+RESPONSIVE_IMAGES_ASYNC = True
+
+# Chess Trainer - Mode d'analyse Stockfish des parties
+# 'incremental' : une seule recherche par position avec une session moteur persistante
+# 'per_ply' : analyse historique, chaque coup est analysé indépendamment
+# 'budget' : passe rapide sur toute la partie, analyse complète des seuls coups critiques
+CHESS_ANALYSIS_MODE = 'incremental'
+# Mode 'budget' : temps maximal (secondes) par partie ; au-delà, les coups critiques
+# restants gardent l'évaluation de la passe rapide
+CHESS_ANALYSIS_BUDGET = 30
+
+# Livre d'ouvertures Polyglot (.bin) : les coups théoriques sont classés sans Stockfish
+# (None ou fichier absent : désactivé), ex : os.path.join(BASE_DIR, 'data', 'book.bin')
+CHESS_OPENING_BOOK = None
+CHESS_BOOK_MAX_PLY = 24
+# Tables de finales Syzygy locales : résultat exact des finales à 5 pièces ou moins
+# (None ou dossier absent : désactivé), ex : '/opt/syzygy/3-4-5'
+CHESS_SYZYGY_PATH = None
+CHESS_SYZYGY_MAX_PIECES = 5
+
+# Les analyses demandées depuis le site sont mises en file (AnalysisJob) et exécutées par
+# un processus séparé : `python manage.py analysis_worker` (voir DEPLOYMENT_CHECKLIST.md).
+# True : sans worker séparé, la file est exécutée dans un thread du serveur web
+# (développement, installation à un seul processus)
+CHESS_ANALYSIS_IN_PROCESS = os.environ.get('CHESS_ANALYSIS_IN_PROCESS', '').lower() in ('1', 'true')
+
+# Stockfish (cherché au premier usage, voir chessTrainer/engine.py)
+# None : emplacements habituels (Homebrew, PATH, /usr/bin)
+STOCKFISH_PATH = os.environ.get('STOCKFISH_PATH')
+# Moteurs simultanés, gardés ouverts entre deux analyses
+STOCKFISH_POOL_SIZE = 2
+# Table de transposition (Mo) et threads de chaque moteur
+STOCKFISH_HASH = 128
+STOCKFISH_THREADS = 1
+
 # Configuration Email (pour formulaire de contact)
 # En développement, les emails seront affichés dans la console
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -171,11 +227,21 @@ LOGGING = {
             'callback': lambda record: '/max_challenge/api/' not in record.getMessage()
         },
     },
+    'formatters': {
+        'chess': {
+            'format': '{asctime} {levelname} {name} {message}',
+            'style': '{',
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
             'filters': ['skip_max_challenge_api'],
         },
+        'chess_console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'chess',
+        },
     },
     'loggers': {
         'django.server': {
@@ -183,6 +249,16 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        # Module d'échecs : chessTrainer.analysis, chessTrainer.sync, chessTrainer.sse
+        # (DEBUG : détail coup par coup et durée des phases d'analyse)
+        'chessTrainer': {
+            'handlers': ['chess_console'],
+            'level': os.environ.get('CHESS_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'chessTrainer.sse': {
+            'level': os.environ.get('CHESS_SSE_LOG_LEVEL', 'WARNING'),
+        },
     },
 }
 
@@ -0,0 +1,6 @@
+from django.apps import AppConfig
+
+
+class ResponsiveImagesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'responsive_images'
@@ -0,0 +1,59 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from responsive_images.services import generate_derivatives, iter_source_images
+
+
+class Command(BaseCommand):
+    help = 'Génère les déclinaisons responsives (AVIF/WebP/JPEG) des images uploadées'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names',
+            nargs='*',
+            help='Images à traiter (chemins relatifs à MEDIA_ROOT). Par défaut : tous les dossiers configurés',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Régénérer les déclinaisons même si elles sont à jour',
+        )
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(iter_source_images())
+        self.stdout.write(f'Génération des déclinaisons pour {len(names)} images...\n')
+
+        original_bytes = 0
+        smallest_bytes = 0
+        error_count = 0
+
+        for name in names:
+            try:
+                manifest = generate_derivatives(name, force=options['force'])
+            except Exception as e:
+                error_count += 1
+                self.stdout.write(self.style.ERROR(f'❌ {name}: {e}'))
+                continue
+
+            size = os.path.getsize(default_storage.path(name))
+            # Plus grande largeur dans le format le plus compact : ce qu'un navigateur moderne télécharge au pire
+            largest_width = max(variant['width'] for variant in manifest['variants'])
+            best = min(
+                os.path.getsize(default_storage.path(variant['name']))
+                for variant in manifest['variants']
+                if variant['width'] == largest_width
+            )
+            original_bytes += size
+            smallest_bytes += best
+            self.stdout.write(f'   {name}: {size // 1024} Ko → {best // 1024} Ko ({len(manifest["variants"])} fichiers)')
+
+        if smallest_bytes:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'\n🎉 {original_bytes // 1024} Ko d\'originaux → {smallest_bytes // 1024} Ko servis '
+                    f'(÷{original_bytes / smallest_bytes:.1f})'
+                )
+            )
+        if error_count:
+            self.stdout.write(self.style.WARNING(f'⚠️ {error_count} images en erreur'))
@@ -0,0 +1,262 @@
+"""
+Déclinaisons responsives des images uploadées
+
+Pour chaque image source, on génère plusieurs largeurs dans des formats
+modernes (AVIF, WebP) avec un repli JPEG. Les fichiers sont stockés à côté de
+l'original avec un nom contenant le hash du contenu :
+
+    uploads/enigme1.jpg
+    uploads/enigme1.3fa2b1c94d.640w.webp
+    uploads/enigme1.jpg.srcset.json   (manifeste lu par le template tag)
+"""
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+DEFAULT_WIDTHS = [320, 640, 960, 1280]
+DEFAULT_FORMATS = ['avif', 'webp', 'jpeg']
+DEFAULT_DIRS = ['uploads', 'max_challenge/photos_400']
+
+MANIFEST_SUFFIX = '.srcset.json'
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+FILE_EXTENSIONS = {
+    'avif': 'avif',
+    'webp': 'webp',
+    'jpeg': 'jpg',
+}
+SAVE_OPTIONS = {
+    'avif': {'quality': 60},
+    'webp': {'quality': 80, 'method': 4},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+# Nom d'une déclinaison : <racine>.<hash>.<largeur>w.<ext>
+DERIVATIVE_PATTERN = re.compile(r'\.[0-9a-f]{10}\.\d+w\.(avif|webp|jpg)$')
+
+# Cache des manifestes lus par le template tag : {nom: (mtime, manifeste)}
+_manifest_cache = {}
+
+_queue = queue.Queue()
+_worker_lock = threading.Lock()
+_worker_thread = None
+
+
+def get_widths():
+    return sorted(getattr(settings, 'RESPONSIVE_IMAGE_WIDTHS', DEFAULT_WIDTHS))
+
+
+def get_formats():
+    """Formats configurés, limités à ceux que Pillow sait encoder (le JPEG est toujours disponible)"""
+    formats = getattr(settings, 'RESPONSIVE_IMAGE_FORMATS', DEFAULT_FORMATS)
+    return [fmt for fmt in formats if fmt == 'jpeg' or features.check(fmt)]
+
+
+def get_source_dirs():
+    return getattr(settings, 'RESPONSIVE_IMAGE_DIRS', DEFAULT_DIRS)
+
+
+def is_source_image(name):
+    """Vrai pour une image originale (ni déclinaison, ni manifeste)"""
+    return (
+        name.lower().endswith(SOURCE_EXTENSIONS)
+        and not DERIVATIVE_PATTERN.search(name)
+    )
+
+
+def target_widths(width):
+    """Largeurs générées pour une image source : les largeurs configurées plus petites, puis la largeur d'origine"""
+    return [w for w in get_widths() if w < width] + [width]
+
+
+def is_up_to_date(manifest, digest):
+    """Le manifeste correspond-il au contenu actuel et aux largeurs configurées"""
+    return (
+        manifest.get('hash') == digest
+        and {variant['width'] for variant in manifest.get('variants', [])} == set(target_widths(manifest.get('width', 0)))
+    )
+
+
+def manifest_name(name):
+    return f"{name}{MANIFEST_SUFFIX}"
+
+
+def content_hash(path):
+    """Hash court (10 caractères hexadécimaux) du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:10]
+
+
+def load_manifest(name):
+    """Retourne le manifeste des déclinaisons d'une image, ou None s'il n'existe pas encore
+
+    Le manifeste est gardé en mémoire tant que le fichier n'a pas été modifié.
+    """
+    if not name:
+        return None
+    path = default_storage.path(manifest_name(name))
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        _manifest_cache.pop(name, None)
+        return None
+
+    cached = _manifest_cache.get(name)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    _manifest_cache[name] = (mtime, manifest)
+    return manifest
+
+
+def _encode(img, fmt):
+    if fmt == 'jpeg' and img.mode != 'RGB':
+        img = img.convert('RGB')
+    buffer = BytesIO()
+    img.save(buffer, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+    return buffer.getvalue()
+
+
+def generate_derivatives(name, force=False):
+    """Génère les déclinaisons d'une image du stockage et retourne son manifeste
+
+    Les largeurs configurées plus petites que l'image sont générées, plus la
+    largeur d'origine : une image affichée à sa taille réelle n'est jamais
+    agrandie par le navigateur. Ne fait rien si le manifeste correspond déjà au
+    contenu actuel de l'image et aux largeurs configurées (sauf avec force=True). Les déclinaisons d'une version précédente sont supprimées.
+    """
+    path = default_storage.path(name)
+    digest = content_hash(path)
+    previous = load_manifest(name)
+    if previous and is_up_to_date(previous, digest) and not force:
+        return previous
+
+    root, _ = os.path.splitext(name)
+    formats = get_formats()
+    variants = []
+
+    with Image.open(path) as source:
+        # Les photos de téléphone sont souvent tournées via EXIF
+        img = ImageOps.exif_transpose(source)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+
+        width, height = img.size
+        for target_width in target_widths(width):
+            target_height = max(1, round(height * target_width / width))
+            resized = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
+            for fmt in formats:
+                derivative = f"{root}.{digest}.{target_width}w.{FILE_EXTENSIONS[fmt]}"
+                if force or not default_storage.exists(derivative):
+                    if default_storage.exists(derivative):
+                        default_storage.delete(derivative)
+                    default_storage.save(derivative, ContentFile(_encode(resized, fmt)))
+                variants.append({
+                    'format': fmt,
+                    'width': target_width,
+                    'height': target_height,
+                    'name': derivative,
+                })
+
+    # Supprimer les déclinaisons de l'ancienne version de l'image
+    if previous:
+        current = {variant['name'] for variant in variants}
+        for variant in previous.get('variants', []):
+            if variant['name'] not in current and default_storage.exists(variant['name']):
+                default_storage.delete(variant['name'])
+
+    manifest = {
+        'hash': digest,
+        'width': width,
+        'height': height,
+        'variants': variants,
+    }
+    manifest_file = manifest_name(name)
+    if default_storage.exists(manifest_file):
+        default_storage.delete(manifest_file)
+    default_storage.save(manifest_file, ContentFile(json.dumps(manifest).encode('utf-8')))
+    _manifest_cache.pop(name, None)
+    return manifest
+
+
+def schedule_derivatives(name):
+    """Génère les déclinaisons d'une image dans un thread en arrière-plan après le commit"""
+    if not name or not is_source_image(name):
+        return
+    transaction.on_commit(lambda: _enqueue(name))
+
+
+def _enqueue(name):
+    global _worker_thread
+
+    if not getattr(settings, 'RESPONSIVE_IMAGES_ASYNC', True):
+        _generate_safely(name)
+        return
+
+    _queue.put(name)
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return
+        _worker_thread = threading.Thread(target=_worker_loop, name='responsive-images')
+        _worker_thread.daemon = True
+        _worker_thread.start()
+
+
+def _worker_loop():
+    global _worker_thread
+    try:
+        while True:
+            try:
+                name = _queue.get(timeout=5)
+            except queue.Empty:
+                with _worker_lock:
+                    if _queue.empty():
+                        _worker_thread = None
+                        return
+                continue
+            _generate_safely(name)
+    finally:
+        connection.close()
+
+
+def _generate_safely(name):
+    try:
+        generate_derivatives(name)
+    except Exception as e:
+        print(f"❌ Erreur lors de la génération des déclinaisons de {name}: {e}")
+
+
+def iter_source_images():
+    """Parcourt les images originales des dossiers configurés (chemins relatifs au stockage)"""
+    for directory in get_source_dirs():
+        try:
+            _, files = default_storage.listdir(directory)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        for filename in sorted(files):
+            name = f"{directory}/{filename}"
+            if is_source_image(name):
+                yield name
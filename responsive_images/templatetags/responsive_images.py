@@ -0,0 +1,65 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from responsive_images.services import MIME_TYPES, load_manifest
+
+register = template.Library()
+
+DEFAULT_SIZES = "(max-width: 800px) 100vw, 800px"
+
+
+def _srcset(variants):
+    return ", ".join(
+        f"{default_storage.url(variant['name'])} {variant['width']}w" for variant in variants
+    )
+
+
+@register.simple_tag
+def responsive_image(image, alt="", css_class="", sizes=DEFAULT_SIZES):
+    """Affiche une image avec ses déclinaisons (AVIF/WebP + repli JPEG) via <picture> et srcset
+
+    Accepte un champ ImageField ou un chemin relatif à MEDIA_ROOT. Tant que les
+    déclinaisons n'ont pas été générées, l'image originale est affichée.
+    """
+    name = getattr(image, 'name', image)
+    if not name:
+        return ""
+
+    manifest = load_manifest(name)
+    if not manifest or not manifest.get('variants'):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+            default_storage.url(name), alt, css_class,
+        )
+
+    by_format = {}
+    for variant in manifest['variants']:
+        by_format.setdefault(variant['format'], []).append(variant)
+
+    sources = format_html_join(
+        "",
+        '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (MIME_TYPES[fmt], _srcset(variants), sizes)
+            for fmt, variants in by_format.items()
+            if fmt != 'jpeg'
+        ),
+    )
+
+    fallback = by_format.get('jpeg')
+    if fallback:
+        # Variante à la largeur d'origine de l'image, pour les navigateurs sans srcset
+        largest = max(fallback, key=lambda variant: variant['width'])
+        img = format_html(
+            '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+            default_storage.url(largest['name']), _srcset(fallback), sizes,
+            largest['width'], largest['height'], alt, css_class,
+        )
+    else:
+        img = format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+            default_storage.url(name), alt, css_class,
+        )
+
+    return format_html("<picture>{}{}</picture>", sources, img)
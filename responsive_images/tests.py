@@ -0,0 +1,119 @@
+"""
+Tests des déclinaisons responsives et du template tag responsive_image
+"""
+
+import re
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from .services import content_hash, generate_derivatives, load_manifest, manifest_name
+
+
+def save_image(name, size):
+    buffer = BytesIO()
+    Image.new('RGB', size, (40, 120, 200)).save(buffer, format='JPEG')
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def render_tag(name, **options):
+    arguments = ' '.join(f'{key}="{value}"' for key, value in options.items())
+    return Template(f'{{% load responsive_images %}}{{% responsive_image name {arguments} %}}').render(Context({'name': name}))
+
+
+@override_settings(RESPONSIVE_IMAGE_WIDTHS=[320, 640, 960, 1280], RESPONSIVE_IMAGE_FORMATS=['avif', 'webp', 'jpeg'])
+class DerivativesTestCase(SimpleTestCase):
+    """Largeurs, noms et formats des déclinaisons générées"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def widths(self, manifest, fmt='jpeg'):
+        return [variant['width'] for variant in manifest['variants'] if variant['format'] == fmt]
+
+    def test_small_source_keeps_its_own_width(self):
+        """Photo 400x600 : 320w et 400w, jamais agrandie au-delà de l'original"""
+        name = save_image('max_challenge/photos_400/alice_400x600.jpg', (400, 600))
+        manifest = generate_derivatives(name)
+        self.assertEqual((manifest['width'], manifest['height']), (400, 600))
+        self.assertEqual(self.widths(manifest), [320, 400])
+        self.assertEqual({variant['format'] for variant in manifest['variants']}, {'avif', 'webp', 'jpeg'})
+        full = [variant for variant in manifest['variants'] if variant['width'] == 400 and variant['format'] == 'webp'][0]
+        with Image.open(default_storage.path(full['name'])) as img:
+            self.assertEqual(img.size, (400, 600))
+
+    def test_large_source_gets_configured_widths_and_original(self):
+        name = save_image('uploads/enigme1.jpg', (1200, 800))
+        self.assertEqual(self.widths(generate_derivatives(name)), [320, 640, 960, 1200])
+
+    def test_names_contain_content_hash(self):
+        """Nom <racine>.<hash>.<largeur>w.<ext> ; une nouvelle version remplace les anciens fichiers"""
+        name = save_image('uploads/enigme2.jpg', (700, 500))
+        manifest = generate_derivatives(name)
+        digest = content_hash(default_storage.path(name))
+        self.assertEqual(manifest['hash'], digest)
+        for variant in manifest['variants']:
+            self.assertRegex(variant['name'], rf'^uploads/enigme2\.{digest}\.{variant["width"]}w\.(avif|webp|jpg)$')
+            self.assertTrue(default_storage.exists(variant['name']))
+
+        # Contenu inchangé : manifeste réutilisé tel quel
+        self.assertIs(generate_derivatives(name), load_manifest(name))
+
+        default_storage.delete(name)
+        save_image(name, (800, 500))
+        updated = generate_derivatives(name)
+        self.assertNotEqual(updated['hash'], digest)
+        self.assertFalse(any(default_storage.exists(variant['name']) for variant in manifest['variants']))
+
+    def test_formats_pillow_cannot_encode_are_skipped(self):
+        name = save_image('uploads/enigme3.jpg', (500, 500))
+        with mock.patch('responsive_images.services.features.check', side_effect=lambda fmt: fmt == 'webp'):
+            manifest = generate_derivatives(name)
+        self.assertEqual({variant['format'] for variant in manifest['variants']}, {'webp', 'jpeg'})
+
+
+@override_settings(RESPONSIVE_IMAGE_WIDTHS=[320, 640], RESPONSIVE_IMAGE_FORMATS=['webp', 'jpeg'])
+class ResponsiveImageTagTestCase(SimpleTestCase):
+    """Balises produites par {% responsive_image %}"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, MEDIA_URL='/media/')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.name = save_image('uploads/indice.jpg', (800, 600))
+
+    def test_original_image_without_manifest(self):
+        self.assertFalse(default_storage.exists(manifest_name(self.name)))
+        html = render_tag(self.name, alt="Indice")
+        self.assertNotIn('<picture>', html)
+        self.assertIn('<img src="/media/uploads/indice.jpg" alt="Indice"', html)
+
+    def test_picture_with_srcset_once_generated(self):
+        manifest = generate_derivatives(self.name)
+        digest = manifest['hash']
+        html = render_tag(self.name, alt="Indice", sizes="400px")
+
+        self.assertTrue(html.startswith('<picture>'))
+        self.assertIn(
+            f'<source type="image/webp" srcset="/media/uploads/indice.{digest}.320w.webp 320w, '
+            f'/media/uploads/indice.{digest}.640w.webp 640w, /media/uploads/indice.{digest}.800w.webp 800w" sizes="400px">',
+            html,
+        )
+        # Repli JPEG : srcset complet et src à la largeur d'origine
+        img = re.search(r'<img [^>]*>', html).group(0)
+        self.assertIn(f'src="/media/uploads/indice.{digest}.800w.jpg"', img)
+        self.assertIn(f'/media/uploads/indice.{digest}.320w.jpg 320w', img)
+        self.assertIn('width="800" height="600"', img)
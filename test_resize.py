@@ -14,6 +14,10 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 django.setup()
 
+from django.conf import settings
+# Redimensionnement synchrone pour pouvoir vérifier le résultat juste après la sauvegarde
+settings.MAX_CHALLENGE_THUMBNAILS_ASYNC = False
+
 from max_challenge.models import Photo
 from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
@@ -52,6 +56,7 @@ def test_resize_system():
     
     photo_portrait = Photo(name="test_portrait")
     photo_portrait.image.save("test_portrait.jpg", ContentFile(buffer.read()), save=True)
+    photo_portrait.refresh_from_db()
     
     # Vérifier les dimensions
     if photo_portrait.image_400x400:
@@ -75,6 +80,7 @@ def test_resize_system():
     
     photo_square = Photo(name="test_carre")
     photo_square.image.save("test_carre.jpg", ContentFile(buffer.read()), save=True)
+    photo_square.refresh_from_db()
     
     # Vérifier les dimensions
     if photo_square.image_400x400:
@@ -98,6 +104,7 @@ def test_resize_system():
     
     photo_landscape = Photo(name="test_paysage")
     photo_landscape.image.save("test_paysage.jpg", ContentFile(buffer.read()), save=True)
+    photo_landscape.refresh_from_db()
     
     # Vérifier les dimensions
     if photo_landscape.image_400x400: